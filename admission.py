@@ -0,0 +1,193 @@
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from collections import Counter
+from contextlib import asynccontextmanager, contextmanager
+
+from metrics import metrics
+
+# Приоритеты запросов к LLM: меньше — важнее.
+# finish — итоговый отчет, turn — ход идущего собеседования, opening — начало нового собеседования
+PRIORITIES = {"finish": 0, "turn": 1, "opening": 2}
+
+# Запросы к LLM без своего места в допуске: они идут внутри чужого места или в фоне и учитываются отдельно.
+# hedge — запасной запрос хеджирования (и основной, если он дорабатывает в фоне после победы хеджа),
+# teacher_split — разбор ошибок, параллельный вопросу преподавателя, profile_update — фоновое обновление профиля
+UNADMITTED_KINDS = ("hedge", "teacher_split", "profile_update")
+
+
+class AdmissionRejected(Exception):
+    """Очередь переполнена: запрос отклонен сразу, без ожидания"""
+
+
+class _Waiter:
+    def __init__(self, priority, on_queued, tenant=None):
+        self.priority = priority
+        self.on_queued = on_queued
+        self.tenant = tenant
+        self.future = asyncio.get_running_loop().create_future()
+        self.position = None
+        self.enqueued = time.monotonic()
+
+
+class AdmissionController:
+    """Контроль допуска к LLM: не больше max_concurrency запросов одновременно, ограниченная очередь с приоритетами.
+
+    Ожидающие получают свою позицию в очереди и оценку ожидания через on_queued(position, eta_seconds).
+    tenant_of() возвращает владельца запроса (например, бота вакансии): внутри одного приоритета
+    очередь делится между владельцами по кругу, и поток запросов одного бота не задерживает остальных.
+
+    Место выдается на ход или отчет, а не на отдельный запрос: запросы из UNADMITTED_KINDS идут без места,
+    поэтому одновременных запросов к LLM может быть больше max_concurrency (их число — в unadmitted_active()).
+    """
+
+    def __init__(self, max_concurrency=8, max_queue=40, priority_limits=None, initial_service_seconds=10.0,
+                 tenant_of=None):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.priority_limits = priority_limits or {}
+        self.service_seconds = initial_service_seconds
+        self.tenant_of = tenant_of
+        self.active = 0
+        self.queued = Counter()
+        self._heap = []
+        self._sequence = itertools.count()
+        # Справедливая очередь: номер круга последнего запроса каждого владельца и круг, который сейчас обслуживается
+        self._tenant_rounds = {}
+        self._round = 0
+
+    def would_reject(self, priority):
+        """Будет ли запрос с таким приоритетом отклонен прямо сейчас"""
+        if self.active < self.max_concurrency and not self._heap:
+            return False
+        if len(self._heap) >= self.max_queue:
+            return True
+        limit = self.priority_limits.get(priority)
+        return limit is not None and self.queued[priority] >= limit
+
+    def estimate_wait(self, position):
+        """Оценка ожидания для позиции в очереди по среднему времени обслуживания"""
+        return math.ceil(position / self.max_concurrency) * self.service_seconds
+
+    @asynccontextmanager
+    async def slot(self, priority, on_queued=None):
+        """Занимает место для запроса к LLM на время блока with"""
+        await self._acquire(priority, on_queued)
+        start_time = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(time.monotonic() - start_time)
+
+    async def _acquire(self, priority, on_queued):
+        tenant = self.tenant_of() if self.tenant_of is not None else None
+        if self.active < self.max_concurrency and not self._heap:
+            self.active += 1
+            metrics.incr(f"admission.admitted.{priority}")
+            return
+
+        if self.would_reject(priority):
+            metrics.incr(f"admission.rejected.{priority}")
+            raise AdmissionRejected(priority)
+
+        waiter = _Waiter(priority, on_queued, tenant)
+        # Очередной запрос владельца попадает в следующий круг после его предыдущего запроса
+        fair_round = max(self._round, self._tenant_rounds.get(tenant, 0)) + 1
+        self._tenant_rounds[tenant] = fair_round
+        heapq.heappush(self._heap, (PRIORITIES[priority], fair_round, next(self._sequence), waiter))
+        self.queued[priority] += 1
+        metrics.observe("admission.queue_depth", len(self._heap))
+        self._notify_positions()
+
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Место уже выдано, но ожидающий отменен — возвращаем его
+                self._release(0.0, observe=False)
+            else:
+                self._remove(waiter)
+            raise
+
+        metrics.incr(f"admission.admitted.{priority}")
+        metrics.observe("admission.wait", time.monotonic() - waiter.enqueued)
+        if tenant is not None:
+            metrics.observe(f"admission.wait.{tenant}", time.monotonic() - waiter.enqueued)
+
+    def _remove(self, waiter):
+        self._heap = [entry for entry in self._heap if entry[-1] is not waiter]
+        heapq.heapify(self._heap)
+        self.queued[waiter.priority] -= 1
+        self._notify_positions()
+
+    def _release(self, service_seconds, observe=True):
+        if observe:
+            # Скользящее среднее времени обслуживания для оценки ожидания
+            self.service_seconds = 0.8 * self.service_seconds + 0.2 * service_seconds
+        self.active -= 1
+
+        while self._heap and self.active < self.max_concurrency:
+            _, fair_round, _, waiter = heapq.heappop(self._heap)
+            self._round = max(self._round, fair_round)
+            self.queued[waiter.priority] -= 1
+            if waiter.future.done():
+                continue
+            self.active += 1
+            waiter.future.set_result(None)
+
+        self._notify_positions()
+
+    def _notify_positions(self):
+        for position, (*_, waiter) in enumerate(sorted(self._heap), start=1):
+            if waiter.position != position:
+                waiter.position = position
+                if waiter.on_queued is not None:
+                    waiter.on_queued(position, self.estimate_wait(position))
+
+
+@contextmanager
+def unadmitted(kind):
+    """Отмечает запрос к LLM, который идет без места в допуске: сколько таких запросов сейчас и всего"""
+    metrics.incr(f"admission.unadmitted.{kind}")
+    metrics.incr(f"admission.unadmitted.{kind}.active")
+    try:
+        yield
+    finally:
+        metrics.incr(f"admission.unadmitted.{kind}.active", -1)
+
+
+def unadmitted_task(kind, task):
+    """То же для уже запущенной задачи, которая продолжается после освобождения места (учет до ее завершения)"""
+    metrics.incr(f"admission.unadmitted.{kind}")
+    metrics.incr(f"admission.unadmitted.{kind}.active")
+    task.add_done_callback(lambda _: metrics.incr(f"admission.unadmitted.{kind}.active", -1))
+
+
+def unadmitted_active():
+    """Число запросов к LLM, которые сейчас идут без места в допуске"""
+    return sum(metrics.get(f"admission.unadmitted.{kind}.active") for kind in UNADMITTED_KINDS)
+
+
+def format_admission_report(controller):
+    """Форматирует отчет о допуске запросов к LLM"""
+    wait = metrics.summary("admission.wait")
+    extra = unadmitted_active()
+    lines = [
+        f"Сейчас: {controller.active}/{controller.max_concurrency} запросов, в очереди {sum(controller.queued.values())}, "
+        f"вне допуска {extra:.0f} (всего к LLM {controller.active + extra:.0f})",
+        f"Среднее обслуживание: {controller.service_seconds:.1f}с",
+    ]
+    for priority in PRIORITIES:
+        admitted = metrics.get(f"admission.admitted.{priority}")
+        rejected = metrics.get(f"admission.rejected.{priority}")
+        if admitted or rejected:
+            lines.append(f"{priority}: допущено {admitted:.0f}, отклонено {rejected:.0f}")
+    for kind in UNADMITTED_KINDS:
+        total = metrics.get(f"admission.unadmitted.{kind}")
+        if total:
+            lines.append(f"Вне допуска, {kind}: всего {total:.0f}")
+    if wait["count"]:
+        lines.append(f"Ожидание в очереди: p50={wait['p50']:.1f}с p95={wait['p95']:.1f}с")
+    return "\n".join(lines)
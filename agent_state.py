@@ -0,0 +1,117 @@
+import re
+
+from model_router import detect_role
+from tech_parser import parse_response
+
+PROFILE_HEADER_PATTERN = re.compile(
+    r"^(?:Заполнен профайл блока|Профайл блока)\s*['‘’“”\"«]?(.+?)['‘’“”\"»]?\s*(?:\.\s*Текущий статус профайла)?\s*:\s*$",
+    re.IGNORECASE
+)
+PROFILE_FIELD_PATTERN = re.compile(r'^\s*\d+(?:\.\d+)*\.?\s*([^:]+):\s*(.*)$')
+
+# Значение поля профайла, которое считается незаполненным
+EMPTY_FIELD_VALUE = "нет информации"
+
+
+def normalize_block_name(name):
+    """Приводит название блока к виду для сравнения"""
+    name = re.sub(r'[“”"«»‘’\']', '', name or '')
+    name = re.sub(r'^\s*(профайл\s+блока|блок)\s+', '', name, flags=re.IGNORECASE)
+    return re.sub(r'\s+', ' ', name).strip(' .:').lower()
+
+
+def tagged_block(tags):
+    """Блок из тега агента-блока в ответе или None, если тега нет"""
+    block = None
+    for tag in tags:
+        key, _, value = tag.strip().partition(':')
+        if key.strip().lower() == 'агент-блока':
+            block = normalize_block_name(value) or block
+    return block
+
+
+class AgentState:
+    """Структурированное состояние команды агентов, восстановленное из технических тегов"""
+
+    def __init__(self):
+        self.branch = None
+        self.block = None
+        self.final_agent = None
+        self.profiles = {}
+        self.visited_blocks = []
+
+    def update(self, response):
+        """Обновляет состояние по техническим тегам ответа бота"""
+        self.update_from_tags(parse_response(response)[1])
+
+    def update_from_tags(self, tags):
+        """Обновляет состояние по содержимому технических блоков {…}"""
+        for tag in tags:
+            tag = tag.strip()
+            key, _, value = tag.partition(':')
+            key = key.strip().lower()
+
+            if key == 'агент-ветки':
+                self.branch = value.strip()
+            elif key == 'агент-блока':
+                self.set_block(normalize_block_name(value))
+            elif key.startswith('финальный агент'):
+                self.final_agent = detect_role('{' + tag + '}')
+            else:
+                self._update_profile(tag)
+
+    def set_block(self, block):
+        """Переключает текущий блок"""
+        if not block:
+            return
+        self.block = block
+        if block not in self.visited_blocks:
+            self.visited_blocks.append(block)
+
+    def _update_profile(self, tag):
+        """Разбирает технический блок с профайлом и обновляет поля"""
+        lines = tag.split('\n')
+        header = PROFILE_HEADER_PATTERN.match(lines[0].strip())
+        if not header:
+            return
+
+        block = normalize_block_name(header.group(1))
+        profile = self.profiles.setdefault(block, {})
+        for line in lines[1:]:
+            field = PROFILE_FIELD_PATTERN.match(line)
+            if field:
+                profile[field.group(1).strip()] = field.group(2).strip()
+
+    def filled_fields(self, block=None):
+        """Возвращает заполненные поля профайла блока (по умолчанию — текущего)"""
+        profile = self.profiles.get(block or self.block, {})
+        return {
+            field: value for field, value in profile.items()
+            if value and value.lower().strip(' .') != EMPTY_FIELD_VALUE
+        }
+
+    def is_profile_complete(self, block=None):
+        """Проверяет, заполнены ли все поля профайла блока"""
+        profile = self.profiles.get(block or self.block, {})
+        return bool(profile) and len(self.filled_fields(block)) == len(profile)
+
+    def to_dict(self):
+        """Возвращает состояние в виде словаря"""
+        return {
+            "branch": self.branch,
+            "block": self.block,
+            "final_agent": self.final_agent,
+            "profiles": self.profiles,
+            "visited_blocks": self.visited_blocks,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Восстанавливает состояние из словаря to_dict()"""
+        state = cls()
+        state.branch = data.get("branch")
+        state.block = data.get("block")
+        state.final_agent = data.get("final_agent")
+        state.profiles = data.get("profiles") or {}
+        state.visited_blocks = data.get("visited_blocks") or []
+        return state
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк времени запуска: импорт bot.py по данным python -X importtime
+
+Запуск: python bench_startup.py [--runs 5] [--top 15]
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+IMPORTTIME_PATTERN = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s+)(\S+)$')
+
+# Зависимости, которые должны загружаться лениво (не при импорте bot.py)
+LAZY_MODULES = ("openai", "docx", "numpy")
+
+
+def run_importtime(statement):
+    """Выполняет statement в чистом интерпретаторе и возвращает {модуль: (собственное, суммарное в мкс, глубина)}"""
+    env = dict(os.environ)
+    # Токены нужного формата, чтобы bot.py импортировался без настоящих ключей
+    env.setdefault("TELEGRAM_BOT_TOKEN", "123456:BENCHMARK")
+    env.setdefault("OPENAI_API_KEY", "benchmark")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        capture_output=True, text=True, env=env, cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    modules = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_PATTERN.match(line)
+        if match:
+            modules[match.group(4)] = (int(match.group(1)), int(match.group(2)), len(match.group(3)) // 2)
+    return modules
+
+
+def direct_imports(modules):
+    """Суммарное время модулей, которые bot.py импортирует напрямую"""
+    return {name: cumulative for name, (_, cumulative, depth) in modules.items() if depth == 1}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Время запуска бота по python -X importtime")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    runs = [run_importtime("import bot") for _ in range(args.runs)]
+    totals = [run["bot"][1] / 1000 for run in runs]
+    print(f"import bot: медиана {statistics.median(totals):.0f} мс, "
+          f"мин {min(totals):.0f} мс, макс {max(totals):.0f} мс ({args.runs} запусков)")
+
+    print("\nСамые тяжелые импорты bot.py (суммарно, медиана, мс):")
+    names = set().union(*(direct_imports(run) for run in runs))
+    medians = {
+        name: statistics.median(direct_imports(run).get(name, 0) for run in runs) / 1000
+        for name in names
+    }
+    for name, value in sorted(medians.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"  {name:<30} {value:8.1f}")
+
+    print("\nЛенивые зависимости:")
+    for name in LAZY_MODULES:
+        loaded = name in runs[0]
+        own_time = run_importtime(f"import {name}")[name][1] / 1000
+        status = "❌ загружается при запуске" if loaded else "✅ отложена"
+        print(f"  {name:<10} {status}, импорт при первом использовании {own_time:.0f} мс")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,37 @@
 import asyncio
 import logging
 import os
-import re
+import time
+import uuid
+import zipfile
 from datetime import datetime
 from aiogram import Bot, Dispatcher, types
 from aiogram.filters import Command
 from aiogram.types import BotCommand, InlineKeyboardMarkup, InlineKeyboardButton
 from dotenv import load_dotenv
 
+from admission import AdmissionController, AdmissionRejected, format_admission_report
+from agent_state import AgentState
+from candidate_profile import CandidateProfile
+from experiments import Experiments, format_experiment_report, load_variant_stats
+from flood_control import ALLOWED, LIMITED_NOTIFY, MUTED_NOW, TOO_LONG, FloodControl, format_flood_report
+from glossary import Glossary, format_glossary_report
+from hedging import format_hedge_report
+from model_router import detect_role
 from openai_client import OpenAIClient
+from prompt_slicer import format_slicing_report
+from question_dedup import QuestionIndex, format_dedup_report
+from report_archive import ReportArchive, analytics_prompt_version, format_report_row, parse_recommendation, parse_scores, read_report_file
+from response_cache import format_cache_report
+from session_snapshot import InFlightTracker, load_snapshot, save_snapshot
+from tech_parser import parse_response
+from telegram_sender import SenderPool, TelegramSender, format_sender_report
+from transcript_log import TranscriptWriter, message_record, session_record
+from transcript_search import TranscriptSearch, format_search_results
+from turn_templates import TurnTemplates, format_template_report
+from usage_ledger import bind_session
+from vacancies import PROMPT_FILES, VacancyMiddleware, current_vacancy, format_vacancy_report, load_vacancies
+from metrics import metrics
 from document_generator import DocumentGenerator
 
 # Загружаем переменные окружения
@@ -17,8 +40,8 @@ load_dotenv('.env')
 TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 
-if not TELEGRAM_BOT_TOKEN:
-    raise ValueError("TELEGRAM_BOT_TOKEN не найден в переменных окружения")
+# Telegram ID администраторов через запятую (доступ к служебным командам)
+ADMIN_IDS = {int(admin_id) for admin_id in os.getenv('ADMIN_IDS', '').split(',') if admin_id.strip()}
 
 if not OPENAI_API_KEY:
     raise ValueError("OPENAI_API_KEY не найден в переменных окружения")
@@ -27,17 +50,138 @@ if not OPENAI_API_KEY:
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Инициализация бота и диспетчера
-bot = Bot(token=TELEGRAM_BOT_TOKEN)
+# Вакансии: несколько ботов в одном процессе (файл VACANCIES_FILE), без файла — один бот TELEGRAM_BOT_TOKEN.
+# Клиент LLM, допуск к LLM, промты, индексы и построение отчетов общие для всех ботов
+VACANCIES_FILE = os.getenv('VACANCIES_FILE', 'vacancies.json')
+
+vacancies = load_vacancies(VACANCIES_FILE, TELEGRAM_BOT_TOKEN)
+vacancies_by_key = {vacancy.key: vacancy for vacancy in vacancies}
+
+# Инициализация ботов и общего диспетчера
+bots = {vacancy.key: Bot(token=vacancy.token) for vacancy in vacancies}
 dp = Dispatcher()
+dp.update.outer_middleware(VacancyMiddleware({bots[vacancy.key].id: vacancy for vacancy in vacancies}))
 
 # Инициализация клиентов
 openai_client = OpenAIClient()
 doc_generator = DocumentGenerator()
 
-# Словарь для хранения состояния пользователей
+# Лимиты исходящих сообщений Telegram: в секунду на чат (с запасом), в секунду на бота, повторы при RetryAfter
+TELEGRAM_CHAT_RATE = float(os.getenv('TELEGRAM_CHAT_RATE', '1'))
+TELEGRAM_CHAT_BURST = int(os.getenv('TELEGRAM_CHAT_BURST', '3'))
+TELEGRAM_GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', '25'))
+TELEGRAM_MAX_RETRIES = int(os.getenv('TELEGRAM_MAX_RETRIES', '3'))
+
+# Исходящие сообщения идут через очередь с ограничением частоты, своя очередь у каждого бота
+sender = SenderPool(
+    {
+        key: TelegramSender(bot, TELEGRAM_CHAT_RATE, TELEGRAM_CHAT_BURST, TELEGRAM_GLOBAL_RATE, TELEGRAM_MAX_RETRIES)
+        for key, bot in bots.items()
+    },
+    lambda: current_vacancy.get().key
+)
+
+# Допуск к LLM: одновременных запросов, мест в очереди, мест в очереди для новых собеседований
+LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', '8'))
+LLM_MAX_QUEUE = int(os.getenv('LLM_MAX_QUEUE', '40'))
+LLM_MAX_QUEUED_OPENINGS = int(os.getenv('LLM_MAX_QUEUED_OPENINGS', '5'))
+
+# При перегрузке ходы идущих собеседований обслуживаются раньше новых, лишние запросы отклоняются сразу;
+# очередь делится между ботами вакансий по кругу
+admission = AdmissionController(
+    LLM_MAX_CONCURRENCY, LLM_MAX_QUEUE, {"opening": LLM_MAX_QUEUED_OPENINGS},
+    tenant_of=lambda: current_vacancy.get().key
+)
+
+# Защита от флуда: ходов в минуту и подряд, перезапусков /start в час и подряд, длина сообщения, заглушение
+FLOOD_TURNS_PER_MINUTE = float(os.getenv('FLOOD_TURNS_PER_MINUTE', '6'))
+FLOOD_TURN_BURST = int(os.getenv('FLOOD_TURN_BURST', '5'))
+FLOOD_STARTS_PER_HOUR = float(os.getenv('FLOOD_STARTS_PER_HOUR', '10'))
+FLOOD_START_BURST = int(os.getenv('FLOOD_START_BURST', '3'))
+MAX_MESSAGE_CHARS = int(os.getenv('MAX_MESSAGE_CHARS', '2000'))
+FLOOD_VIOLATIONS_TO_MUTE = int(os.getenv('FLOOD_VIOLATIONS_TO_MUTE', '10'))
+FLOOD_MUTE_SECONDS = int(os.getenv('FLOOD_MUTE_SECONDS', '600'))
+
+flood_control = FloodControl(
+    {"turn": (FLOOD_TURNS_PER_MINUTE / 60, FLOOD_TURN_BURST), "start": (FLOOD_STARTS_PER_HOUR / 3600, FLOOD_START_BURST)},
+    MAX_MESSAGE_CHARS,
+    FLOOD_VIOLATIONS_TO_MUTE,
+    FLOOD_MUTE_SECONDS
+)
+
+OVERLOAD_TEXT = "⏳ Сейчас проходит слишком много собеседований. Попробуйте через несколько минут."
+
+# Сколько секунд ждать фоновое обновление профиля кандидата перед построением отчета
+PROFILE_WAIT_SECONDS = float(os.getenv('PROFILE_WAIT_SECONDS', '10'))
+
+# Журнал каждой сессии в JSONL (пустой TRANSCRIPT_DIR — выключено); fsync: none, batch или always
+TRANSCRIPT_DIR = os.getenv('TRANSCRIPT_DIR', 'transcripts')
+TRANSCRIPT_FSYNC = os.getenv('TRANSCRIPT_FSYNC', 'batch')
+TRANSCRIPT_FLUSH_SECONDS = float(os.getenv('TRANSCRIPT_FLUSH_SECONDS', '1'))
+
+transcripts = TranscriptWriter(TRANSCRIPT_DIR, TRANSCRIPT_FSYNC, TRANSCRIPT_FLUSH_SECONDS) if TRANSCRIPT_DIR else None
+
+# Индекс отчетов и упаковка старых отчетов в помесячные архивы (REPORT_RETENTION_DAYS=0 — не упаковывать)
+REPORT_INDEX_PATH = os.getenv('REPORT_INDEX_PATH', 'dialogs/reports.sqlite3')
+REPORT_ARCHIVE_DIR = os.getenv('REPORT_ARCHIVE_DIR', 'dialogs/archive')
+REPORT_RETENTION_DAYS = int(os.getenv('REPORT_RETENTION_DAYS', '30'))
+REPORT_COMPACT_INTERVAL_SECONDS = 24 * 3600
+
+report_archive = ReportArchive(REPORT_INDEX_PATH, REPORT_ARCHIVE_DIR)
+
+# Полнотекстовый индекс ответов кандидатов и аналитики (команда /search)
+SEARCH_INDEX_PATH = os.getenv('SEARCH_INDEX_PATH', 'dialogs/search.sqlite3')
+
+search_index = TranscriptSearch(SEARCH_INDEX_PATH)
+
+# Глоссарий для просьб перевести слово (ответ без запроса к LLM)
+GLOSSARY_PATH = os.getenv('GLOSSARY_PATH', 'glossary.tsv')
+
+glossary = Glossary(GLOSSARY_PATH)
+
+# Приветствие в начале собеседования по шаблону, без запроса к LLM
+TURN_TEMPLATES = os.getenv('TURN_TEMPLATES', '1') == '1'
+
+turn_templates = TurnTemplates()
+
+# A/B-эксперименты над промтами: сессия получает вариант по user_id (файла нет — промты вакансии)
+EXPERIMENTS_FILE = os.getenv('EXPERIMENTS_FILE', 'experiments.json')
+
+experiments = Experiments(EXPERIMENTS_FILE)
+
+# Корректная остановка: сколько секунд ждать начатые ходы и отчеты, куда сохранить сессии
+SHUTDOWN_TIMEOUT_SECONDS = float(os.getenv('SHUTDOWN_TIMEOUT_SECONDS', '25'))
+SESSION_SNAPSHOT_PATH = os.getenv('SESSION_SNAPSHOT_PATH', 'usage/sessions.json')
+
+# Обработчики, которые нужно дождаться при остановке
+in_flight = InFlightTracker()
+dp.update.outer_middleware(in_flight)
+
+# Состояния пользователей по (вакансия, пользователь): один человек может проходить собеседования у разных ботов
 user_states = {}
 
+def state_key(user_id):
+    """Ключ состояния пользователя у бота текущего обновления"""
+    return (current_vacancy.get().key, user_id)
+
+async def load_interview_prompt(interview_type, prompt_file=None):
+    """Загружает промт для типа собеседования: файл варианта эксперимента или промт вакансии (при ошибке — общий prompt.txt)"""
+    try:
+        return await openai_client.load_prompt(prompt_file or current_vacancy.get().prompt_files[interview_type])
+    except Exception as e:
+        logger.error(f"Ошибка загрузки промта {interview_type}: {e}")
+        return await openai_client.load_prompt("prompt.txt")  # Fallback
+
+async def choose_interview_type(user_state, interview_type):
+    """Запоминает тип собеседования и загружает его промт (вариант эксперимента, если тип в эксперименте)"""
+    user_state.interview_type = interview_type
+    user_state.variant, prompt_file = experiments.assign(interview_type, user_state.vacancy, user_state.user_id)
+    user_state.prompt = await load_interview_prompt(interview_type, prompt_file)
+
+def is_admin(user_id):
+    """Проверяет, является ли пользователь администратором"""
+    return user_id in ADMIN_IDS
+
 def create_mode_keyboard():
     """Создает клавиатуру для выбора режима собеседования"""
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
@@ -84,7 +228,8 @@ async def set_commands():
         BotCommand(command="stop", description="Завершить собеседование"),
         BotCommand(command="help", description="Справка")
     ]
-    await bot.set_my_commands(commands)
+    for bot in bots.values():
+        await bot.set_my_commands(commands)
 
 class UserState:
     def __init__(self, user_id):
@@ -97,14 +242,112 @@ class UserState:
         self.interview_type = None  # "soft", "hard", "experience"
         self.name = None
         self.is_setup_complete = False
+        self.agent_state = AgentState()
+        self.candidate_profile = CandidateProfile()
+        self.question_index = QuestionIndex()
+        self.session_id = uuid.uuid4().hex
+        self.vacancy = current_vacancy.get().key
+        self.variant = None  # "эксперимент/вариант" или None
+    
+    def bind_usage(self):
+        """Привязывает запросы к LLM в текущем обработчике к сессии пользователя (учет токенов)"""
+        bind_session(self.session_id, self.user_id, self.interview_mode, self.interview_type, self.variant)
+    
+    def reset_interview(self):
+        """Полностью сбрасывает состояние для нового собеседования"""
+        self.is_interview_active = False
+        self.is_setup_complete = False
+        self.interview_mode = None
+        self.language = None
+        self.interview_type = None
+        self.name = None
+        self.conversation_history = []
+        self.agent_state = AgentState()
+        self.candidate_profile = CandidateProfile()
+        self.question_index = QuestionIndex()
+        self.session_id = uuid.uuid4().hex
+        self.prompt = None
+        self.variant = None
     
     def add_message(self, text, is_bot=False):
-        """Добавляет сообщение в историю диалога"""
-        self.conversation_history.append({
+        """Добавляет сообщение в историю диалога и возвращает его"""
+        message = {
             "text": text,
             "is_bot": is_bot,
             "timestamp": datetime.now()
-        })
+        }
+        
+        # Ответ бота разбирается один раз: текст для пользователя и трасса агентов
+        if is_bot:
+            message["visible_text"], message["agent_trace"] = parse_response(text)
+            self.agent_state.update_from_tags(message["agent_trace"])
+            self.question_index.add(message["visible_text"], self.agent_state.block, detect_role(text))
+        
+        if not self.conversation_history:
+            metrics.incr(f"vacancy.{self.vacancy}.openings")
+        if not is_bot:
+            metrics.incr(f"vacancy.{self.vacancy}.turns")
+        
+        # Реплика сразу уходит в журнал сессии, чтобы пережить аварийную остановку
+        if transcripts is not None:
+            if not self.conversation_history:
+                transcripts.append(self.session_id, session_record(
+                    self.session_id, self.user_id, self.interview_mode, self.interview_type, self.language, self.name,
+                    self.vacancy
+                ))
+            transcripts.append(self.session_id, message_record(message))
+        
+        self.conversation_history.append(message)
+        return message
+    
+    def to_dict(self):
+        """Возвращает состояние для снимка сессий (промт не сохраняется — он загружается по типу собеседования)"""
+        return {
+            "user_id": self.user_id,
+            "conversation_history": [
+                {**msg, "timestamp": msg["timestamp"].isoformat()} for msg in self.conversation_history
+            ],
+            "is_interview_active": self.is_interview_active,
+            "interview_mode": self.interview_mode,
+            "language": self.language,
+            "interview_type": self.interview_type,
+            "name": self.name,
+            "is_setup_complete": self.is_setup_complete,
+            "agent_state": self.agent_state.to_dict(),
+            "candidate_profile": self.candidate_profile.to_dict(),
+            "session_id": self.session_id,
+            "vacancy": self.vacancy,
+            "variant": self.variant,
+        }
+    
+    @classmethod
+    def from_dict(cls, data):
+        """Восстанавливает состояние из снимка to_dict()"""
+        user_state = cls(data["user_id"])
+        user_state.conversation_history = [
+            {**msg, "timestamp": datetime.fromisoformat(msg["timestamp"])} for msg in data["conversation_history"]
+        ]
+        user_state.is_interview_active = data["is_interview_active"]
+        user_state.interview_mode = data["interview_mode"]
+        user_state.language = data["language"]
+        user_state.interview_type = data["interview_type"]
+        user_state.name = data["name"]
+        user_state.is_setup_complete = data["is_setup_complete"]
+        user_state.agent_state = AgentState.from_dict(data["agent_state"])
+        user_state.candidate_profile = CandidateProfile.from_dict(data["candidate_profile"])
+        # Индекс вопросов не сохраняется в снимке: он быстро перестраивается по истории
+        user_state.question_index = QuestionIndex.from_history(user_state.conversation_history)
+        user_state.session_id = data["session_id"]
+        user_state.vacancy = data.get("vacancy", user_state.vacancy)
+        user_state.variant = data.get("variant")
+        return user_state
+    
+    def get_last_bot_text(self):
+        """Возвращает текст последнего сообщения бота (без технической информации)"""
+        for msg in reversed(self.conversation_history):
+            if msg["is_bot"]:
+                return msg["visible_text"]
+        return ""
     
     def get_conversation_history(self):
         """Возвращает историю диалога для OpenAI API"""
@@ -113,81 +356,227 @@ class UserState:
     def filter_technical_info(self, response):
         """Убирает техническую информацию из ответа AI для пользователя"""
         # Всегда удаляем все блоки в фигурных скобках для Telegram
-        filtered_response = re.sub(r'\{[^}]*\}', '', response)
+        return parse_response(response)[0]
+
+
+
+async def finish_interview(message, user_state):
+    """Завершает собеседование: аналитический отчет, DOCX документ и сброс состояния"""
+    user_id = user_state.user_id
+    
+    # Отправляем сообщение о завершении
+    sender.send(message.chat.id, "Завершаю собеседование...")
+    
+    # Генерируем аналитический отчет
+    sender.send(message.chat.id, "Генерирую аналитический отчет...")
+    
+    try:
+        # Дожидаемся фонового обновления профиля по последнему ответу
+        await user_state.candidate_profile.wait(timeout=PROFILE_WAIT_SECONDS)
         
-        # Убираем лишние пустые строки
-        lines = filtered_response.split('\n')
-        filtered_lines = []
+        async with admission.slot("finish"):
+            analytics_report = await openai_client.generate_analytics_report(
+                user_state.get_conversation_history(),
+                candidate_profile=user_state.candidate_profile,
+                agent_state=user_state.agent_state
+            )
         
-        for line in lines:
-            line = line.strip()
-            if line:  # Добавляем только непустые строки
-                filtered_lines.append(line)
+        # Создаем документ
+        doc_generator.generate_report(
+            user_id, 
+            user_state.get_conversation_history(), 
+            analytics_report
+        )
         
-        return '\n'.join(filtered_lines).strip()
+        # Сохраняем документ и добавляем его в индексы отчетов и поиска
+        doc_path = doc_generator.save_document(user_id)
+        await asyncio.to_thread(index_report, user_state, doc_path, analytics_report)
+        
+        # Отправляем документ пользователю
+        with open(doc_path, 'rb') as doc_file:
+            sender.send_document(
+                message.chat.id,
+                types.BufferedInputFile(
+                    doc_file.read(),
+                    filename=f"interview_report_{user_id}.docx"
+                ),
+                caption="Ваш отчет по собеседованию готов!"
+            )
+        
+        # Сохраняем учет токенов завершенной сессии
+        openai_client.ledger.flush()
+        
+        # Полностью сбрасываем состояние пользователя для нового собеседования
+        user_state.reset_interview()
+        
+        sender.send(message.chat.id, "Собеседование завершено. Спасибо за участие!")
+        sender.send(message.chat.id, "Для начала нового собеседования нажмите /start")
+        
+    except AdmissionRejected:
+        # Собеседование остается активным, отчет можно запросить повторно
+        sender.send(message.chat.id, OVERLOAD_TEXT + " Чтобы получить отчет, отправьте /stop еще раз.")
+    except Exception as e:
+        logger.error(f"Ошибка при генерации отчета: {e}")
+        sender.send(message.chat.id, "Извините, произошла ошибка при генерации отчета.")
 
+def index_report(user_state, doc_path, analytics_report):
+    """Добавляет завершенное собеседование в индекс отчетов и полнотекстовый поиск; ошибка индекса не мешает выдаче отчета.
 
+    Вызывается из фонового потока: индексы открывают для записи свои соединения с SQLite.
+    """
+    try:
+        report_archive.add(
+            user_state.user_id, doc_path,
+            interview_mode=user_state.interview_mode,
+            interview_type=user_state.interview_type,
+            recommendation=parse_recommendation(analytics_report),
+            session_id=user_state.session_id,
+            name=user_state.name,
+            language=user_state.language,
+            scores=parse_scores(analytics_report),
+            analysis_version=analytics_prompt_version(vacancies_by_key[user_state.vacancy].analytics_prompt),
+            vacancy=user_state.vacancy,
+            variant=user_state.variant,
+            turns=sum(1 for msg in user_state.get_conversation_history() if not msg["is_bot"])
+        )
+        search_index.add_interview(
+            user_state.session_id, user_state.user_id,
+            user_state.get_conversation_history(),
+            analytics_report,
+            name=user_state.name,
+            interview_mode=user_state.interview_mode,
+            interview_type=user_state.interview_type,
+            language=user_state.language,
+            vacancy=user_state.vacancy
+        )
+    except Exception as e:
+        logger.error(f"Ошибка индексации отчета {doc_path}: {e}")
+
+def passes_flood_control(message, kind):
+    """Проверяет сообщение защитой от флуда; при отказе предупреждает пользователя (не чаще раза за серию)"""
+    verdict = flood_control.check(message.from_user.id, kind, message.text if kind == "turn" else None)
+    if verdict == ALLOWED:
+        return True
+    
+    if verdict == TOO_LONG:
+        sender.send(message.chat.id, f"✂️ Сообщение слишком длинное. Пожалуйста, уложитесь в {MAX_MESSAGE_CHARS} символов.")
+    elif verdict == LIMITED_NOTIFY:
+        sender.send(message.chat.id, "🐢 Слишком много сообщений подряд. Пожалуйста, подождите немного.")
+    elif verdict == MUTED_NOW:
+        sender.send(message.chat.id, f"🔇 Слишком много сообщений. Бот не будет отвечать {FLOOD_MUTE_SECONDS // 60} мин.")
+    return False
+
+def show_queue_position(thinking_message):
+    """Показывает позицию в очереди и оценку ожидания на месте сообщения "Бот думает..." """
+    # Позицию обновляет задача, которая заняла или освободила место, — возможно, другого бота.
+    # Поэтому очередь берется из самого сообщения, а не из current_vacancy
+    placeholder_sender = thinking_message.sender
+
+    def on_queued(position, eta_seconds):
+        placeholder_sender.edit_placeholder(
+            thinking_message,
+            f"⏳ Высокая нагрузка. Вы в очереди: {position}-й, ожидание около {eta_seconds:.0f} с"
+        )
+    return on_queued
+
+def template_greeting(user_state):
+    """Приветствие по шаблону или None, если начало собеседования нужно запросить у LLM"""
+    # Сессии эксперимента начинаются запросом к LLM: так каждая попадает в журнал токенов со своим вариантом.
+    # Каждое приветствие от LLM учитывается в templates.fallback, чтобы доля шаблонов в /stats была верной
+    if not TURN_TEMPLATES or user_state.variant:
+        metrics.incr("templates.fallback")
+        return None
+    prompt_file = vacancies_by_key[user_state.vacancy].prompt_files[user_state.interview_type]
+    return turn_templates.greeting(user_state.interview_mode, user_state.language, user_state.name, prompt_file)
+
+def send_template_greeting(message, user_state):
+    """Отправляет шаблонное приветствие сразу, без "Бот думает..." и очереди к LLM; False — шаблона нет"""
+    greeting = template_greeting(user_state)
+    if greeting is None:
+        return False
+    sender.send(message.chat.id, user_state.add_message(greeting, is_bot=True)["visible_text"])
+    return True
+
+def schedule_profile_update(user_state, last_question, answer):
+    """Обновляет профиль кандидата в фоне, пока кандидат печатает следующий ответ"""
+    user_state.candidate_profile.schedule_update(openai_client, last_question, answer)
 
 @dp.message(Command("start"))
 async def cmd_start(message: types.Message):
     """Обработчик команды /start"""
     user_id = message.from_user.id
     
+    # Частые перезапуски сбрасывают собеседование и стоят запросов к LLM
+    if not passes_flood_control(message, "start"):
+        return
+    
     # Инициализируем состояние пользователя
-    if user_id not in user_states:
-        user_states[user_id] = UserState(user_id)
+    if state_key(user_id) not in user_states:
+        user_states[state_key(user_id)] = UserState(user_id)
     
-    user_state = user_states[user_id]
+    user_state = user_states[state_key(user_id)]
+    user_state.bind_usage()
     
     # Проверяем, есть ли уже выбранные параметры
-    if (user_state.interview_mode and user_state.language and 
-        user_state.interview_type and user_state.name and 
-        user_state.is_setup_complete and not user_state.is_interview_active):
+    resume = (user_state.interview_mode and user_state.language and 
+              user_state.interview_type and user_state.name and 
+              user_state.is_setup_complete and not user_state.is_interview_active)
+    
+    # Шаблонное приветствие не обращается к LLM и отправляется даже при перегрузке
+    if resume and send_template_greeting(message, user_state):
+        user_state.is_interview_active = True
+        return
+    
+    # При перегрузке новые собеседования не начинаются: отказ сразу, без ожидания в очереди
+    if admission.would_reject("opening"):
+        sender.send(message.chat.id, OVERLOAD_TEXT)
+        return
+    
+    if resume:
         # Если параметры выбраны, но собеседование не активно - продолжаем
         user_state.is_interview_active = True
         
         # Убираем приветственное сообщение - сразу начинаем собеседование
         
         # Отправляем сообщение "Бот думает..."
-        thinking_message = await message.answer("🤔 Бот думает...")
+        thinking_message = sender.placeholder(message.chat.id, "🤔 Бот думает...")
         
         # Получаем первое сообщение от AI
         try:
-            first_message = await openai_client.get_response(
-                user_state.prompt,
-                f"Начало собеседования с {user_state.name}",
-                [],
-                user_state.interview_mode,
-                user_state.language,
-                user_state.name,
-                user_state.interview_type
-            )
+            async with admission.slot("opening", show_queue_position(thinking_message)):
+                first_message = await openai_client.get_response(
+                    user_state.prompt,
+                    f"Начало собеседования с {user_state.name}",
+                    [],
+                    user_state.interview_mode,
+                    user_state.language,
+                    user_state.name,
+                    user_state.interview_type,
+                    call_type="opening"
+                )
             
             # Удаляем сообщение "Бот думает..."
-            await thinking_message.delete()
+            sender.delete(thinking_message)
             
-            # Добавляем полный ответ в историю (для DOCX)
-            user_state.add_message(first_message, is_bot=True)
-            
-            # Фильтруем техническую информацию для пользователя
-            filtered_first_message = user_state.filter_technical_info(first_message)
-            await message.answer(filtered_first_message)
+            # Добавляем полный ответ в историю (для DOCX) и получаем
+            # отфильтрованный от технической информации текст для пользователя
+            filtered_first_message = user_state.add_message(first_message, is_bot=True)["visible_text"]
+            sender.send(message.chat.id, filtered_first_message)
             
+        except AdmissionRejected:
+            # Перегрузка: собеседование начнется со следующего сообщения
+            sender.delete(thinking_message)
+            user_state.is_interview_active = False
+            sender.send(message.chat.id, OVERLOAD_TEXT)
         except Exception as e:
             # Удаляем сообщение "Бот думает..." в случае ошибки
-            await thinking_message.delete()
+            sender.delete(thinking_message)
             logger.error(f"Ошибка при получении первого сообщения: {e}")
-            await message.answer("Извините, произошла ошибка при инициализации собеседования.")
+            sender.send(message.chat.id, "Извините, произошла ошибка при инициализации собеседования.")
         return
     
     # Если параметры не выбраны или нужно начать заново - сбрасываем состояние
-    user_state.is_interview_active = False
-    user_state.is_setup_complete = False
-    user_state.interview_mode = None
-    user_state.language = None
-    user_state.interview_type = None
-    user_state.name = None
-    user_state.conversation_history = []
+    user_state.reset_interview()
     
     # Промт будет загружен после выбора типа собеседования
     # Пока оставляем None - загрузим позже
@@ -210,7 +599,7 @@ async def cmd_start(message: types.Message):
 
 Выберите режим:"""
     
-    await message.answer(welcome_text, reply_markup=create_mode_keyboard())
+    sender.send(message.chat.id, welcome_text, reply_markup=create_mode_keyboard())
 
 @dp.message(Command("help"))
 async def cmd_help(message: types.Message):
@@ -228,66 +617,114 @@ async def cmd_help(message: types.Message):
 
 📄 **После завершения вы получите аналитический отчет в формате DOCX**"""
     
-    await message.answer(help_text)
+    sender.send(message.chat.id, help_text)
 
 @dp.message(Command("stop"))
 async def cmd_stop(message: types.Message):
     """Обработчик команды /stop для завершения собеседования"""
     user_id = message.from_user.id
     
-    if user_id not in user_states or not user_states[user_id].is_interview_active:
-        await message.answer("Собеседование не активно. Используйте /start для начала.")
+    if state_key(user_id) not in user_states or not user_states[state_key(user_id)].is_interview_active:
+        sender.send(message.chat.id, "Собеседование не активно. Используйте /start для начала.")
         return
     
-    user_state = user_states[user_id]
+    user_state = user_states[state_key(user_id)]
+    user_state.bind_usage()
     
-    # Отправляем сообщение о завершении
-    await message.answer("Завершаю собеседование...")
+    await finish_interview(message, user_state)
+
+@dp.message(Command("stats"))
+async def cmd_stats(message: types.Message):
+    """Обработчик служебной команды /stats (только для администраторов)"""
+    if not is_admin(message.from_user.id):
+        return
     
-    # Генерируем аналитический отчет
-    await message.answer("Генерирую аналитический отчет...")
+    report = "📊 Маршруты моделей:\n" + openai_client.router.format_report()
+    report += "\n\n⏱ Хеджирование:\n" + format_hedge_report()
+    report += "\n\n✂️ Нарезка промта:\n" + format_slicing_report()
+    report += "\n\n👨‍🏫 Ход преподавателя:\n" + openai_client.format_teacher_report()
+    report += "\n\n🔁 Повторы вопросов:\n" + format_dedup_report()
+    report += "\n\n📝 Шаблонное приветствие:\n" + format_template_report()
+    report += "\n\n📖 Глоссарий:\n" + format_glossary_report()
+    report += "\n\n🏢 Вакансии:\n" + format_vacancy_report(vacancies)
+    # Сравнение вариантов — по индексу отчетов и журналу токенов, поэтому переживает перезапуск
+    openai_client.ledger.flush()
+    variant_stats = await asyncio.to_thread(load_variant_stats, REPORT_INDEX_PATH, openai_client.ledger.path)
+    report += "\n\n🧪 Эксперименты:\n" + format_experiment_report(experiments, variant_stats)
+    report += "\n\n🗄 Кэш ответов:\n" + format_cache_report()
+    report += "\n\n📤 Исходящие сообщения:\n" + format_sender_report()
+    report += "\n\n🚦 Допуск к LLM:\n" + format_admission_report(admission)
+    report += "\n\n🛡 Защита от флуда:\n" + format_flood_report(flood_control)
+    sender.send(message.chat.id, report)
+
+@dp.message(Command("usage"))
+async def cmd_usage(message: types.Message):
+    """Обработчик служебной команды /usage: расход токенов (только для администраторов)"""
+    if not is_admin(message.from_user.id):
+        return
     
-    try:
-        analytics_report = await openai_client.generate_analytics_report(
-            user_state.get_conversation_history()
-        )
-        
-        # Создаем документ
-        doc_generator.generate_report(
-            user_id, 
-            user_state.get_conversation_history(), 
-            analytics_report
+    sender.send(message.chat.id, "💰 Расход токенов:\n" + openai_client.ledger.format_report())
+
+@dp.message(Command("reports"))
+async def cmd_reports(message: types.Message):
+    """Обработчик служебной команды /reports <user_id> [N]: последние отчеты кандидата у вакансии бота (только для администраторов)"""
+    if not is_admin(message.from_user.id):
+        return
+    
+    args = message.text.split()[1:]
+    if not args:
+        sender.send(message.chat.id, "Использование: /reports <user_id> [количество]")
+        return
+    limit = int(args[1]) if len(args) > 1 and args[1].isdigit() else 3
+    
+    reports = await asyncio.to_thread(report_archive.find, user_id=args[0], limit=limit, vacancy=current_vacancy.get().key)
+    if not reports:
+        sender.send(message.chat.id, f"Отчетов пользователя {args[0]} не найдено.")
+        return
+    
+    for report in reports:
+        try:
+            content = await asyncio.to_thread(read_report_file, report)
+        except (OSError, KeyError, zipfile.BadZipFile) as e:
+            logger.error(f"Не удалось прочитать отчет {report['id']}: {e}")
+            sender.send(message.chat.id, f"⚠️ Не удалось прочитать отчет #{report['id']}")
+            continue
+        sender.send_document(
+            message.chat.id,
+            types.BufferedInputFile(content, filename=os.path.basename(report["path"])),
+            caption=format_report_row(report)
         )
-        
-        # Сохраняем документ
-        doc_path = doc_generator.save_document(user_id)
-        
-        # Отправляем документ пользователю
-        with open(doc_path, 'rb') as doc_file:
-            await message.answer_document(
-                types.BufferedInputFile(
-                    doc_file.read(),
-                    filename=f"interview_report_{user_id}.docx"
-                ),
-                caption="Ваш отчет по собеседованию готов!"
-            )
-        
-        # Полностью сбрасываем состояние пользователя для нового собеседования
-        user_state.is_interview_active = False
-        user_state.is_setup_complete = False
-        user_state.interview_mode = None
-        user_state.language = None
-        user_state.interview_type = None
-        user_state.name = None
-        user_state.conversation_history = []
-        user_state.prompt = None
-        
-        await message.answer("Собеседование завершено. Спасибо за участие!")
-        await message.answer("Для начала нового собеседования нажмите /start")
-        
-    except Exception as e:
-        logger.error(f"Ошибка при генерации отчета: {e}")
-        await message.answer("Извините, произошла ошибка при генерации отчета.")
+
+@dp.message(Command("search"))
+async def cmd_search(message: types.Message):
+    """Обработчик служебной команды /search <запрос>: поиск по ответам кандидатов и аналитике вакансии бота (только для администраторов)"""
+    if not is_admin(message.from_user.id):
+        return
+    
+    query = message.text.partition(" ")[2].strip()
+    if not query:
+        sender.send(message.chat.id, 'Использование: /search pytorch "A/B тесты"')
+        return
+    
+    results = await asyncio.to_thread(search_index.search, query, vacancy=current_vacancy.get().key)
+    sender.send(message.chat.id, "🔎 " + format_search_results(results))
+
+@dp.message(Command("shortlist"))
+async def cmd_shortlist(message: types.Message):
+    """Обработчик служебной команды /shortlist [soft|hard|experience] [N]: лучшие кандидаты вакансии бота по оценкам (только для администраторов)"""
+    if not is_admin(message.from_user.id):
+        return
+    
+    # NumPy загружается только при первом вызове команды, а не при запуске бота
+    from candidate_ranking import format_shortlist, load_interviews, rank_candidates
+    
+    args = message.text.split()[1:]
+    interview_type = next((arg for arg in args if arg in PROMPT_FILES), None)
+    top = next((int(arg) for arg in args if arg.isdigit()), 10)
+    
+    table = await asyncio.to_thread(load_interviews, REPORT_INDEX_PATH, current_vacancy.get().key)
+    shortlist = rank_candidates(table, interview_type=interview_type, top=top)
+    sender.send(message.chat.id, "🏆 " + format_shortlist(shortlist, len(table)))
 
 
 @dp.callback_query()
@@ -295,15 +732,22 @@ async def handle_callback(callback: types.CallbackQuery):
     """Обработчик инлайн-кнопок"""
     user_id = callback.from_user.id
     
-    if user_id not in user_states:
+    # Заглушенные пользователи не могут менять настройки собеседования
+    if flood_control.is_muted(user_id):
+        await callback.answer()
+        return
+    
+    if state_key(user_id) not in user_states:
         await callback.answer("Пожалуйста, начните с команды /start")
         return
     
-    user_state = user_states[user_id]
+    user_state = user_states[state_key(user_id)]
     
     if callback.data == "mode_hope":
         user_state.interview_mode = "hope"
-        await callback.message.edit_text(
+        sender.edit_text(
+            callback.message.chat.id,
+            callback.message.message_id,
             "🤝 Выбран режим: Миссис Хоуп\n\n"
             "Теперь выберите язык собеседования:",
             reply_markup=create_language_keyboard()
@@ -313,7 +757,9 @@ async def handle_callback(callback: types.CallbackQuery):
     elif callback.data == "mode_teacher":
         user_state.interview_mode = "teacher"
         user_state.language = "english"  # Преподаватель только на английском
-        await callback.message.edit_text(
+        sender.edit_text(
+            callback.message.chat.id,
+            callback.message.message_id,
             "👨‍🏫 Выбран режим: Преподаватель английского\n\n"
             "Язык собеседования: Английский\n\n"
             "Теперь выберите тип собеседования:",
@@ -323,7 +769,9 @@ async def handle_callback(callback: types.CallbackQuery):
         
     elif callback.data == "lang_russian":
         user_state.language = "russian"
-        await callback.message.edit_text(
+        sender.edit_text(
+            callback.message.chat.id,
+            callback.message.message_id,
             "🇷🇺 Выбран язык: Русский\n\n"
             "Теперь выберите тип собеседования:",
             reply_markup=create_interview_type_keyboard()
@@ -332,7 +780,9 @@ async def handle_callback(callback: types.CallbackQuery):
         
     elif callback.data == "lang_english":
         user_state.language = "english"
-        await callback.message.edit_text(
+        sender.edit_text(
+            callback.message.chat.id,
+            callback.message.message_id,
             "🇬🇧 Выбран язык: Английский\n\n"
             "Теперь выберите тип собеседования:",
             reply_markup=create_interview_type_keyboard()
@@ -340,45 +790,36 @@ async def handle_callback(callback: types.CallbackQuery):
         await callback.answer()
         
     elif callback.data == "type_soft":
-        user_state.interview_type = "soft"
         # Загружаем правильный промт для Soft Skills
-        try:
-            user_state.prompt = await openai_client.load_prompt("Промт Soft Skills нейро-рекрутера для собеседований.txt")
-        except Exception as e:
-            logger.error(f"Ошибка загрузки промта Soft Skills: {e}")
-            user_state.prompt = await openai_client.load_prompt("prompt.txt")  # Fallback
+        await choose_interview_type(user_state, "soft")
         
-        await callback.message.edit_text(
+        sender.edit_text(
+            callback.message.chat.id,
+            callback.message.message_id,
             "💬 Выбран тип: Soft Skills (мягкие навыки)\n\n"
             "Как я могу к вам обращаться? (Введите ваше имя)"
         )
         await callback.answer()
         
     elif callback.data == "type_hard":
-        user_state.interview_type = "hard"
         # Загружаем правильный промт для Hard Skills
-        try:
-            user_state.prompt = await openai_client.load_prompt("Промт Hard Skills нейро-рекрутера для собеседований.txt")
-        except Exception as e:
-            logger.error(f"Ошибка загрузки промта Hard Skills: {e}")
-            user_state.prompt = await openai_client.load_prompt("prompt.txt")  # Fallback
+        await choose_interview_type(user_state, "hard")
         
-        await callback.message.edit_text(
+        sender.edit_text(
+            callback.message.chat.id,
+            callback.message.message_id,
             "💻 Выбран тип: Hard Skills (технические навыки)\n\n"
             "Как я могу к вам обращаться? (Введите ваше имя)"
         )
         await callback.answer()
         
     elif callback.data == "type_experience":
-        user_state.interview_type = "experience"
         # Загружаем правильный промт для Experience
-        try:
-            user_state.prompt = await openai_client.load_prompt("prompt.txt")
-        except Exception as e:
-            logger.error(f"Ошибка загрузки промта Experience: {e}")
-            user_state.prompt = await openai_client.load_prompt("prompt.txt")  # Fallback
+        await choose_interview_type(user_state, "experience")
         
-        await callback.message.edit_text(
+        sender.edit_text(
+            callback.message.chat.id,
+            callback.message.message_id,
             "📋 Выбран тип: Experience (опыт работы)\n\n"
             "Как я могу к вам обращаться? (Введите ваше имя)"
         )
@@ -389,14 +830,20 @@ async def handle_callback(callback: types.CallbackQuery):
 async def handle_message(message: types.Message):
     """Обработчик всех текстовых сообщений"""
     user_id = message.from_user.id
+    
+    # Флуд и слишком длинные сообщения отсекаются до сборки промта
+    if not passes_flood_control(message, "turn"):
+        return
+    
     user_text = message.text.strip().lower()
     
     # Проверяем, есть ли пользователь в системе
-    if user_id not in user_states:
-        await message.answer("Пожалуйста, начните собеседование командой /start")
+    if state_key(user_id) not in user_states:
+        sender.send(message.chat.id, "Пожалуйста, начните собеседование командой /start")
         return
     
-    user_state = user_states[user_id]
+    user_state = user_states[state_key(user_id)]
+    user_state.bind_usage()
     
     # Если настройка не завершена, обрабатываем ввод имени
     if not user_state.is_setup_complete and user_state.interview_type and user_state.interview_mode and user_state.language:
@@ -406,28 +853,44 @@ async def handle_message(message: types.Message):
         
         # Убираем приветственное сообщение - сразу начинаем собеседование
         
+        # Шаблонное приветствие отправляется сразу, без очереди к LLM
+        if send_template_greeting(message, user_state):
+            return
+        
+        # Отправляем сообщение "Бот думает..." (на его месте показывается позиция в очереди)
+        thinking_message = sender.placeholder(message.chat.id, "🤔 Бот думает...")
+        
         # Получаем первое сообщение от AI
         try:
-            first_message = await openai_client.get_response(
-                user_state.prompt,
-                f"Начало собеседования с {user_state.name}",
-                [],
-                user_state.interview_mode,
-                user_state.language,
-                user_state.name,
-                user_state.interview_type
-            )
+            async with admission.slot("opening", show_queue_position(thinking_message)):
+                first_message = await openai_client.get_response(
+                    user_state.prompt,
+                    f"Начало собеседования с {user_state.name}",
+                    [],
+                    user_state.interview_mode,
+                    user_state.language,
+                    user_state.name,
+                    user_state.interview_type,
+                    call_type="opening"
+                )
             
-            # Добавляем полный ответ в историю (для DOCX)
-            user_state.add_message(first_message, is_bot=True)
+            # Удаляем сообщение "Бот думает..."
+            sender.delete(thinking_message)
             
-            # Фильтруем техническую информацию для пользователя
-            filtered_first_message = user_state.filter_technical_info(first_message)
-            await message.answer(filtered_first_message)
+            # Добавляем полный ответ в историю (для DOCX) и получаем
+            # отфильтрованный от технической информации текст для пользователя
+            filtered_first_message = user_state.add_message(first_message, is_bot=True)["visible_text"]
+            sender.send(message.chat.id, filtered_first_message)
             
+        except AdmissionRejected:
+            # Перегрузка: собеседование начнется со следующего сообщения
+            sender.delete(thinking_message)
+            user_state.is_interview_active = False
+            sender.send(message.chat.id, OVERLOAD_TEXT)
         except Exception as e:
+            sender.delete(thinking_message)
             logger.error(f"Ошибка при получении первого сообщения: {e}")
-            await message.answer("Извините, произошла ошибка при инициализации собеседования.")
+            sender.send(message.chat.id, "Извините, произошла ошибка при инициализации собеседования.")
         return
     
     # Проверяем, есть ли активное собеседование
@@ -438,140 +901,216 @@ async def handle_message(message: types.Message):
             
             # Убираем приветственное сообщение - сразу начинаем собеседование
             
+            # Шаблонное приветствие отправляется сразу, без очереди к LLM
+            if send_template_greeting(message, user_state):
+                return
+            
             # Отправляем сообщение "Бот думает..."
-            thinking_message = await message.answer("🤔 Бот думает...")
+            thinking_message = sender.placeholder(message.chat.id, "🤔 Бот думает...")
             
             # Получаем первое сообщение от AI
             try:
-                first_message = await openai_client.get_response(
-                    user_state.prompt,
-                    f"Начало собеседования с {user_state.name}",
-                    [],
-                    user_state.interview_mode,
-                    user_state.language,
-                    user_state.name,
-                    user_state.interview_type
-                )
+                async with admission.slot("opening", show_queue_position(thinking_message)):
+                    first_message = await openai_client.get_response(
+                        user_state.prompt,
+                        f"Начало собеседования с {user_state.name}",
+                        [],
+                        user_state.interview_mode,
+                        user_state.language,
+                        user_state.name,
+                        user_state.interview_type,
+                        call_type="opening"
+                    )
                 
                 # Удаляем сообщение "Бот думает..."
-                await thinking_message.delete()
-                
-                # Добавляем полный ответ в историю (для DOCX)
-                user_state.add_message(first_message, is_bot=True)
+                sender.delete(thinking_message)
                 
-                # Фильтруем техническую информацию для пользователя
-                filtered_first_message = user_state.filter_technical_info(first_message)
-                await message.answer(filtered_first_message)
+                # Добавляем полный ответ в историю (для DOCX) и получаем
+                # отфильтрованный от технической информации текст для пользователя
+                filtered_first_message = user_state.add_message(first_message, is_bot=True)["visible_text"]
+                sender.send(message.chat.id, filtered_first_message)
                 
+            except AdmissionRejected:
+                # Перегрузка: собеседование начнется со следующего сообщения
+                sender.delete(thinking_message)
+                user_state.is_interview_active = False
+                sender.send(message.chat.id, OVERLOAD_TEXT)
             except Exception as e:
                 # Удаляем сообщение "Бот думает..." в случае ошибки
-                await thinking_message.delete()
+                sender.delete(thinking_message)
                 logger.error(f"Ошибка при получении первого сообщения: {e}")
-                await message.answer("Извините, произошла ошибка при инициализации собеседования.")
+                sender.send(message.chat.id, "Извините, произошла ошибка при инициализации собеседования.")
             return
         else:
             # Если настройка не завершена, показываем инструкцию
-            await message.answer("Пожалуйста, завершите настройку собеседования, выбрав режим, язык и тип собеседования.")
+            sender.send(message.chat.id, "Пожалуйста, завершите настройку собеседования, выбрав режим, язык и тип собеседования.")
             return
     
     # Проверяем, не хочет ли пользователь завершить собеседование
     if user_text in ["стоп", "stop", "завершить", "конец", "закончить"]:
-        await message.answer("Завершаю собеседование...")
-        
-        # Генерируем аналитический отчет
-        await message.answer("Генерирую аналитический отчет...")
-        
-        try:
-            analytics_report = await openai_client.generate_analytics_report(
-                user_state.get_conversation_history()
-            )
-            
-            # Создаем документ
-            doc_generator.generate_report(
-                user_id, 
-                user_state.get_conversation_history(), 
-                analytics_report
-            )
-            
-            # Сохраняем документ
-            doc_path = doc_generator.save_document(user_id)
-            
-            # Отправляем документ пользователю
-            with open(doc_path, 'rb') as doc_file:
-                await message.answer_document(
-                    types.BufferedInputFile(
-                        doc_file.read(),
-                        filename=f"interview_report_{user_id}.docx"
-                    ),
-                    caption="Ваш отчет по собеседованию готов!"
-                )
-            
-            # Полностью сбрасываем состояние пользователя для нового собеседования
-            user_state.is_interview_active = False
-            user_state.is_setup_complete = False
-            user_state.interview_mode = None
-            user_state.language = None
-            user_state.interview_type = None
-            user_state.name = None
-            user_state.conversation_history = []
-            user_state.prompt = None
-            
-            await message.answer("Собеседование завершено. Спасибо за участие!")
-            await message.answer("Для начала нового собеседования нажмите /start")
-            return
-            
-        except Exception as e:
-            logger.error(f"Ошибка при генерации отчета: {e}")
-            await message.answer("Извините, произошла ошибка при генерации отчета.")
-            return
+        await finish_interview(message, user_state)
+        return
+    
+    # Вопрос, на который отвечает кандидат (для фонового обновления профиля)
+    last_question = user_state.get_last_bot_text()
     
     # Добавляем сообщение пользователя в историю (используем оригинальный текст)
     user_state.add_message(message.text, is_bot=False)
     
+    # Просьба перевести слово из глоссария: ответ сразу, без запроса к LLM (остальные просьбы — как обычно)
+    translation = glossary.answer(message.text, user_state.language, last_question)
+    if translation is not None:
+        sender.send(message.chat.id, user_state.add_message(translation, is_bot=True)["visible_text"])
+        return
+    
     # Отправляем сообщение "Бот думает..."
-    thinking_message = await message.answer("🤔 Бот думает...")
+    thinking_message = sender.placeholder(message.chat.id, "🤔 Бот думает...")
     
     try:
+        # В режиме преподавателя разбор ошибок и следующий вопрос запрашиваются параллельно:
+        # разбор отправляется сразу, как только готов, вопрос — следом
+        if user_state.interview_mode == "teacher" and openai_client.teacher_split:
+            thinking_deleted = False
+            async with admission.slot("turn", show_queue_position(thinking_message)):
+                async for bot_response in openai_client.get_teacher_turn(
+                    user_state.prompt,
+                    message.text,
+                    user_state.get_conversation_history()[:-1],  # Исключаем текущее сообщение
+                    user_state.name,
+                    user_state.interview_type,
+                    agent_state=user_state.agent_state,
+                    question_index=user_state.question_index
+                ):
+                    if not thinking_deleted:
+                        sender.delete(thinking_message)
+                        thinking_deleted = True
+                    
+                    filtered_response = user_state.add_message(bot_response, is_bot=True)["visible_text"]
+                    sender.send(message.chat.id, filtered_response)
+            
+            schedule_profile_update(user_state, last_question, message.text)
+            return
+        
         # Получаем ответ от AI
-        bot_response = await openai_client.get_response(
-            user_state.prompt,
-            message.text,
-            user_state.get_conversation_history()[:-1],  # Исключаем текущее сообщение
-            user_state.interview_mode,
-            user_state.language,
-            user_state.name,
-            user_state.interview_type
-        )
+        async with admission.slot("turn", show_queue_position(thinking_message)):
+            bot_response = await openai_client.get_response(
+                user_state.prompt,
+                message.text,
+                user_state.get_conversation_history()[:-1],  # Исключаем текущее сообщение
+                user_state.interview_mode,
+                user_state.language,
+                user_state.name,
+                user_state.interview_type,
+                agent_state=user_state.agent_state,
+                question_index=user_state.question_index
+            )
         
         # Удаляем сообщение "Бот думает..."
-        await thinking_message.delete()
-        
-        # Добавляем полный ответ бота в историю (для DOCX)
-        user_state.add_message(bot_response, is_bot=True)
+        sender.delete(thinking_message)
         
-        # Фильтруем техническую информацию для пользователя
-        filtered_response = user_state.filter_technical_info(bot_response)
+        # Добавляем полный ответ бота в историю (для DOCX) и получаем
+        # отфильтрованный от технической информации текст для пользователя
+        filtered_response = user_state.add_message(bot_response, is_bot=True)["visible_text"]
         
         # Отправляем отфильтрованный ответ пользователю
-        await message.answer(filtered_response)
+        sender.send(message.chat.id, filtered_response)
         
+        # Пока кандидат печатает, дополняем его профиль в фоне
+        schedule_profile_update(user_state, last_question, message.text)
+        
+    except AdmissionRejected:
+        # Ответ не получен: убираем сообщение кандидата из истории, чтобы его можно было отправить повторно
+        sender.delete(thinking_message)
+        user_state.conversation_history.pop()
+        sender.send(message.chat.id, OVERLOAD_TEXT + " Отправьте ваш ответ еще раз чуть позже.")
     except Exception as e:
-        # Удаляем сообщение "Бот думает..." в случае ошибки
-        await thinking_message.delete()
+        # Удаляем сообщение "Бот думает..." в случае ошибки (повторное удаление игнорируется)
+        sender.delete(thinking_message)
         logger.error(f"Ошибка при обработке сообщения: {e}")
-        await message.answer(
+        sender.send(
+            message.chat.id,
             "Извините, произошла ошибка при обработке вашего сообщения. Попробуйте еще раз."
         )
 
+async def restore_sessions():
+    """Восстанавливает собеседования, сохраненные при предыдущей остановке"""
+    for data in load_snapshot(SESSION_SNAPSHOT_PATH):
+        user_state = UserState.from_dict(data)
+        vacancy = vacancies_by_key.get(user_state.vacancy)
+        if vacancy is None:
+            logger.warning(f"Сессия пользователя {user_state.user_id}: вакансии {user_state.vacancy} больше нет в настройках")
+            continue
+        # Вариант снятого эксперимента продолжается с промтом вакансии и не попадает в сравнение
+        if experiments.prompt_file(user_state.variant) is None:
+            user_state.variant = None
+        if user_state.interview_type:
+            token = current_vacancy.set(vacancy)
+            try:
+                user_state.prompt = await load_interview_prompt(
+                    user_state.interview_type, experiments.prompt_file(user_state.variant)
+                )
+            finally:
+                current_vacancy.reset(token)
+        user_states[(user_state.vacancy, user_state.user_id)] = user_state
+    if user_states:
+        logger.info(f"Восстановлено сессий: {len(user_states)}")
+
+@dp.shutdown()
+async def on_shutdown():
+    """Корректная остановка: новые сообщения уже не принимаются, дожидаемся начатых и сохраняем состояние"""
+    deadline = time.monotonic() + SHUTDOWN_TIMEOUT_SECONDS
+    logger.info(f"Остановка: ожидаем обработку {len(in_flight.tasks)} сообщений...")
+    
+    # Начатые ходы и отчеты (включая ожидание в очереди к LLM)
+    unfinished = await in_flight.drain(deadline - time.monotonic())
+    if unfinished:
+        logger.warning(f"Не успели завершиться за {SHUTDOWN_TIMEOUT_SECONDS:.0f} с: {unfinished}")
+    
+    # Фоновые обновления профилей кандидатов
+    await asyncio.gather(*(
+        user_state.candidate_profile.wait(timeout=max(deadline - time.monotonic(), 0))
+        for user_state in user_states.values()
+    ))
+    
+    # Сообщения, еще не отправленные в Telegram
+    if not await sender.drain(timeout=max(deadline - time.monotonic(), 0)):
+        logger.warning(f"Не отправлено сообщений: {sender.pending()}")
+    
+    if transcripts is not None:
+        await transcripts.close()
+    openai_client.ledger.flush()
+    save_snapshot(SESSION_SNAPSHOT_PATH, [user_state.to_dict() for user_state in user_states.values()])
+    logger.info(f"Состояние сохранено: {len(user_states)} сессий")
+
+async def compact_reports_periodically():
+    """Раз в сутки упаковывает отчеты старше REPORT_RETENTION_DAYS в помесячные архивы"""
+    while True:
+        try:
+            compacted = await asyncio.to_thread(report_archive.compact, REPORT_RETENTION_DAYS)
+            if compacted:
+                logger.info(f"Упаковано старых отчетов: {compacted}")
+        except Exception as e:
+            logger.error(f"Ошибка упаковки отчетов: {e}")
+        await asyncio.sleep(REPORT_COMPACT_INTERVAL_SECONDS)
+
 async def main():
     """Главная функция"""
     logger.info("Запуск бота...")
     
+    # Продолжаем собеседования, прерванные перезапуском
+    await restore_sessions()
+    
+    # Клиент OpenAI готовится в фоне, не задерживая начало приема сообщений
+    asyncio.ensure_future(openai_client.warm_up())
+    
+    if REPORT_RETENTION_DAYS > 0:
+        asyncio.ensure_future(compact_reports_periodically())
+    
     # Устанавливаем команды бота
     await set_commands()
 
-    # Запускаем бота
-    await dp.start_polling(bot)
+    # Запускаем бота (SIGTERM/SIGINT останавливают прием обновлений и вызывают on_shutdown)
+    await dp.start_polling(*bots.values(), handle_signals=True)
 
 if __name__ == "__main__":
     asyncio.run(main())
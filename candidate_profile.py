@@ -0,0 +1,104 @@
+import asyncio
+import json
+import re
+
+# Разделы профиля кандидата (совпадают с разделами аналитического отчета)
+PROFILE_SECTIONS = {
+    "education": "Образование",
+    "experience": "Опыт работы",
+    "projects": "Проекты",
+    "tech_stack": "Технические навыки",
+    "soft_skills": "Soft Skills",
+}
+
+# Промт агента, извлекающего факты о кандидате из одного ответа
+PROFILE_UPDATE_PROMPT = """Ты - агент, который ведет краткий профиль кандидата на собеседовании.
+По вопросу рекрутера и ответу кандидата выпиши НОВЫЕ факты о кандидате в формате JSON:
+{"education": [], "experience": [], "projects": [], "tech_stack": [], "soft_skills": []}
+education - образование, experience - опыт работы, projects - проекты и результаты,
+tech_stack - языки, фреймворки, библиотеки и технологии, soft_skills - наблюдения о коммуникации, командной работе, мотивации.
+Каждый факт - короткая строка. Если фактов нет, оставь списки пустыми. Ответь только JSON."""
+
+JSON_PATTERN = re.compile(r'\{.*\}', re.S)
+
+
+def parse_profile_update(text):
+    """Извлекает JSON с новыми фактами из ответа модели"""
+    match = JSON_PATTERN.search(text or '')
+    if not match:
+        return {}
+    try:
+        data = json.loads(match.group())
+    except ValueError:
+        return {}
+    return {
+        key: [str(item).strip() for item in data.get(key) or [] if str(item).strip()]
+        for key in PROFILE_SECTIONS
+    }
+
+
+class CandidateProfile:
+    """Профиль кандидата, который дополняется в фоне после каждого ответа"""
+
+    def __init__(self):
+        self.sections = {key: [] for key in PROFILE_SECTIONS}
+        self.updates = 0
+        self._task = None
+
+    def merge(self, update):
+        """Добавляет новые факты, пропуская повторы"""
+        for key, items in update.items():
+            if key not in self.sections:
+                continue
+            known = {item.lower() for item in self.sections[key]}
+            for item in items:
+                if item.lower() not in known:
+                    self.sections[key].append(item)
+                    known.add(item.lower())
+        self.updates += 1
+
+    def schedule_update(self, openai_client, last_question, answer):
+        """Запускает фоновое обновление профиля; обновления выполняются по очереди"""
+        previous = self._task
+
+        async def run():
+            if previous is not None:
+                await asyncio.gather(previous, return_exceptions=True)
+            update = await openai_client.extract_profile_update(last_question, answer)
+            if update:
+                self.merge(update)
+
+        self._task = asyncio.ensure_future(run())
+        return self._task
+
+    async def wait(self, timeout=None):
+        """Дожидается незавершенных обновлений (не дольше timeout секунд)"""
+        if self._task is None or self._task.done():
+            return
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def is_empty(self):
+        return not any(self.sections.values())
+
+    def to_text(self):
+        """Форматирует профиль для аналитического агента"""
+        lines = []
+        for key, title in PROFILE_SECTIONS.items():
+            lines.append(f"{title}:")
+            items = self.sections[key] or ["Нет информации"]
+            lines.extend(f"- {item}" for item in items)
+        return "\n".join(lines)
+
+    def to_dict(self):
+        return {"sections": self.sections, "updates": self.updates}
+
+    @classmethod
+    def from_dict(cls, data):
+        """Восстанавливает профиль из словаря to_dict()"""
+        profile = cls()
+        profile.merge(data.get("sections") or {})
+        profile.updates = data.get("updates", 0)
+        return profile
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Ранжирование кандидатов по оценкам из аналитических отчетов (NumPy)
+
+Короткий список:  python candidate_ranking.py --type hard --language russian --since 2024-01-01 \
+                      --weights technical=2,experience=1.5 --top 20 [--vacancy default]
+Бенчмарк:         python candidate_ranking.py --bench 100000
+"""
+
+import argparse
+import os
+import sqlite3
+import time
+
+import numpy as np
+
+from report_archive import SCORE_SECTIONS
+
+SECTIONS = tuple(SCORE_SECTIONS.values())
+
+# Коды рекомендаций: при равных оценках выше стоит лучшая рекомендация
+RECOMMENDATION_CODES = {"отклонить": 0, "рассмотреть": 1, "принять": 2}
+NO_RECOMMENDATION = -1
+
+
+class InterviewTable:
+    """Все проиндексированные собеседования в виде столбцов NumPy.
+
+    Текстовые признаки хранятся кодами (interview_types[codes] — исходные значения),
+    оценки — матрицей (собеседования × разделы) с NaN на месте пропущенных.
+    """
+
+    def __init__(self, ids, user_ids, names, created_at, interview_types, languages, recommendations, scores):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.user_ids = np.asarray(user_ids, dtype=object)
+        self.names = np.asarray(names, dtype=object)
+        self.created_at = np.asarray(created_at, dtype="datetime64[s]")
+        self.interview_types, self.type_codes = np.unique(np.asarray(interview_types, dtype=str), return_inverse=True)
+        self.languages, self.language_codes = np.unique(np.asarray(languages, dtype=str), return_inverse=True)
+        self.recommendations = np.asarray(recommendations, dtype=np.int8)
+        self.scores = np.asarray(scores, dtype=np.float32).reshape(len(self.ids), len(SECTIONS))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def code_of(self, values, value):
+        """Код текстового значения или -1, если такого нет (фильтр тогда ничего не пропускает)"""
+        position = np.searchsorted(values, value)
+        return int(position) if position < len(values) and values[position] == value else -1
+
+
+def load_interviews(path="dialogs/reports.sqlite3", vacancy=None):
+    """Загружает оценки и рекомендации отчетов из индекса report_archive одним запросом (vacancy — только одной вакансии)"""
+    connection = sqlite3.connect(path)
+    try:
+        rows = connection.execute(
+            f"""SELECT id, user_id, COALESCE(name, ''), created_at, COALESCE(interview_type, ''),
+                       COALESCE(language, ''), COALESCE(recommendation, ''),
+                       {", ".join(f"score_{section}" for section in SECTIONS)}
+                FROM reports{" WHERE vacancy = ?" if vacancy is not None else ""}""",
+            () if vacancy is None else (vacancy,)
+        ).fetchall()
+    finally:
+        connection.close()
+
+    if not rows:
+        return InterviewTable([], [], [], [], [], [], [], np.empty((0, len(SECTIONS))))
+
+    columns = list(zip(*rows))
+    recommendations = [RECOMMENDATION_CODES.get(value, NO_RECOMMENDATION) for value in columns[6]]
+    # None (нет оценки) становится NaN
+    scores = np.array(columns[7:], dtype=np.float32).T
+    return InterviewTable(
+        columns[0], columns[1], columns[2], columns[3], columns[4], columns[5], recommendations, scores
+    )
+
+
+def weighted_scores(scores, weights):
+    """Взвешенное среднее оценок по строкам; пропущенные разделы не учитываются, строки без оценок — NaN"""
+    present = ~np.isnan(scores)
+    total_weight = (present * weights).sum(axis=1)
+    weighted = np.where(present, scores, 0).dot(weights)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(total_weight > 0, weighted / total_weight, np.nan)
+
+
+def percentile_ranks(values):
+    """Процентиль каждого значения среди всех (100 — лучший); равные значения получают одинаковый процентиль"""
+    if len(values) < 2:
+        return np.full(len(values), 100.0)
+    sorted_values = np.sort(values)
+    below = np.searchsorted(sorted_values, values, side="left")
+    equal = np.searchsorted(sorted_values, values, side="right") - below
+    return (below + (equal - 1) / 2) / (len(values) - 1) * 100
+
+
+def rank_candidates(table, weights=None, interview_type=None, language=None, since=None, until=None,
+                    min_recommendation=None, top=20, best_per_user=True):
+    """Короткий список: фильтры, взвешенная оценка, процентиль среди отобранных, лучшие top.
+
+    weights — {section: вес}, неуказанные разделы имеют вес 1. При равной оценке выше стоит
+    лучшая рекомендация, затем более позднее собеседование. best_per_user оставляет одно
+    лучшее собеседование каждого кандидата.
+    """
+    weight_vector = np.array([(weights or {}).get(section, 1.0) for section in SECTIONS], dtype=np.float32)
+
+    mask = np.ones(len(table), dtype=bool)
+    if interview_type is not None:
+        mask &= table.type_codes == table.code_of(table.interview_types, interview_type)
+    if language is not None:
+        mask &= table.language_codes == table.code_of(table.languages, language)
+    if since is not None:
+        mask &= table.created_at >= np.datetime64(since, "s")
+    if until is not None:
+        mask &= table.created_at < np.datetime64(until, "s")
+    if min_recommendation is not None:
+        mask &= table.recommendations >= RECOMMENDATION_CODES[min_recommendation]
+
+    indices = np.flatnonzero(mask)
+    totals = weighted_scores(table.scores[indices], weight_vector)
+    scored = ~np.isnan(totals)
+    indices, totals = indices[scored], totals[scored]
+    percentiles = percentile_ranks(totals)
+
+    # Сортировка по убыванию: оценка, рекомендация, дата (последний ключ lexsort — главный)
+    order = np.lexsort((-table.created_at[indices].astype(np.int64), -table.recommendations[indices], -totals))
+    if best_per_user:
+        _, first = np.unique(table.user_ids[indices[order]].astype(str), return_index=True)
+        order = order[np.sort(first)]
+    order = order[:top]
+
+    shortlist = []
+    for position in order:
+        row = indices[position]
+        shortlist.append({
+            "report_id": int(table.ids[row]),
+            "user_id": table.user_ids[row],
+            "name": table.names[row],
+            "created_at": str(table.created_at[row]).replace("T", " "),
+            "interview_type": str(table.interview_types[table.type_codes[row]]),
+            "language": str(table.languages[table.language_codes[row]]),
+            "recommendation": next(
+                (name for name, code in RECOMMENDATION_CODES.items() if code == table.recommendations[row]), None
+            ),
+            "score": float(totals[position]),
+            "percentile": float(percentiles[position]),
+            "scores": {
+                section: float(value) for section, value in zip(SECTIONS, table.scores[row]) if not np.isnan(value)
+            },
+        })
+    return shortlist
+
+
+def format_shortlist(shortlist, pool_size=None):
+    """Короткий список для CLI и /shortlist"""
+    if not shortlist:
+        return "Нет кандидатов с оценками по этим условиям."
+
+    lines = ["Короткий список" + (f" (собеседований в индексе: {pool_size}):" if pool_size is not None else ":")]
+    for rank, candidate in enumerate(shortlist, 1):
+        lines.append(
+            f"{rank}. {candidate['name'] or 'без имени'} (пользователь {candidate['user_id']}), "
+            f"оценка {candidate['score']:.1f}, процентиль {candidate['percentile']:.0f}, "
+            f"рекомендация: {candidate['recommendation'] or '—'}, {candidate['interview_type'] or '—'}, "
+            f"{candidate['created_at'][:10]}, отчет #{candidate['report_id']}"
+        )
+    return "\n".join(lines)
+
+
+def parse_weights(text):
+    """Веса из строки вида technical=2,experience=1.5"""
+    weights = {}
+    for item in filter(None, (part.strip() for part in text.split(","))):
+        section, _, value = item.partition("=")
+        if section not in SECTIONS:
+            raise ValueError(f"Неизвестный раздел {section}; доступны: {', '.join(SECTIONS)}")
+        weights[section] = float(value)
+    return weights
+
+
+def synthetic_table(size, seed=0):
+    """Случайная таблица заданного размера для бенчмарка"""
+    generator = np.random.default_rng(seed)
+    scores = generator.integers(0, 11, (size, len(SECTIONS))).astype(np.float32)
+    scores[generator.random((size, len(SECTIONS))) < 0.1] = np.nan
+    return InterviewTable(
+        np.arange(size),
+        generator.integers(0, size // 2 + 1, size).astype(str),
+        np.full(size, ""),
+        np.datetime64("2024-01-01T00:00:00") + generator.integers(0, 365 * 86400, size).astype("timedelta64[s]"),
+        generator.choice(["soft", "hard", "experience"], size),
+        generator.choice(["russian", "english"], size),
+        generator.integers(-1, 3, size),
+        scores
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Короткий список кандидатов по оценкам из отчетов")
+    parser.add_argument("--index", default=os.getenv("REPORT_INDEX_PATH", "dialogs/reports.sqlite3"))
+    parser.add_argument("--type", dest="interview_type", choices=["soft", "hard", "experience"])
+    parser.add_argument("--language", choices=["russian", "english"])
+    parser.add_argument("--vacancy", help="Только собеседования этой вакансии (key из vacancies.json)")
+    parser.add_argument("--since", help="Дата начала, например 2024-01-01")
+    parser.add_argument("--until", help="Дата окончания (не включая)")
+    parser.add_argument("--min-recommendation", choices=list(RECOMMENDATION_CODES))
+    parser.add_argument("--weights", type=parse_weights, default=None, help=f"Веса разделов: {', '.join(SECTIONS)}")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--all-interviews", action="store_true", help="Не схлопывать собеседования одного кандидата")
+    parser.add_argument("--bench", type=int, metavar="N", help="Ранжировать N случайных собеседований и замерить время")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    table = synthetic_table(args.bench) if args.bench else load_interviews(args.index, args.vacancy)
+    loaded = time.perf_counter()
+    shortlist = rank_candidates(
+        table, args.weights, args.interview_type, args.language, args.since, args.until,
+        args.min_recommendation, args.top, not args.all_interviews
+    )
+    ranked = time.perf_counter()
+
+    print(format_shortlist(shortlist, len(table)))
+    print(f"\n⏱ загрузка {(loaded - started) * 1000:.0f} мс, ранжирование {(ranked - loaded) * 1000:.0f} мс")
+
+
+if __name__ == "__main__":
+    main()
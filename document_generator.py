@@ -1,17 +1,24 @@
-from docx import Document
-from docx.shared import Inches, Pt
-from docx.enum.text import WD_ALIGN_PARAGRAPH
-from docx.enum.style import WD_STYLE_TYPE
 import os
 from datetime import datetime
 
+# python-docx загружается при построении первого отчета, а не при запуске бота
+
 class DocumentGenerator:
     def __init__(self):
+        self.document = None
+    
+    def new_document(self):
+        """Создает новый документ с настроенными стилями"""
+        from docx import Document
+        
         self.document = Document()
         self.setup_document_styles()
     
     def setup_document_styles(self):
         """Настраивает стили документа"""
+        from docx.enum.style import WD_STYLE_TYPE
+        from docx.shared import Inches, Pt
+        
         # Стиль для заголовков
         heading_style = self.document.styles.add_style('CustomHeading', WD_STYLE_TYPE.PARAGRAPH)
         heading_style.font.size = Pt(16)
@@ -28,9 +35,18 @@ class DocumentGenerator:
         normal_style = self.document.styles.add_style('CustomNormal', WD_STYLE_TYPE.PARAGRAPH)
         normal_style.font.size = Pt(11)
         normal_style.paragraph_format.space_after = Pt(6)
+        
+        # Стиль для трассы агентов (технические блоки ответа)
+        trace_style = self.document.styles.add_style('CustomTrace', WD_STYLE_TYPE.PARAGRAPH)
+        trace_style.font.size = Pt(9)
+        trace_style.font.italic = True
+        trace_style.paragraph_format.left_indent = Inches(0.3)
+        trace_style.paragraph_format.space_after = Pt(4)
     
     def add_title(self, title):
         """Добавляет заголовок документа"""
+        from docx.enum.text import WD_ALIGN_PARAGRAPH
+        
         title_paragraph = self.document.add_paragraph(title)
         title_paragraph.style = self.document.styles['CustomHeading']
         title_paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
@@ -54,11 +70,16 @@ class DocumentGenerator:
         dialog_text = f"[{time_str}] {speaker}: {message}"
         self.add_paragraph(dialog_text)
     
+    def add_agent_trace(self, agent_trace):
+        """Добавляет трассу агентов (содержимое технических блоков) под репликой"""
+        for block in agent_trace:
+            paragraph = self.document.add_paragraph(block)
+            paragraph.style = self.document.styles['CustomTrace']
+    
     def generate_report(self, user_id, conversation_history, analytics_report):
         """Генерирует полный отчет"""
         # Создаем новый документ
-        self.document = Document()
-        self.setup_document_styles()
+        self.new_document()
         
         # Добавляем заголовок
         current_time = datetime.now()
@@ -77,7 +98,12 @@ class DocumentGenerator:
         
         for msg in conversation_history:
             speaker = "Рекрутер" if msg["is_bot"] else "Кандидат"
-            self.add_dialog_entry(speaker, msg["text"], msg["timestamp"])
+            if "agent_trace" in msg:
+                # Реплика рекрутера без технических блоков, трасса агентов — отдельно
+                self.add_dialog_entry(speaker, msg["visible_text"], msg["timestamp"])
+                self.add_agent_trace(msg["agent_trace"])
+            else:
+                self.add_dialog_entry(speaker, msg["text"], msg["timestamp"])
         
         # Добавляем аналитический отчет
         self.add_section_heading("Аналитический отчет")
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+A/B-эксперименты над промтами собеседований
+
+Сравнение вариантов:  python experiments.py [--index dialogs/reports.sqlite3] [--ledger usage/ledger.jsonl]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+
+from report_archive import SCORE_SECTIONS
+
+# Вызовы, задержку которых видит кандидат (по ним сравниваются перцентили)
+LATENCY_CALL_TYPES = ("opening", "turn")
+
+
+class Experiment:
+    """A/B-эксперимент над промтом одного типа собеседования: варианты — файлы промтов"""
+
+    def __init__(self, name, interview_type, variants, vacancy=None):
+        self.name = name
+        self.interview_type = interview_type
+        # Порядок вариантов важен для распределения: первый вариант — контрольный
+        self.variants = dict(variants)
+        # None — эксперимент действует для всех вакансий
+        self.vacancy = vacancy
+
+    def assign(self, user_id):
+        """Вариант для пользователя: детерминированно по хешу (эксперимент, user_id), без хранения распределения"""
+        digest = hashlib.sha256(f"{self.name}:{user_id}".encode("utf-8")).digest()
+        names = list(self.variants)
+        return names[int.from_bytes(digest[:8], "big") % len(names)]
+
+    def labels(self):
+        """Метки вариантов "эксперимент/вариант" в порядке файла"""
+        return [f"{self.name}/{variant}" for variant in self.variants]
+
+
+class Experiments:
+    """Эксперименты из JSON-файла (список объектов с полями Experiment); без файла экспериментов нет"""
+
+    def __init__(self, path="experiments.json"):
+        self.path = path
+        self.experiments = []
+        if path and os.path.exists(path):
+            self.load(path)
+
+    def load(self, path):
+        with open(path, "r", encoding="utf-8") as file:
+            items = json.load(file)
+        self.experiments = [Experiment(**item) for item in items]
+
+        names = [experiment.name for experiment in self.experiments]
+        if len(set(names)) != len(names) or any(not experiment.variants for experiment in self.experiments):
+            raise ValueError(f"В {path} должны быть эксперименты с разными name и хотя бы одним вариантом: {names}")
+
+    def __len__(self):
+        return len(self.experiments)
+
+    def find(self, interview_type, vacancy_key):
+        """Эксперимент для типа собеседования у вакансии или None"""
+        for experiment in self.experiments:
+            if experiment.interview_type == interview_type and experiment.vacancy in (None, vacancy_key):
+                return experiment
+        return None
+
+    def assign(self, interview_type, vacancy_key, user_id):
+        """Метка варианта и его файл промта; (None, None) — тип не участвует в эксперименте"""
+        experiment = self.find(interview_type, vacancy_key)
+        if experiment is None:
+            return None, None
+        variant = experiment.assign(user_id)
+        return f"{experiment.name}/{variant}", experiment.variants[variant]
+
+    def prompt_file(self, label):
+        """Файл промта по метке варианта (для восстановленных сессий) или None, если варианта больше нет"""
+        if not label:
+            return None
+        name, _, variant = label.partition("/")
+        for experiment in self.experiments:
+            if experiment.name == name:
+                return experiment.variants.get(variant)
+        return None
+
+
+def _empty_stats():
+    return {
+        "sessions": set(), "completed": 0, "turns": [], "scores": [],
+        "prompt_tokens": 0, "completion_tokens": 0, "latencies": [],
+    }
+
+
+def load_variant_stats(index_path, ledger_path):
+    """Показатели вариантов из сохраненных источников: они переживают перезапуск бота.
+
+    Из индекса отчетов — завершенные собеседования, ходы и оценки; из журнала токенов — начатые сессии,
+    токены и задержка ответа кандидату (latency_ms).
+    """
+    stats = {}
+    if index_path and os.path.exists(index_path):
+        score_columns = [f"score_{section}" for section in SCORE_SECTIONS.values()]
+        connection = sqlite3.connect(index_path)
+        try:
+            rows = connection.execute(
+                f"SELECT variant, session_id, turns, {', '.join(score_columns)} FROM reports WHERE variant IS NOT NULL"
+            ).fetchall()
+        finally:
+            connection.close()
+        for label, session_id, turns, *scores in rows:
+            variant = stats.setdefault(label, _empty_stats())
+            variant["sessions"].add(session_id)
+            variant["completed"] += 1
+            if turns is not None:
+                variant["turns"].append(turns)
+            scores = [score for score in scores if score is not None]
+            if scores:
+                variant["scores"].append(sum(scores) / len(scores))
+
+    if ledger_path and os.path.exists(ledger_path):
+        with open(ledger_path, "r", encoding="utf-8") as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Строка, которую бот еще дописывает
+                    continue
+                if not record.get("variant"):
+                    continue
+                variant = stats.setdefault(record["variant"], _empty_stats())
+                variant["sessions"].add(record["session_id"])
+                variant["prompt_tokens"] += record["prompt_tokens"]
+                variant["completion_tokens"] += record["completion_tokens"]
+                if record["call_type"] in LATENCY_CALL_TYPES and record.get("latency_ms") is not None:
+                    variant["latencies"].append(record["latency_ms"] / 1000)
+    return stats
+
+
+def _average(values):
+    return sum(values) / len(values) if values else 0.0
+
+
+def _percentile(values, percent):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(percent / 100 * (len(values) - 1))))] if values else 0.0
+
+
+def _delta(value, base):
+    """Отличие от контрольного варианта в процентах (для самого контроля отличия нет)"""
+    if not base:
+        return ""
+    return f" ({(value - base) / base:+.0%})"
+
+
+def format_experiment_report(experiments, stats):
+    """Форматирует сравнение вариантов по load_variant_stats: завершаемость, ходы, токены, задержка и оценки
+    (в скобках — отличие от контроля)"""
+    if not len(experiments):
+        return "Экспериментов нет."
+
+    lines = []
+    for experiment in experiments.experiments:
+        lines.append(f"{experiment.name} ({experiment.interview_type}):")
+        control = None
+        for label in experiment.labels():
+            variant = stats.get(label) or _empty_stats()
+            sessions = len(variant["sessions"])
+            row = {
+                "tokens": (variant["prompt_tokens"] + variant["completion_tokens"]) / sessions if sessions else 0.0,
+                "p95": _percentile(variant["latencies"], 95),
+                "score": _average(variant["scores"]),
+            }
+            base = control or {}
+            control = control or row
+
+            line = f"  {label.partition('/')[2]}: собеседований {sessions}"
+            if sessions:
+                line += (
+                    f", завершено {variant['completed'] / sessions:.0%}, "
+                    f"токенов вход/выход {variant['prompt_tokens'] / sessions:.0f}/"
+                    f"{variant['completion_tokens'] / sessions:.0f} на собеседование"
+                    f"{_delta(row['tokens'], base.get('tokens'))}"
+                )
+            if variant["turns"]:
+                line += f", ходов {_average(variant['turns']):.1f}"
+            if variant["latencies"]:
+                line += (
+                    f", задержка p50={_percentile(variant['latencies'], 50):.1f}с "
+                    f"p95={row['p95']:.1f}с{_delta(row['p95'], base.get('p95'))}"
+                )
+            if variant["scores"]:
+                line += f", оценка {row['score']:.1f}{_delta(row['score'], base.get('score'))}"
+            lines.append(line)
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сравнение вариантов A/B-экспериментов по индексу отчетов и журналу токенов")
+    parser.add_argument("--experiments", default=os.getenv("EXPERIMENTS_FILE", "experiments.json"))
+    parser.add_argument("--index", default=os.getenv("REPORT_INDEX_PATH", "dialogs/reports.sqlite3"))
+    parser.add_argument("--ledger", default=os.getenv("USAGE_LEDGER_PATH", "usage/ledger.jsonl"))
+    args = parser.parse_args()
+
+    print(format_experiment_report(Experiments(args.experiments), load_variant_stats(args.index, args.ledger)))
+
+
+if __name__ == "__main__":
+    main()
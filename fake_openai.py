@@ -0,0 +1,58 @@
+"""
+Фиктивный API OpenAI для тестов: ответы chat.completions без сети
+"""
+
+import inspect
+
+
+def make_completion(content, model="gpt-4.1-mini"):
+    """Создает ответ chat.completions в формате API"""
+    return {
+        "id": "chatcmpl-test",
+        "object": "chat.completion",
+        "created": 0,
+        "model": model,
+        "choices": [
+            {
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": content}
+            }
+        ],
+        "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15}
+    }
+
+
+class FakeCompletions:
+    """Имитирует client.chat.completions: считает запросы и запоминает их сообщения.
+
+    Текст ответа — content; для ответа по содержимому запроса переопределяется reply (можно async).
+    """
+
+    def __init__(self, content=""):
+        self.content = content
+        self.calls = 0
+        self.requests = []
+
+    def reply(self, params):
+        return self.content
+
+    async def create(self, **params):
+        from openai.types.chat import ChatCompletion
+
+        self.calls += 1
+        self.requests.append(params["messages"])
+        content = self.reply(params)
+        if inspect.isawaitable(content):
+            content = await content
+        return ChatCompletion.model_validate(make_completion(content, params["model"]))
+
+
+def install_fake_api(client, completions):
+    """Подменяет сетевой клиент OpenAI фиктивным; completions — текст ответа или FakeCompletions"""
+    if not isinstance(completions, FakeCompletions):
+        completions = FakeCompletions(completions)
+    client.client = type("FakeAPI", (), {})()
+    client.client.chat = type("FakeChat", (), {})()
+    client.client.chat.completions = completions
+    return completions
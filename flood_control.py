@@ -0,0 +1,112 @@
+import time
+from collections import OrderedDict
+
+from metrics import metrics
+from telegram_sender import TokenBucket
+
+# Решения по входящему сообщению
+ALLOWED = "allowed"
+LIMITED = "limited"        # превышен лимит, пользователь уже предупрежден — молча пропускаем
+LIMITED_NOTIFY = "limited_notify"  # превышен лимит, нужно предупредить пользователя
+MUTED = "muted"            # пользователь временно заглушен — сообщение игнорируется
+MUTED_NOW = "muted_now"    # пользователь только что заглушен — нужно сообщить
+TOO_LONG = "too_long"      # сообщение длиннее допустимого
+
+
+class _UserLimits:
+    def __init__(self, buckets, now):
+        self.buckets = buckets
+        self.violations = 0.0
+        self.violations_updated = now
+        self.muted_until = 0.0
+        self.notified = False
+
+
+class FloodControl:
+    """Защита от флуда: лимиты на ходы и перезапуски /start для каждого пользователя, временное заглушение.
+
+    Проверка одного сообщения — O(1); состояние хранится не более чем для max_users пользователей (LRU).
+    Нарушения "остывают" со скоростью одно в минуту, поэтому заглушается только устойчивый флуд.
+    """
+
+    def __init__(self, limits=None, max_message_chars=2000, violations_to_mute=10, mute_seconds=600, max_users=10000):
+        # limits: тип действия -> (операций в секунду, запас)
+        self.limits = limits or {"turn": (6 / 60, 5), "start": (10 / 3600, 3)}
+        self.max_message_chars = max_message_chars
+        self.violations_to_mute = violations_to_mute
+        self.mute_seconds = mute_seconds
+        self.max_users = max_users
+        self.users = OrderedDict()
+
+    def _get_user(self, user_id, now):
+        user = self.users.get(user_id)
+        if user is None:
+            user = _UserLimits({kind: TokenBucket(rate, burst) for kind, (rate, burst) in self.limits.items()}, now)
+            self.users[user_id] = user
+            if len(self.users) > self.max_users:
+                self.users.popitem(last=False)
+                metrics.incr("flood.evicted")
+        else:
+            self.users.move_to_end(user_id)
+        return user
+
+    def is_muted(self, user_id):
+        user = self.users.get(user_id)
+        return user is not None and user.muted_until > time.monotonic()
+
+    def check(self, user_id, kind, text=None):
+        """Проверяет действие пользователя (kind: turn или start) и, для хода, длину текста"""
+        now = time.monotonic()
+        user = self._get_user(user_id, now)
+
+        if user.muted_until > now:
+            metrics.incr("flood.ignored")
+            return MUTED
+
+        if text is not None and len(text) > self.max_message_chars:
+            # Длинное сообщение не попадает в промт; о нем сообщаем всегда
+            metrics.incr("flood.too_long")
+            return self._violation(user, now) or TOO_LONG
+
+        bucket = user.buckets[kind]
+        if bucket.delay(now) == 0:
+            bucket.take(now)
+            user.notified = False
+            metrics.incr(f"flood.allowed.{kind}")
+            return ALLOWED
+
+        metrics.incr(f"flood.limited.{kind}")
+        verdict = self._violation(user, now)
+        if verdict:
+            return verdict
+
+        # Предупреждаем один раз за серию нарушений, чтобы флуд не превращался в поток ответов
+        if user.notified:
+            return LIMITED
+        user.notified = True
+        return LIMITED_NOTIFY
+
+    def _violation(self, user, now):
+        user.violations = max(0.0, user.violations - (now - user.violations_updated) / 60) + 1
+        user.violations_updated = now
+
+        if user.violations >= self.violations_to_mute:
+            user.muted_until = now + self.mute_seconds
+            user.violations = 0.0
+            metrics.incr("flood.muted")
+            return MUTED_NOW
+        return None
+
+
+def format_flood_report(flood_control):
+    """Форматирует отчет о срабатываниях защиты от флуда"""
+    lines = [f"Пользователей в памяти: {len(flood_control.users)}"]
+    for kind in flood_control.limits:
+        allowed = metrics.get(f"flood.allowed.{kind}")
+        limited = metrics.get(f"flood.limited.{kind}")
+        lines.append(f"{kind}: пропущено {allowed:.0f}, ограничено {limited:.0f}")
+    lines.append(
+        f"Слишком длинных: {metrics.get('flood.too_long'):.0f}, заглушений: {metrics.get('flood.muted'):.0f}, "
+        f"проигнорировано: {metrics.get('flood.ignored'):.0f}"
+    )
+    return "\n".join(lines)
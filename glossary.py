@@ -0,0 +1,125 @@
+import logging
+import os
+import re
+
+from metrics import metrics
+from question_dedup import extract_questions
+from transcript_search import CYRILLIC_PATTERN, TOKEN_PATTERN, stem
+
+logger = logging.getLogger(__name__)
+
+# Просьбы о переводе: из сообщения берется слово или фраза, которую нужно перевести
+TRANSLATION_PATTERNS = [re.compile(pattern, re.IGNORECASE) for pattern in (
+    r"^(?:переведи(?:те)?|перевести)\b(?: мне)?(?: слово| фразу| термин| выражение)?\s*[:\-—]?\s*(.+)$",
+    # Существительное "перевод" — только "перевод слова ..." или "перевод: ..." ("Перевод модели в прод" — не просьба)
+    r"^перевод(?:\s+слова\s*[:\-—]?|\s*:)\s*(.+)$",
+    r"^как (?:переводится|перевести|будет|сказать)(?: по-русски| по-английски| на русском| на английском)?"
+    r"(?: слово| фраза| термин| выражение)?\s*(.+?)"
+    r"(?:\s+(?:по-русски|по-английски|на русском|на английском|на русский|на английский))?$",
+    r"^что (?:значит|означает)(?: слово| фраза| термин| выражение)?\s*(.+)$",
+    r"^(.+?)\s*[-—,]?\s*(?:это )?(?:как|что) (?:переводится|означает|значит)$",
+    r"^(?:please\s+)?translate(?: the word| the phrase| the term)?\s*[:\-]?\s*(.+)$",
+    r"^what does (?:the word |the phrase |the term )?(.+?) mean$",
+    r"^what is the meaning of (?:the word |the phrase |the term )?(.+)$",
+    r"^what is (.+?) in (?:english|russian)$",
+    r"^how do (?:you|i) say (.+?) in (?:english|russian)$",
+)]
+
+# Обрамление, которое не относится к переводимому слову
+POLITE_PATTERN = re.compile(r"(?:,?\s*(?:пожалуйста|please))+", re.IGNORECASE)
+QUOTES = "«»\"'“”‘’`"
+MAX_TERM_WORDS = 4
+
+
+def term_key(text):
+    """Ключ поиска: основы слов (и для английского, и для русского)"""
+    return " ".join(stem(token) for token in TOKEN_PATTERN.findall(text))
+
+
+def extract_term(text):
+    """Слово или фраза из просьбы о переводе или None, если это не просьба о переводе"""
+    text = POLITE_PATTERN.sub("", text.strip()).strip(" ?!.")
+    for pattern in TRANSLATION_PATTERNS:
+        match = pattern.match(text)
+        if match:
+            term = match.group(1).strip(" ?!.:," + QUOTES)
+            if term and len(term.split()) <= MAX_TERM_WORDS:
+                return term
+    return None
+
+
+class Glossary:
+    """Двуязычный глоссарий: английский термин ↔ русский перевод.
+
+    Файл — строки "английский<TAB>русский", синонимы через "|", комментарии с "#".
+    В памяти — словарь основ слов каждого варианта, поэтому "переобучения" находит "переобучение".
+    """
+
+    def __init__(self, path="glossary.tsv"):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            self.load(path)
+
+    def load(self, path):
+        with open(path, "r", encoding="utf-8") as file:
+            for number, line in enumerate(file, start=1):
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                columns = line.split("\t")
+                sides = [[variant.strip() for variant in column.split("|") if variant.strip()] for column in columns]
+                if len(sides) != 2 or not all(sides):
+                    # Испорченная строка не мешает запуску бота: она пропускается, остальной глоссарий загружается
+                    logger.warning(f"{path}:{number}: ожидается \"английский<TAB>русский\", строка пропущена")
+                    continue
+                english, russian = sides
+                entry = (english[0], russian[0])
+                for variant in english + russian:
+                    self.entries.setdefault(term_key(variant), entry)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def lookup(self, term):
+        """Перевод термина на другой язык или None"""
+        entry = self.entries.get(term_key(term))
+        if entry is None:
+            return None
+        english, russian = entry
+        return english if CYRILLIC_PATTERN.search(term.lower()) else russian
+
+    def answer(self, text, language="russian", last_question=""):
+        """Ответ бота на просьбу о переводе (в формате модели, с тегами агентов) или None.
+
+        None — это не просьба о переводе или слова нет в глоссарии: сообщение обрабатывает LLM.
+        """
+        term = extract_term(text)
+        if term is None:
+            return None
+        translation = self.lookup(term)
+        if translation is None:
+            metrics.incr("glossary.misses")
+            return None
+        metrics.incr("glossary.hits")
+
+        # Как у агента-консультанта: короткий ответ и возврат к последнему вопросу
+        questions = extract_questions(last_question)
+        if language == "english":
+            reply = f"\"{term}\" means \"{translation}\"."
+            if questions:
+                reply += f" Let's continue: {questions[-1]}"
+        else:
+            reply = f"«{term}» — {translation}."
+            if questions:
+                reply += f" Продолжим: {questions[-1]}"
+        return "{Агент-ветки: Консультант}\n{Финальный агент - агент-консультант}\n" + reply
+
+
+def format_glossary_report():
+    """Форматирует отчет о переводах из глоссария"""
+    hits = metrics.get("glossary.hits")
+    misses = metrics.get("glossary.misses")
+    if not hits + misses:
+        return "Просьб о переводе еще не было."
+    return f"Переведено без LLM: {hits:.0f} из {hits + misses:.0f} ({hits / (hits + misses):.0%}), нет в глоссарии: {misses:.0f}"
@@ -0,0 +1,108 @@
+import asyncio
+import time
+
+from admission import unadmitted, unadmitted_task
+from metrics import metrics
+
+
+class HedgePolicy:
+    """Политика хеджирования: если ответа нет за slo_seconds, отправляется второй запрос.
+
+    measure_losers=True не отменяет проигравший основной запрос, а дожидается его в фоне,
+    чтобы измерить реальный выигрыш по хвостовым задержкам (стоит лишних токенов).
+    """
+
+    def __init__(self, slo_seconds=0, fallback_model=None, measure_losers=False):
+        self.slo_seconds = slo_seconds
+        self.fallback_model = fallback_model
+        self.measure_losers = measure_losers
+
+    @property
+    def enabled(self):
+        return self.slo_seconds > 0
+
+
+async def run_hedged(make_request, policy):
+    """Выполняет запрос с хеджированием.
+
+    make_request(model) возвращает корутину запроса; model=None означает основную модель.
+    Побеждает первый успешный ответ, проигравший запрос отменяется.
+    """
+    start_time = time.perf_counter()
+    metrics.incr("hedge.requests")
+
+    primary = asyncio.ensure_future(make_request(None))
+    pending = {primary}
+    last_error = None
+
+    # Отмена вызывающего в любой момент (в том числе до SLO) отменяет и незавершенные запросы
+    try:
+        done, _ = await asyncio.wait({primary}, timeout=policy.slo_seconds)
+        if done:
+            pending = set()
+            latency = time.perf_counter() - start_time
+            metrics.observe("hedge.latency", latency)
+            metrics.observe("hedge.primary_latency", latency)
+            return primary.result()
+
+        # SLO нарушен — отправляем запасной запрос
+        metrics.incr("hedge.fired")
+        hedge = asyncio.ensure_future(_hedge_request(make_request, policy.fallback_model))
+        pending = {primary, hedge}
+
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    last_error = task.exception()
+                    continue
+
+                latency = time.perf_counter() - start_time
+                metrics.observe("hedge.latency", latency)
+                if task is hedge:
+                    metrics.incr("hedge.won")
+                    if policy.measure_losers and primary in pending:
+                        pending.discard(primary)
+                        unadmitted_task("hedge", primary)
+                        primary.add_done_callback(
+                            lambda _: _observe_primary(primary, start_time)
+                        )
+                    else:
+                        # Основной запрос отменяется, его задержка не меньше текущей
+                        metrics.observe("hedge.primary_latency", latency)
+                else:
+                    metrics.observe("hedge.primary_latency", latency)
+                return task.result()
+        raise last_error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def _hedge_request(make_request, model):
+    """Запасной запрос идет в месте основного запроса и учитывается в допуске отдельно"""
+    with unadmitted("hedge"):
+        return await make_request(model)
+
+
+def _observe_primary(primary, start_time):
+    """Учитывает фактическую задержку основного запроса, проигравшего хеджу"""
+    if not primary.cancelled() and primary.exception() is None:
+        metrics.observe("hedge.primary_latency", time.perf_counter() - start_time)
+
+
+def format_hedge_report():
+    """Форматирует отчет о хеджировании: доля хеджей, побед и хвостовые задержки"""
+    requests = metrics.get("hedge.requests")
+    if not requests:
+        return "Хеджирование не использовалось."
+
+    fired = metrics.get("hedge.fired")
+    won = metrics.get("hedge.won")
+    served = metrics.summary("hedge.latency")
+    primary = metrics.summary("hedge.primary_latency")
+    return (
+        f"Запросов: {requests:.0f}, хеджей: {fired:.0f} ({fired / requests:.0%}), побед хеджа: {won:.0f}\n"
+        f"p95: {served['p95']:.1f} с (без хеджа ≥ {primary['p95']:.1f} с), "
+        f"p99: {served['p99']:.1f} с (без хеджа ≥ {primary['p99']:.1f} с)"
+    )
@@ -0,0 +1,70 @@
+import asyncio
+import hashlib
+import json
+import os
+from datetime import datetime
+
+# Режимы работы кассет
+CASSETTE_MODES = ("off", "record", "replay")
+
+
+class CassetteMissError(Exception):
+    """Запрос не найден среди записанных кассет в режиме replay"""
+
+
+def request_key(params):
+    """Возвращает контентный ключ (sha256) для параметров запроса к chat.completions"""
+    canonical = json.dumps(params, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class CassetteStore:
+    """Хранилище кассет: один JSON-файл на уникальный запрос к LLM"""
+
+    def __init__(self, directory="cassettes", replay_latency=False):
+        self.directory = directory
+        self.replay_latency = replay_latency
+
+    def path_for(self, key):
+        """Путь к кассете по ключу (подпапка по первым двум символам хэша)"""
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def record(self, params, response, latency):
+        """Записывает запрос, ответ и задержку в кассету"""
+        key = request_key(params)
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        cassette = {
+            "key": key,
+            "recorded_at": datetime.now().isoformat(),
+            "latency": latency,
+            "request": params,
+            "response": response.model_dump() if hasattr(response, "model_dump") else response,
+        }
+
+        # Пишем через временный файл, чтобы не оставлять битых кассет
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(cassette, file, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+        return key
+
+    def load(self, params):
+        """Загружает кассету для запроса или выбрасывает CassetteMissError"""
+        key = request_key(params)
+        path = self.path_for(key)
+        if not os.path.exists(path):
+            raise CassetteMissError(f"Кассета {key} не найдена в {self.directory}")
+
+        with open(path, "r", encoding="utf-8") as file:
+            return json.load(file)
+
+    async def replay(self, params):
+        """Воспроизводит ответ из кассеты (при необходимости с записанной задержкой)"""
+        from openai.types.chat import ChatCompletion
+
+        cassette = self.load(params)
+        if self.replay_latency:
+            await asyncio.sleep(cassette.get("latency", 0))
+        return ChatCompletion.model_validate(cassette["response"])
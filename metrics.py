@@ -0,0 +1,66 @@
+from collections import defaultdict, deque
+
+
+class Metrics:
+    """Простой реестр метрик: счетчики и выборки задержек ограниченного размера"""
+
+    def __init__(self, reservoir_size=1000):
+        self.counters = defaultdict(float)
+        self.samples = defaultdict(lambda: deque(maxlen=reservoir_size))
+
+    def incr(self, name, value=1):
+        """Увеличивает счетчик"""
+        self.counters[name] += value
+
+    def observe(self, name, value):
+        """Добавляет наблюдение (например, задержку в секундах)"""
+        self.samples[name].append(value)
+        self.counters[f"{name}.count"] += 1
+
+    def get(self, name, default=0):
+        """Возвращает значение счетчика"""
+        return self.counters.get(name, default)
+
+    def percentile(self, name, percent):
+        """Возвращает перцентиль по последним наблюдениям"""
+        values = sorted(self.samples.get(name, ()))
+        if not values:
+            return 0.0
+        index = min(len(values) - 1, int(round(percent / 100 * (len(values) - 1))))
+        return values[index]
+
+    def summary(self, name):
+        """Возвращает сводку по наблюдениям: количество, среднее, p50/p95/p99"""
+        values = self.samples.get(name, ())
+        count = len(values)
+        return {
+            "count": int(self.counters.get(f"{name}.count", 0)),
+            "avg": sum(values) / count if count else 0.0,
+            "p50": self.percentile(name, 50),
+            "p95": self.percentile(name, 95),
+            "p99": self.percentile(name, 99),
+        }
+
+    def names_with_prefix(self, prefix):
+        """Возвращает имена счетчиков и выборок с указанным префиксом"""
+        names = set(name for name in self.counters if name.startswith(prefix))
+        names.update(name for name in self.samples if name.startswith(prefix))
+        return sorted(names)
+
+    def format_report(self, prefix=""):
+        """Форматирует метрики с указанным префиксом в читаемый текст"""
+        lines = []
+        for name in self.names_with_prefix(prefix):
+            if name in self.samples:
+                stats = self.summary(name)
+                lines.append(
+                    f"{name}: n={stats['count']} avg={stats['avg']:.2f} "
+                    f"p50={stats['p50']:.2f} p95={stats['p95']:.2f} p99={stats['p99']:.2f}"
+                )
+            elif not name.endswith(".count") or name[:-len(".count")] not in self.samples:
+                lines.append(f"{name}: {self.counters[name]:g}")
+        return "\n".join(lines)
+
+
+# Общий реестр метрик процесса
+metrics = Metrics()
@@ -0,0 +1,179 @@
+import json
+import logging
+import os
+import re
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Типы вызовов LLM
+CALL_TYPES = ("opening", "turn", "teacher_correction", "profile_update", "analytics")
+
+# Цены моделей в долларах за 1М токенов: (вход, выход)
+MODEL_PRICES = {
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1-nano": (0.10, 0.40),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+}
+
+# Ключевые слова в теге финального агента → роль агента
+ROLE_KEYWORDS = [
+    ("подтвержд", "подтверждения"),
+    ("консультант", "консультант"),
+    ("презентац", "презентации"),
+    ("предложени", "предложения времени"),
+    ("прощани", "прощания"),
+    ("отказ", "завершения при отказе"),
+    ("защитник", "защитник"),
+    ("генератор", "генератор вопросов"),
+    ("профайл", "профайла"),
+    ("блок", "блока"),
+    ("ветк", "ветки"),
+]
+
+FINAL_AGENT_PATTERN = re.compile(r'\{\s*Финальный агент[^}]*\}', re.IGNORECASE)
+
+
+class ModelRoute:
+    """Параметры модели для конкретного маршрута"""
+
+    def __init__(self, model, max_tokens, temperature):
+        self.model = model
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+
+    def to_params(self):
+        """Возвращает параметры запроса к chat.completions"""
+        return {
+            "model": self.model,
+            "max_tokens": self.max_tokens,
+            "temperature": self.temperature,
+        }
+
+
+# Маршруты по умолчанию: тип вызова → роль финального агента → модель
+DEFAULT_ROUTES = {
+    "opening": {
+        "default": ModelRoute("gpt-4.1-mini", 1000, 0.7),
+    },
+    "turn": {
+        "default": ModelRoute("gpt-4.1-mini", 2000, 0.7),
+        # Подтверждение профайла и маршрутизация — дешевая и быстрая модель
+        "подтверждения": ModelRoute("gpt-4.1-nano", 1200, 0.3),
+        "консультант": ModelRoute("gpt-4.1-nano", 800, 0.5),
+        "защитник": ModelRoute("gpt-4.1-nano", 300, 0.3),
+        "прощания": ModelRoute("gpt-4.1-nano", 400, 0.5),
+        "завершения при отказе": ModelRoute("gpt-4.1-nano", 300, 0.5),
+    },
+    "teacher_correction": {
+        "default": ModelRoute("gpt-4.1-mini", 800, 0.3),
+    },
+    "profile_update": {
+        "default": ModelRoute("gpt-4.1-nano", 400, 0.0),
+    },
+    "analytics": {
+        "default": ModelRoute("gpt-4.1-mini", 3000, 0.3),
+    },
+}
+
+
+def detect_role(text):
+    """Определяет роль финального агента по техническим тегам ответа"""
+    if not text:
+        return None
+
+    tags = FINAL_AGENT_PATTERN.findall(text)
+    if not tags:
+        return None
+
+    tag = tags[-1].lower()
+    for keyword, role in ROLE_KEYWORDS:
+        if keyword in tag:
+            return role
+    return None
+
+
+def estimate_cost(model, prompt_tokens, completion_tokens):
+    """Оценивает стоимость запроса в долларах"""
+    # API возвращает версионированные имена (gpt-4.1-mini-2025-04-14) — ищем самый длинный префикс
+    known = [name for name in MODEL_PRICES if model and model.startswith(name)]
+    input_price, output_price = MODEL_PRICES[max(known, key=len)] if known else MODEL_PRICES["gpt-4.1-mini"]
+    return (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+
+
+def load_routes_file(filename):
+    """Загружает маршруты из JSON-файла вида {тип вызова: {роль: {model, max_tokens, temperature}}}"""
+    with open(filename, "r", encoding="utf-8") as file:
+        data = json.load(file)
+
+    routes = {}
+    for call_type, roles in data.items():
+        routes[call_type] = {
+            role: ModelRoute(params["model"], params["max_tokens"], params["temperature"])
+            for role, params in roles.items()
+        }
+    return routes
+
+
+class ModelRouter:
+    """Выбирает модель, max_tokens и temperature по типу вызова и роли агента"""
+
+    def __init__(self, routes=None, routes_file=None):
+        self.routes = {call_type: dict(roles) for call_type, roles in DEFAULT_ROUTES.items()}
+
+        routes_file = routes_file or os.getenv('MODEL_ROUTES_FILE')
+        if routes_file and os.path.exists(routes_file):
+            routes = {**load_routes_file(routes_file), **(routes or {})}
+
+        for call_type, roles in (routes or {}).items():
+            self.routes.setdefault(call_type, {}).update(roles)
+
+        # Новый тип вызова без маршрута "default" получает общий маршрут по умолчанию (как неизвестный тип вызова)
+        for call_type, roles in self.routes.items():
+            if "default" not in roles:
+                logger.warning(f"Для типа вызова {call_type} нет маршрута default, используется turn/default")
+                roles["default"] = self.routes["turn"]["default"]
+
+    def resolve(self, call_type, role=None):
+        """Возвращает ключ маршрута и его параметры"""
+        roles = self.routes.get(call_type) or self.routes["turn"]
+        if role and role in roles:
+            return f"{call_type}/{role}", roles[role]
+        return f"{call_type}/default", roles["default"]
+
+    def record(self, route_key, model, latency, usage=None):
+        """Учитывает задержку, токены и стоимость вызова по маршруту"""
+        prefix = f"route.{route_key}"
+        metrics.observe(f"{prefix}.latency", latency)
+
+        if usage is not None:
+            prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+            completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+            metrics.incr(f"{prefix}.prompt_tokens", prompt_tokens)
+            metrics.incr(f"{prefix}.completion_tokens", completion_tokens)
+            metrics.incr(f"{prefix}.cost_usd", estimate_cost(model, prompt_tokens, completion_tokens))
+
+    def format_report(self):
+        """Форматирует отчет по маршрутам: вызовы, задержки, токены, стоимость"""
+        route_keys = sorted(set(
+            name[len("route."):-len(".latency")]
+            for name in metrics.names_with_prefix("route.")
+            if name.endswith(".latency")
+        ))
+        if not route_keys:
+            return "Маршруты еще не использовались."
+
+        lines = []
+        for route_key in route_keys:
+            prefix = f"route.{route_key}"
+            stats = metrics.summary(f"{prefix}.latency")
+            lines.append(
+                f"{route_key}: вызовов {stats['count']}, "
+                f"p50 {stats['p50']:.1f} с, p95 {stats['p95']:.1f} с, "
+                f"токены {metrics.get(f'{prefix}.prompt_tokens'):.0f}/{metrics.get(f'{prefix}.completion_tokens'):.0f}, "
+                f"${metrics.get(f'{prefix}.cost_usd'):.4f}"
+            )
+        return "\n".join(lines)
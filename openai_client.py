@@ -1,44 +1,253 @@
-import openai
-import aiofiles
+import asyncio
+import importlib
 import os
+import time
 from dotenv import load_dotenv
 
+from admission import unadmitted
+from agent_state import tagged_block
+from candidate_profile import PROFILE_UPDATE_PROMPT, parse_profile_update
+from hedging import HedgePolicy, run_hedged
+from llm_cassette import CASSETTE_MODES, CassetteMissError, CassetteStore
+from metrics import metrics
+from model_router import ModelRouter, detect_role
+from prompt_slicer import PromptSlicer
+from question_dedup import CONFIRMATION_ROLE, compact_bot_message
+from response_cache import ResponseCache
+from tech_parser import parse_response
+from usage_ledger import UsageLedger
+from vacancies import PromptRegistry, current_vacancy
+
 # Загружаем переменные окружения
 load_dotenv('.env')
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 
-# Инициализация OpenAI клиента
-openai.api_key = OPENAI_API_KEY
+# Запись/воспроизведение запросов к LLM: off, record или replay
+LLM_CASSETTE_MODE = os.getenv('LLM_CASSETTE_MODE', 'off')
+LLM_CASSETTE_DIR = os.getenv('LLM_CASSETTE_DIR', 'cassettes')
+LLM_CASSETTE_REPLAY_LATENCY = os.getenv('LLM_CASSETTE_REPLAY_LATENCY', '0') == '1'
+
+# Хеджирование: второй запрос, если ответа нет за LLM_HEDGE_SLO_SECONDS (0 — выключено)
+LLM_HEDGE_SLO_SECONDS = float(os.getenv('LLM_HEDGE_SLO_SECONDS', '0'))
+LLM_HEDGE_FALLBACK_MODEL = os.getenv('LLM_HEDGE_FALLBACK_MODEL') or None
+LLM_HEDGE_MEASURE_LOSERS = os.getenv('LLM_HEDGE_MEASURE_LOSERS', '0') == '1'
+
+# Отправлять только общее ядро промта и разделы активного блока (1 — включено)
+PROMPT_SLICING = os.getenv('PROMPT_SLICING', '1') == '1'
+
+# Отчет строится по накопленному профилю кандидата и последним репликам, а не по всему диалогу
+ANALYTICS_FROM_PROFILE = os.getenv('ANALYTICS_FROM_PROFILE', '1') == '1'
+ANALYTICS_RECENT_MESSAGES = int(os.getenv('ANALYTICS_RECENT_MESSAGES', '6'))
+# Текст вместо отчета, если LLM не ответила (по нему повторный анализ понимает, что нужна новая попытка)
+ANALYTICS_FAILED_TEXT = "Не удалось сгенерировать аналитический отчет."
+
+# Учет токенов и бюджет на сессию (0 — без ограничения)
+USAGE_LEDGER_PATH = os.getenv('USAGE_LEDGER_PATH', 'usage/ledger.jsonl')
+SESSION_TOKEN_BUDGET = int(os.getenv('SESSION_TOKEN_BUDGET', '0'))
+# Модель для сессий, почти исчерпавших бюджет
+BUDGET_FALLBACK_MODEL = os.getenv('BUDGET_FALLBACK_MODEL', 'gpt-4.1-nano')
+# Сколько последних сообщений истории отправлять при сжатой истории
+BUDGET_HISTORY_MESSAGES = int(os.getenv('BUDGET_HISTORY_MESSAGES', '6'))
+
+# Кэш ответов LLM: типы вызовов через запятую (пусто — кэш выключен), срок жизни и размер
+LLM_CACHE_CALL_TYPES = [t.strip() for t in os.getenv('LLM_CACHE_CALL_TYPES', '').split(',') if t.strip()]
+LLM_CACHE_PATH = os.getenv('LLM_CACHE_PATH', 'cache/llm_cache.sqlite3')
+LLM_CACHE_TTL_SECONDS = int(os.getenv('LLM_CACHE_TTL_SECONDS', '86400'))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv('LLM_CACHE_MAX_ENTRIES', '5000'))
+
+# Режим преподавателя: исправление ошибок и следующий вопрос — два параллельных запроса
+TEACHER_SPLIT_CALLS = os.getenv('TEACHER_SPLIT_CALLS', '1') == '1'
+
+# История в промте: сколько последних реплик бота передается целиком (старые сокращаются до тегов и вопросов, 0 — не сокращать)
+QUESTION_TRIM_KEEP_RECENT = int(os.getenv('QUESTION_TRIM_KEEP_RECENT', '4'))
+
+# Указание для повторного запроса, если модель повторила уже заданный вопрос
+DUPLICATE_QUESTION_INSTRUCTION = """ВАЖНО: вопрос «{question}» уже задавался кандидату. Не повторяй его и не перефразируй — задай другой вопрос, который еще не задавался в этом собеседовании."""
+
+# Короткий промт агента исправления ошибок для режима преподавателя
+TEACHER_CORRECTION_PROMPT = """Ты - преподаватель английского языка. Проверь ответ кандидата на вопрос собеседования.
+Укажи каждую грамматическую и лексическую ошибку в ответе кандидата и кратко объясни ее.
+Затем выдай исправленную версию ответа кандидата без ошибок.
+Если ошибок нет, коротко похвали кандидата за правильный ответ.
+Пиши на английском языке, обращайся к кандидату по имени. Не задавай новых вопросов и не продолжай собеседование."""
+
+# Типы вызовов, для которых применяется хеджирование (ответы кандидату)
+HEDGED_CALL_TYPES = ("opening", "turn", "teacher_correction")
 
 class OpenAIClient:
-    def __init__(self):
+    def __init__(self, cassette_mode=None, cassette_dir=None, replay_latency=None, router=None, hedge_policy=None, ledger=None, response_cache=None, cache_call_types=None):
+        self.router = router or ModelRouter()
+        self.cache_call_types = LLM_CACHE_CALL_TYPES if cache_call_types is None else cache_call_types
+        self.response_cache = response_cache
+        if self.response_cache is None and self.cache_call_types:
+            self.response_cache = ResponseCache(LLM_CACHE_PATH, LLM_CACHE_TTL_SECONDS, LLM_CACHE_MAX_ENTRIES)
+        self.ledger = ledger or UsageLedger(USAGE_LEDGER_PATH, SESSION_TOKEN_BUDGET)
+        self.prompt_slicer = PromptSlicer(PROMPT_SLICING)
+        self.teacher_split = TEACHER_SPLIT_CALLS
+        # Файлы промтов общие для всех ботов процесса и читаются один раз
+        self.prompts = PromptRegistry()
+        self.hedge_policy = hedge_policy or HedgePolicy(
+            LLM_HEDGE_SLO_SECONDS, LLM_HEDGE_FALLBACK_MODEL, LLM_HEDGE_MEASURE_LOSERS
+        )
+        self.cassette_mode = cassette_mode or LLM_CASSETTE_MODE
+        if self.cassette_mode not in CASSETTE_MODES:
+            raise ValueError(f"Неизвестный режим кассет: {self.cassette_mode}")
+
+        self.cassettes = CassetteStore(
+            cassette_dir or LLM_CASSETTE_DIR,
+            LLM_CASSETTE_REPLAY_LATENCY if replay_latency is None else replay_latency
+        )
+
+        # Сетевой клиент создается при первом запросе: импорт openai заметно замедляет запуск
+        self._client = None
+
+    @property
+    def client(self):
+        """Сетевой клиент OpenAI (в режиме воспроизведения API не нужен)"""
+        if self._client is None and self.cassette_mode != "replay":
+            self._client = self._create_api_client()
+        return self._client
+
+    @client.setter
+    def client(self, value):
+        self._client = value
+
+    def _create_api_client(self):
+        import openai
+
         try:
-            self.client = openai.OpenAI(api_key=OPENAI_API_KEY)
+            return openai.AsyncOpenAI(api_key=OPENAI_API_KEY)
         except TypeError as e:
             if 'proxies' in str(e):
                 # Исправление для старых версий openai
                 import httpx
-                self.client = openai.OpenAI(
+                return openai.AsyncOpenAI(
                     api_key=OPENAI_API_KEY,
-                    http_client=httpx.Client()
+                    http_client=httpx.AsyncClient()
                 )
             else:
                 raise e
+
+    async def warm_up(self):
+        """Импортирует openai в фоновом потоке, чтобы первый запрос не ждал импорта.
+
+        Сам клиент создается в цикле событий: свойство client читается только там, проверка и создание
+        идут без await между ними, поэтому запрос во время прогрева не создаст второй клиент.
+        """
+        if self.cassette_mode == "replay":
+            return
+        await asyncio.to_thread(importlib.import_module, "openai")
+        if self._client is None:
+            self._client = self._create_api_client()
     
+    async def _create_completion(self, **params):
+        """Выполняет запрос к chat.completions с учетом режима кассет"""
+        if self.cassette_mode == "replay":
+            return await self.cassettes.replay(params)
+
+        start_time = time.perf_counter()
+        response = await self.client.chat.completions.create(**params)
+        latency = time.perf_counter() - start_time
+
+        if self.cassette_mode == "record":
+            self.cassettes.record(params, response, latency)
+
+        return response
+
+    async def _routed_completion(self, call_type, messages, role=None):
+        """Выполняет запрос по маршруту для типа вызова и роли агента"""
+        route_key, route = self.router.resolve(call_type, role)
+        params = route.to_params()
+
+        # Сессия приближается к бюджету — сокращаем ответы, на последнем уровне берем дешевую модель
+        budget_level = self.ledger.budget_level()
+        if budget_level >= 1:
+            params["max_tokens"] = max(params["max_tokens"] // 2, 300)
+        if budget_level >= 3:
+            params["model"] = BUDGET_FALLBACK_MODEL
+
+        # Одинаковый запрос (модель, сообщения, параметры) берем из кэша, если он включен для типа вызова
+        use_cache = self.response_cache is not None and call_type in self.cache_call_types
+        if use_cache:
+            # Чтение SQLite — вне цикла событий, чтобы диск не задерживал обработку других сессий
+            cached = await asyncio.to_thread(self.response_cache.get, {"messages": messages, **params}, call_type)
+            if cached is not None:
+                return cached
+
+        def make_request(model=None):
+            return self._create_completion(messages=messages, **{**params, "model": model or params["model"]})
+
+        start_time = time.perf_counter()
+        if self.hedge_policy.enabled and call_type in HEDGED_CALL_TYPES:
+            response = await run_hedged(make_request, self.hedge_policy)
+        else:
+            response = await make_request()
+        model = response.model or params["model"]
+        latency = time.perf_counter() - start_time
+        self.router.record(route_key, model, latency, response.usage)
+        self.ledger.record(call_type, model, response.usage, latency=latency)
+        vacancy_key = current_vacancy.get().key
+        metrics.incr(f"vacancy.{vacancy_key}.llm_calls")
+        if response.usage:
+            metrics.incr(f"vacancy.{vacancy_key}.tokens", response.usage.total_tokens)
+        if use_cache:
+            await asyncio.to_thread(self.response_cache.put, {"messages": messages, **params}, response, call_type)
+
+        return response
+
+    def _format_history(self, conversation_history, agent_state=None):
+        """Формирует историю диалога для промта (сжатую, если сессия близка к бюджету)"""
+        if not conversation_history:
+            return ''
+        
+        if self.ledger.budget_level() < 2 or len(conversation_history) <= BUDGET_HISTORY_MESSAGES:
+            return ' '.join(self._trim_old_bot_messages(conversation_history))
+        
+        # Сжатая история: заполненные профайлы блоков вместо старых реплик + последние сообщения
+        summary = []
+        if agent_state is not None:
+            for block, fields in agent_state.profiles.items():
+                summary.append(f"{{Профайл блока {block}: " + "; ".join(f"{field}: {value}" for field, value in fields.items()) + "}")
+        recent = [msg['text'] for msg in conversation_history[-BUDGET_HISTORY_MESSAGES:]]
+        return ' '.join(summary + recent)
+
+    def _trim_old_bot_messages(self, conversation_history):
+        """Тексты истории, где старые реплики бота сокращены до тегов агентов и заданных вопросов.
+
+        Повторы вопросов проверяет локальный индекс, поэтому модели хватает самих вопросов без вступлений.
+        """
+        bot_positions = [i for i, msg in enumerate(conversation_history) if msg['is_bot'] and 'agent_trace' in msg]
+        old_positions = set(bot_positions[:-QUESTION_TRIM_KEEP_RECENT]) if QUESTION_TRIM_KEEP_RECENT > 0 else set()
+        
+        texts = []
+        for position, msg in enumerate(conversation_history):
+            if position in old_positions:
+                compact = compact_bot_message(msg)
+                metrics.incr("history.trimmed_chars", len(msg['text']) - len(compact))
+                texts.append(compact)
+            else:
+                texts.append(msg['text'])
+        return texts
+
     async def load_prompt(self, filename):
         """Загружает промт из файла"""
-        async with aiofiles.open(filename, 'r', encoding='utf-8') as file:
-            return await file.read()
+        return await self.prompts.get(filename)
     
-    async def get_response(self, prompt, user_message, conversation_history=None, interview_mode="hope", language="russian", name="Кандидат", interview_type="soft"):
-        """Получает ответ от GPT на основе промта и сообщения пользователя"""
+    async def get_response(self, prompt, user_message, conversation_history=None, interview_mode="hope", language="russian", name="Кандидат", interview_type="soft", call_type="turn", agent_state=None, teacher_corrections=True, question_index=None):
+        """Получает ответ от GPT на основе промта и сообщения пользователя.
+        
+        question_index — вопросы, уже заданные в сессии: если новый ответ повторяет один из них,
+        ответ запрашивается еще раз с указанием не повторять этот вопрос.
+        """
+        start_time = time.perf_counter()
+        vacancy = current_vacancy.get()
         try:
             # Формируем краткий дополнительный промт в зависимости от режима (как в блокноте)
             if interview_mode == "hope":
                 if language == "russian":
                     user_prompt = f"""Агента-генератора вопросов зовут миссис Хоуп.
-Роль агента: Ты - менеджер по персоналу в компании "Пегий дудочник"
-Твоя задача: От ИМЕНИ МИСИС ХОУП проведи первичное собеседование (интервью) с претендентом (соискателем) на должность дата-сайентиста на русском языке.
+Роль агента: Ты - менеджер по персоналу в компании "{vacancy.company}"
+Твоя задача: От ИМЕНИ МИСИС ХОУП проведи первичное собеседование (интервью) с претендентом (соискателем) на должность {vacancy.position} на русском языке.
 Будь максимально дружелюбным интервьером для кандидата {name} и попытайся максимально раскрыть его потенциал своими вопросами.
 Стремись максимально расположить к себе претендента и раскачать его на полноценный диалог, в котором он может полностью раскрыться.
 Обращайся по имени {name}. Язык собеседования: Русский. Все вопросы кандидату задаются на языке собеседования.
@@ -46,17 +255,27 @@ class OpenAIClient:
 Тип собеседования: {self._get_interview_type_description(interview_type, "russian")}"""
                 else:  # english
                     user_prompt = f"""Агента-генератора вопросов зовут миссис Хоуп.
-Роль агента: Ты - менеджер по персоналу в компании "Пегий дудочник"
-Твоя задача: От ИМЕНИ МИСИС ХОУП проведи первичное собеседование (интервью) с претендентом (соискателем) на должность дата-сайентиста на английском языке.
+Роль агента: Ты - менеджер по персоналу в компании "{vacancy.company}"
+Твоя задача: От ИМЕНИ МИСИС ХОУП проведи первичное собеседование (интервью) с претендентом (соискателем) на должность {vacancy.position} на английском языке.
 Будь максимально дружелюбным интервьером для кандидата {name} и попытайся максимально раскрыть его потенциал своими вопросами.
 Стремись максимально расположить к себе претендента и раскачать его на полноценный диалог, в котором он может полностью раскрыться.
 Обращайся по имени {name}. Язык собеседования: Английский. Все вопросы кандидату задаются на языке собеседования.
 
 Тип собеседования: {self._get_interview_type_description(interview_type, "english")}"""
+            elif not teacher_corrections:  # teacher, ошибки разбирает отдельный запрос
+                user_prompt = f"""Агента-генератора вопросов зовут "Преподаватель".
+Роль агента: Ты - преподаватель английского языка в компании "{vacancy.company}" и ты хочешь проверить уровень английского соискателя на должность в Вашей компании.
+Твоя задача: ОТ ИМЕНИ ПРЕПОДАВАТЕЛЯ проведи первичное собеседование (интервью) с претендентом (соискателем) на должность {vacancy.position} на английском языке. Язык собеседования: английский
+Все вопросы кандидату {name} должны быть заданы на английском языке.
+Обращайся по имени {name}
+
+Тип собеседования: {self._get_interview_type_description(interview_type, "english")}
+
+ВАЖНО: Грамматические и лексические ошибки кандидата уже разобраны отдельным сообщением. Не разбирай ошибки и не выдавай исправленную версию ответа — только задай следующий вопрос."""
             else:  # teacher
                 user_prompt = f"""Агента-генератора вопросов зовут "Преподаватель".
-Роль агента: Ты - преподаватель английского языка в компании "Пегий дудочник" и ты хочешь проверить уровень английского соискателя на должность в Вашей компании.
-Твоя задача: ОТ ИМЕНИ ПРЕПОДАВАТЕЛЯ проведи первичное собеседование (интервью) с претендентом (соискателем) на должность дата-сайентиста на английском языке. Язык собеседования: английский
+Роль агента: Ты - преподаватель английского языка в компании "{vacancy.company}" и ты хочешь проверить уровень английского соискателя на должность в Вашей компании.
+Твоя задача: ОТ ИМЕНИ ПРЕПОДАВАТЕЛЯ проведи первичное собеседование (интервью) с претендентом (соискателем) на должность {vacancy.position} на английском языке. Язык собеседования: английский
 Все вопросы кандидату {name} должны быть заданы на английском языке и если в ответе кандидата содержатся грамматические или лексические ошибки,
 то указывай каждую грамматическую и лексическую ошибку в ответе кандидата. Выдавай исправленную версию ответа кандидата без ошибок.
 Обращайся по имени {name}
@@ -66,38 +285,172 @@ class OpenAIClient:
 ВАЖНО: После каждого ответа кандидата сразу разбирай все ошибки и выдавай исправленную версию."""
             
             # Формируем сообщения для API (как в блокноте)
+            # Основной мега-промт: общее ядро и разделы активного блока
+            active_block = agent_state.block if agent_state else None
+            # Следующий блок нужен, только когда профайл активного заполнен и возможен переход
+            with_next = agent_state.is_profile_complete() if agent_state else True
+            history_text = self._format_history(conversation_history, agent_state)
             messages = [
-                {"role": "system", "content": prompt},  # Основной мега-промт
-                {"role": "user", "content": user_prompt + f"\n\nИстория диалога (раннее заданные вопросы не должны повторяться):{' '.join([msg['text'] for msg in conversation_history]) if conversation_history else ''}\nСообщение от студента: {user_message}"}
+                {"role": "system", "content": self.prompt_slicer.slice(prompt, active_block, with_next)},
+                {"role": "user", "content": user_prompt + f"\n\nИстория диалога (раннее заданные вопросы не должны повторяться):{history_text}\nСообщение от студента: {user_message}"}
             ]
             
             # История диалога уже добавлена в user_prompt
             
+            # Роль определяется по финальному агенту предыдущего ответа бота
+            role = None
+            if call_type == "turn":
+                if agent_state:
+                    role = agent_state.final_agent
+                else:
+                    bot_messages = [msg['text'] for msg in conversation_history or [] if msg['is_bot']]
+                    role = detect_role(bot_messages[-1]) if bot_messages else None
+            
             # Отправляем запрос к API
-            response = self.client.chat.completions.create(
-                model="gpt-4.1-mini",
-                messages=messages,
-                max_tokens=2000,
-                temperature=0.7
-            )
+            response = await self._routed_completion(call_type, messages, role)
+            content = response.choices[0].message.content.strip()
             
-            return response.choices[0].message.content.strip()
+            if question_index is not None and call_type == "turn":
+                content = await self._regenerate_duplicate(content, messages, role, question_index, active_block)
+            
+            if interview_mode == "teacher" and teacher_corrections and call_type == "turn":
+                metrics.observe("teacher.combined.total", time.perf_counter() - start_time)
+            
+            return content
             
+        except CassetteMissError:
+            # Нет записанного ответа в режиме воспроизведения — ошибка теста, а не сбой API
+            raise
         except Exception as e:
             print(f"Ошибка при обращении к OpenAI API: {e}")
             return "Извините, произошла ошибка при обработке вашего сообщения. Попробуйте еще раз."
     
-    async def generate_analytics_report(self, conversation_history):
+    async def _regenerate_duplicate(self, content, messages, role, question_index, active_block=None):
+        """Проверяет ответ на повтор заданного вопроса и при повторе один раз перезапрашивает его.
+        
+        Вопросы сравниваются в пределах блока ответа (из его тега агента-блока или active_block),
+        ответы агента-подтверждения не проверяются. Если перезапрос не удался, возвращается исходный ответ.
+        """
+        visible_text, tags = parse_response(content)
+        block = tagged_block(tags) or active_block
+        final_role = detect_role(content)
+        if final_role == CONFIRMATION_ROLE:
+            return content
+        
+        metrics.incr("dedup.checked")
+        duplicate = question_index.find_duplicate(visible_text, block, final_role)
+        if duplicate is None:
+            return content
+        
+        metrics.incr("dedup.detected")
+        instruction = DUPLICATE_QUESTION_INSTRUCTION.format(question=duplicate)
+        retry_messages = messages[:-1] + [{"role": "user", "content": messages[-1]["content"] + "\n\n" + instruction}]
+        try:
+            response = await self._routed_completion("turn", retry_messages, role)
+            retry_content = response.choices[0].message.content.strip()
+        except CassetteMissError:
+            raise
+        except Exception as e:
+            # Повтор вопроса лучше, чем текст извинения вместо уже полученного ответа
+            print(f"Ошибка при перезапросе повторного вопроса: {e}")
+            metrics.incr("dedup.unresolved")
+            return content
+        
+        if question_index.find_duplicate(parse_response(retry_content)[0], block) is None:
+            metrics.incr("dedup.regenerated")
+        else:
+            metrics.incr("dedup.unresolved")
+        return retry_content
+    
+    async def get_teacher_correction(self, user_message, last_question, name="Кандидат"):
+        """Получает разбор ошибок в ответе кандидата (режим преподавателя)"""
+        try:
+            messages = [
+                {"role": "system", "content": TEACHER_CORRECTION_PROMPT},
+                {"role": "user", "content": f"Вопрос собеседования: {last_question}\nОтвет кандидата {name}: {user_message}"}
+            ]
+            response = await self._routed_completion("teacher_correction", messages)
+            return response.choices[0].message.content.strip()
+            
+        except CassetteMissError:
+            raise
+        except Exception as e:
+            print(f"Ошибка при разборе ошибок кандидата: {e}")
+            return None
+    
+    async def get_teacher_turn(self, prompt, user_message, conversation_history=None, name="Кандидат", interview_type="soft", agent_state=None, question_index=None):
+        """Ход преподавателя двумя параллельными запросами.
+        
+        Асинхронный генератор: сначала отдает разбор ошибок (как только он готов), затем следующий вопрос.
+        """
+        start_time = time.perf_counter()
+        bot_messages = [msg for msg in conversation_history or [] if msg['is_bot']]
+        last_question = bot_messages[-1].get('visible_text', bot_messages[-1]['text']) if bot_messages else ""
+        
+        # Разбор ошибок идет параллельно вопросу в том же месте допуска и учитывается отдельно
+        async def correction_call():
+            with unadmitted("teacher_split"):
+                return await self.get_teacher_correction(user_message, last_question, name)
+        
+        correction_task = asyncio.ensure_future(correction_call())
+        question_task = asyncio.ensure_future(self.get_response(
+            prompt, user_message, conversation_history, "teacher", "english", name, interview_type,
+            agent_state=agent_state, teacher_corrections=False, question_index=question_index
+        ))
+        
+        try:
+            correction = await correction_task
+            metrics.observe("teacher.split.first_message", time.perf_counter() - start_time)
+            if correction:
+                yield correction
+            
+            question = await question_task
+            metrics.observe("teacher.split.total", time.perf_counter() - start_time)
+            yield question
+        finally:
+            correction_task.cancel()
+            question_task.cancel()
+    
+    async def extract_profile_update(self, last_question, answer):
+        """Извлекает новые факты о кандидате из одного ответа (для фонового обновления профиля)"""
+        try:
+            messages = [
+                {"role": "system", "content": PROFILE_UPDATE_PROMPT},
+                {"role": "user", "content": f"Вопрос рекрутера: {last_question}\nОтвет кандидата: {answer}"}
+            ]
+            with unadmitted("profile_update"):
+                response = await self._routed_completion("profile_update", messages)
+            return parse_profile_update(response.choices[0].message.content)
+            
+        except CassetteMissError:
+            raise
+        except Exception as e:
+            print(f"Ошибка при обновлении профиля кандидата: {e}")
+            return {}
+    
+    async def generate_analytics_report(self, conversation_history, candidate_profile=None, agent_state=None):
         """Генерирует аналитический отчет на основе истории диалога"""
         try:
             # Загружаем промт для аналитики
-            analytics_prompt = await self.load_prompt("analytics_prompt.txt")
+            analytics_prompt = await self.load_prompt(current_vacancy.get().analytics_prompt)
             
-            # Формируем текст диалога для анализа
-            dialog_text = "Диалог между рекрутером и кандидатом:\n\n"
-            for msg in conversation_history:
-                speaker = "Рекрутер" if msg["is_bot"] else "Кандидат"
-                dialog_text += f"{speaker}: {msg['text']}\n\n"
+            if ANALYTICS_FROM_PROFILE and candidate_profile is not None and not candidate_profile.is_empty():
+                # Компактный профиль + профайлы блоков + последние реплики: размер не зависит от длины собеседования
+                dialog_text = "Профиль кандидата, собранный по ходу собеседования:\n\n" + candidate_profile.to_text() + "\n\n"
+                if agent_state is not None:
+                    for block, fields in agent_state.profiles.items():
+                        dialog_text += f"Профайл блока {block}:\n"
+                        dialog_text += "".join(f"- {field}: {value}\n" for field, value in fields.items()) + "\n"
+                dialog_text += "Последние реплики диалога:\n\n"
+                for msg in conversation_history[-ANALYTICS_RECENT_MESSAGES:]:
+                    speaker = "Рекрутер" if msg["is_bot"] else "Кандидат"
+                    dialog_text += f"{speaker}: {msg.get('visible_text', msg['text'])}\n\n"
+            else:
+                # Формируем текст диалога для анализа
+                dialog_text = "Диалог между рекрутером и кандидатом:\n\n"
+                for msg in conversation_history:
+                    speaker = "Рекрутер" if msg["is_bot"] else "Кандидат"
+                    dialog_text += f"{speaker}: {msg['text']}\n\n"
             
             # Получаем аналитический отчет
             messages = [
@@ -105,18 +458,29 @@ class OpenAIClient:
                 {"role": "user", "content": f"Проанализируй следующий диалог и создай отчет:\n\n{dialog_text}"}
             ]
             
-            response = self.client.chat.completions.create(
-                model="gpt-4.1-mini",
-                messages=messages,
-                max_tokens=3000,
-                temperature=0.3
-            )
+            response = await self._routed_completion("analytics", messages)
             
             return response.choices[0].message.content.strip()
             
+        except CassetteMissError:
+            raise
         except Exception as e:
             print(f"Ошибка при генерации аналитического отчета: {e}")
-            return "Не удалось сгенерировать аналитический отчет."
+            return ANALYTICS_FAILED_TEXT
+
+    def format_teacher_report(self):
+        """Сравнивает задержки хода преподавателя: один запрос против двух параллельных"""
+        combined = metrics.summary("teacher.combined.total")
+        first_message = metrics.summary("teacher.split.first_message")
+        split_total = metrics.summary("teacher.split.total")
+        if not combined["count"] and not split_total["count"]:
+            return "Ходов преподавателя еще не было."
+        
+        return (
+            f"Один запрос: n={combined['count']}, p50 {combined['p50']:.1f} с, p95 {combined['p95']:.1f} с\n"
+            f"Два запроса: n={split_total['count']}, первое сообщение p50 {first_message['p50']:.1f} с, "
+            f"p95 {first_message['p95']:.1f} с; вопрос p50 {split_total['p50']:.1f} с, p95 {split_total['p95']:.1f} с"
+        )
 
     def _get_interview_type_description(self, interview_type, language):
         """Возвращает описание типа собеседования на указанном языке"""
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Выгрузка собеседований в Parquet для аналитиков: сессии, реплики и расход токенов
+
+Запуск: python parquet_export.py --out export [--batch-size 10000]
+
+Каждый запуск выгружает только новое: завершенные после прошлого запуска собеседования
+(по индексу отчетов) и новые строки журнала токенов. Результат разбит по дням:
+export/<таблица>/date=ГГГГ-ММ-ДД/part-<запуск>-<n>.parquet. Требуется pyarrow (pip install pyarrow).
+"""
+
+import argparse
+import glob
+import json
+import os
+import sqlite3
+import time
+import uuid
+from datetime import datetime
+
+from report_archive import SCORE_SECTIONS
+
+CHECKPOINT_FILE = "_checkpoint.json"
+
+
+def import_pyarrow():
+    """pyarrow нужен только для выгрузки, поэтому он не входит в обязательные зависимости бота"""
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("Для выгрузки в Parquet установите pyarrow: pip install pyarrow") from None
+    return pyarrow, pyarrow.parquet
+
+
+def build_schemas(pa):
+    """Явные схемы таблиц выгрузки"""
+    return {
+        "sessions": pa.schema([
+            ("report_id", pa.int64()),
+            ("session_id", pa.string()),
+            ("user_id", pa.string()),
+            ("interview_mode", pa.string()),
+            ("interview_type", pa.string()),
+            ("language", pa.string()),
+            ("started_at", pa.timestamp("us")),
+            ("finished_at", pa.timestamp("us")),
+            ("duration_seconds", pa.float64()),
+            ("candidate_turns", pa.int32()),
+            ("bot_turns", pa.int32()),
+            ("median_response_seconds", pa.float32()),
+            ("recommendation", pa.string()),
+            *((f"score_{section}", pa.float32()) for section in SCORE_SECTIONS.values()),
+        ]),
+        "turns": pa.schema([
+            ("session_id", pa.string()),
+            ("turn", pa.int32()),
+            ("is_bot", pa.bool_()),
+            ("ts", pa.timestamp("us")),
+            ("text", pa.string()),
+            ("block", pa.string()),
+            # Для ответа бота — сколько секунд прошло после реплики кандидата
+            ("response_seconds", pa.float32()),
+        ]),
+        "usage": pa.schema([
+            ("ts", pa.timestamp("us")),
+            ("session_id", pa.string()),
+            ("user_id", pa.string()),
+            ("interview_mode", pa.string()),
+            ("interview_type", pa.string()),
+            ("call_type", pa.string()),
+            ("model", pa.string()),
+            ("prompt_tokens", pa.int32()),
+            ("completion_tokens", pa.int32()),
+            ("cost_usd", pa.float64()),
+            ("latency_ms", pa.int32()),
+        ]),
+    }
+
+
+class PartitionedWriter:
+    """Пишет строки таблицы в файлы по дням пачками по batch_size строк.
+
+    В памяти — не больше max_buffered строк на все разделы вместе (по умолчанию batch_size): при превышении
+    записывается самый большой буфер. Открытых файлов — не больше max_open.
+    Файлы пишутся как .tmp и переименовываются только в commit, поэтому прерванный запуск
+    не оставляет наполовину записанных файлов под настоящими именами.
+    """
+
+    def __init__(self, pa, pq, root, table, schema, run_id, batch_size=10000, max_open=16, max_buffered=None):
+        self.pa = pa
+        self.pq = pq
+        self.root = root
+        self.table = table
+        self.schema = schema
+        self.run_id = run_id
+        self.batch_size = batch_size
+        self.max_open = max_open
+        self.max_buffered = max_buffered or batch_size
+        self.buffers = {}
+        self.buffered = 0
+        self.peak_buffered = 0
+        self.writers = {}
+        self.paths = {}
+        self.finished = []
+        self.rows = 0
+        self._sequence = 0
+
+    def write(self, date, row):
+        buffer = self.buffers.setdefault(date, [])
+        buffer.append(row)
+        self.rows += 1
+        self.buffered += 1
+        self.peak_buffered = max(self.peak_buffered, self.buffered)
+        if len(buffer) >= self.batch_size:
+            self._flush(date)
+        elif self.buffered >= self.max_buffered:
+            # Строки разбросаны по многим дням: пишем самый большой буфер, чтобы память не росла с архивом
+            self._flush(max(self.buffers, key=lambda key: len(self.buffers[key])))
+
+    def _flush(self, date):
+        rows = self.buffers.pop(date, [])
+        if not rows:
+            return
+        self.buffered -= len(rows)
+        writer = self.writers.pop(date, None)
+        if writer is None:
+            if len(self.writers) >= self.max_open:
+                # Закрываем самый давно использованный файл; следующая пачка этого дня пойдет в новый
+                self._close(next(iter(self.writers)))
+            writer = self._open(date)
+        # Последний использованный — в конец словаря
+        self.writers[date] = writer
+        writer.write_batch(self.pa.RecordBatch.from_pylist(rows, schema=self.schema))
+
+    def _open(self, date):
+        directory = os.path.join(self.root, self.table, f"date={date}")
+        os.makedirs(directory, exist_ok=True)
+        self._sequence += 1
+        path = os.path.join(directory, f"part-{self.run_id}-{self._sequence}.parquet.tmp")
+        self.paths[date] = path
+        return self.pq.ParquetWriter(path, self.schema, compression="zstd")
+
+    def _close(self, date):
+        self.writers.pop(date).close()
+        self.finished.append(self.paths.pop(date))
+
+    def commit(self):
+        """Дописывает буферы, закрывает файлы и дает им настоящие имена"""
+        for date in list(self.buffers):
+            self._flush(date)
+        for date in list(self.writers):
+            self._close(date)
+        for path in self.finished:
+            os.replace(path, path[:-len(".tmp")])
+        return [path[:-len(".tmp")] for path in self.finished]
+
+
+def load_checkpoint(root):
+    path = os.path.join(root, CHECKPOINT_FILE)
+    if not os.path.exists(path):
+        return {"last_report_id": 0, "ledger_offset": 0}
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def save_checkpoint(root, checkpoint):
+    """Контрольная точка сохраняется атомарно и только после переименования файлов запуска"""
+    os.makedirs(root, exist_ok=True)
+    path = os.path.join(root, CHECKPOINT_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as file:
+        json.dump(checkpoint, file)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(path + ".tmp", path)
+
+
+def parse_timestamp(value):
+    return datetime.fromisoformat(value) if value else None
+
+
+def session_rows(report, transcript_dir):
+    """Строка сессии и строки реплик для одного отчета из индекса; журнал читается по одной сессии"""
+    from agent_state import AgentState
+    from transcript_log import load_transcript
+
+    history = []
+    session = {}
+    path = os.path.join(transcript_dir, f"{report['session_id']}.jsonl") if report["session_id"] else None
+    if path and os.path.exists(path):
+        session, history = load_transcript(path)
+
+    turns = []
+    response_times = []
+    agent_state = AgentState()
+    last_candidate_ts = None
+    for index, message in enumerate(history):
+        response_seconds = None
+        if message["is_bot"]:
+            agent_state.update_from_tags(message["agent_trace"])
+            if last_candidate_ts is not None:
+                response_seconds = (message["timestamp"] - last_candidate_ts).total_seconds()
+                response_times.append(response_seconds)
+                last_candidate_ts = None
+        else:
+            last_candidate_ts = message["timestamp"]
+        turns.append({
+            "session_id": report["session_id"],
+            "turn": index,
+            "is_bot": message["is_bot"],
+            "ts": message["timestamp"],
+            "text": message["visible_text"] if message["is_bot"] else message["text"],
+            "block": agent_state.block,
+            "response_seconds": response_seconds,
+        })
+
+    finished_at = parse_timestamp(report["created_at"])
+    started_at = history[0]["timestamp"] if history else None
+    response_times.sort()
+    row = {
+        "report_id": report["id"],
+        "session_id": report["session_id"],
+        "user_id": report["user_id"],
+        "interview_mode": report["interview_mode"] or session.get("interview_mode"),
+        "interview_type": report["interview_type"] or session.get("interview_type"),
+        "language": report["language"] or session.get("language"),
+        "started_at": started_at,
+        "finished_at": finished_at,
+        "duration_seconds": (finished_at - started_at).total_seconds() if started_at else None,
+        "candidate_turns": sum(1 for message in history if not message["is_bot"]) if history else None,
+        "bot_turns": sum(1 for message in history if message["is_bot"]) if history else None,
+        "median_response_seconds": response_times[len(response_times) // 2] if response_times else None,
+        "recommendation": report["recommendation"],
+        **{f"score_{section}": report[f"score_{section}"] for section in SCORE_SECTIONS.values()},
+    }
+    return row, turns
+
+
+def export(out="export", index_path="dialogs/reports.sqlite3", transcript_dir="transcripts",
+           ledger_path="usage/ledger.jsonl", batch_size=10000):
+    """Выгружает новое с прошлого запуска; возвращает {таблица: число строк}"""
+    pa, pq = import_pyarrow()
+    schemas = build_schemas(pa)
+    checkpoint = load_checkpoint(out)
+    run_id = datetime.now().strftime("%Y%m%d%H%M%S") + "-" + uuid.uuid4().hex[:6]
+
+    # Файлы прерванного запуска не попали в контрольную точку, их данные выгрузятся заново
+    for stale in glob.glob(os.path.join(out, "*", "date=*", "*.parquet.tmp")):
+        os.remove(stale)
+
+    writers = {
+        table: PartitionedWriter(pa, pq, out, table, schema, run_id, batch_size)
+        for table, schema in schemas.items()
+    }
+
+    # Завершенные собеседования — по индексу отчетов, курсор SQLite читает строки по мере обработки
+    last_report_id = checkpoint["last_report_id"]
+    if os.path.exists(index_path):
+        connection = sqlite3.connect(index_path)
+        connection.row_factory = sqlite3.Row
+        try:
+            for report in connection.execute("SELECT * FROM reports WHERE id > ? ORDER BY id", (last_report_id,)):
+                row, turns = session_rows(report, transcript_dir)
+                date = row["finished_at"].strftime("%Y-%m-%d")
+                writers["sessions"].write(date, row)
+                for turn in turns:
+                    writers["turns"].write(date, turn)
+                last_report_id = report["id"]
+        finally:
+            connection.close()
+
+    # Журнал токенов только дописывается, поэтому продолжаем с сохраненного смещения
+    ledger_offset = checkpoint["ledger_offset"]
+    if os.path.exists(ledger_path):
+        with open(ledger_path, "rb") as file:
+            file.seek(ledger_offset)
+            for line in file:
+                # Незавершенная последняя строка будет выгружена в следующий раз
+                if not line.endswith(b"\n"):
+                    break
+                ledger_offset += len(line)
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                writers["usage"].write(record["day"], {
+                    "ts": parse_timestamp(record["ts"]),
+                    "session_id": record["session_id"],
+                    "user_id": None if record["user_id"] is None else str(record["user_id"]),
+                    "interview_mode": record["interview_mode"],
+                    "interview_type": record["interview_type"],
+                    "call_type": record["call_type"],
+                    "model": record["model"],
+                    "prompt_tokens": record["prompt_tokens"],
+                    "completion_tokens": record["completion_tokens"],
+                    "cost_usd": record["cost_usd"],
+                    "latency_ms": record.get("latency_ms"),
+                })
+
+    for writer in writers.values():
+        writer.commit()
+    save_checkpoint(out, {"last_report_id": last_report_id, "ledger_offset": ledger_offset})
+    return {table: writer.rows for table, writer in writers.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Инкрементальная выгрузка собеседований в Parquet")
+    parser.add_argument("--out", default="export")
+    parser.add_argument("--index", default=os.getenv("REPORT_INDEX_PATH", "dialogs/reports.sqlite3"))
+    parser.add_argument("--transcripts", default=os.getenv("TRANSCRIPT_DIR", "transcripts"))
+    parser.add_argument("--ledger", default=os.getenv("USAGE_LEDGER_PATH", "usage/ledger.jsonl"))
+    parser.add_argument("--batch-size", type=int, default=10000)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    counts = export(args.out, args.index, args.transcripts, args.ledger, args.batch_size)
+    print(
+        f"✅ Выгружено: сессий {counts['sessions']}, реплик {counts['turns']}, "
+        f"запросов к LLM {counts['usage']} за {time.perf_counter() - started:.1f} с"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+import logging
+import re
+
+from agent_state import normalize_block_name
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Заголовки разделов блоков: описание блока ("Блок Проект") и его профайл ("Профайл блока Проект")
+BLOCK_HEADING_PATTERN = re.compile(r'^\s*(профайл\s+блока|блок)\s+\S', re.IGNORECASE)
+PROFILE_HEADING_PATTERN = re.compile(r'^\s*профайл\s+блока\s', re.IGNORECASE)
+
+# Ссылка описания блока на другой блок ("Содержимое этого блока совпадает с содержимым блока ...")
+BLOCK_REFERENCE_PATTERN = re.compile(r'содержим\w*\s+блока\s+([^\n.]+)', re.IGNORECASE)
+
+# Разделы агентов, которые по промтам работают только в одном блоке: заголовок раздела — название блока.
+# Агент-презентации активируется в блоке Презентация вакансии; в промтах без этого блока раздел не нужен
+BLOCK_AGENT_HEADINGS = {
+    "презентация (агент-презентации)": "презентация вакансии",
+}
+
+# Раздел с приветствием нужен только до выбора первого блока
+GREETING_HEADING_PATTERN = re.compile(r'^\s*начало\s+работы\s*$', re.IGNORECASE)
+
+# Блок раздела, который не относится ни к одному блоку промта и при известном блоке не отправляется
+UNUSED_BLOCK = ""
+
+# Порог совпадения основ слов для сопоставления названий блоков
+BLOCK_MATCH_THRESHOLD = 0.5
+# Порог, при котором разные написания считаются одним блоком ("большие"/"больших")
+BLOCK_MERGE_THRESHOLD = 0.8
+
+
+def _stems(text):
+    """Возвращает основы слов (первые 5 букв)"""
+    return {word[:5] for word in re.findall(r'\w+', text)}
+
+
+def _similarity(first, second):
+    """Доля общих основ слов в двух названиях"""
+    first_stems, second_stems = _stems(first), _stems(second)
+    return len(first_stems & second_stems) / max(len(first_stems | second_stems), 1)
+
+
+class PromptSection:
+    """Раздел промта: общий (block=None) или относящийся к конкретному блоку.
+
+    kind — "block" (описание блока), "profile" (профайл блока), "agent" (агент блока) или None.
+    """
+
+    def __init__(self, text, block=None, kind=None):
+        self.text = text
+        self.block = block
+        self.kind = kind
+
+
+class SlicedPrompt:
+    """Промт, разобранный на общее ядро и разделы блоков.
+
+    Порядок блоков — порядок их профайлов в промте (в нем блоки проходятся на собеседовании),
+    блоки без профайла идут следом в порядке появления.
+    """
+
+    def __init__(self, prompt):
+        self.prompt = prompt
+        self.sections = self._split(prompt)
+        self.blocks = []
+        for kind in ("profile", "block"):
+            for section in self.sections:
+                if section.kind != kind:
+                    continue
+                # Разные написания одного блока в заголовках сводим к первому
+                same = [block for block in self.blocks if _similarity(block, section.block) >= BLOCK_MERGE_THRESHOLD]
+                if same:
+                    section.block = same[0]
+                elif section.block not in self.blocks:
+                    self.blocks.append(section.block)
+
+        for section in self.sections:
+            if section.kind == "agent":
+                section.block = self.match_block(section.block) or UNUSED_BLOCK
+
+    def _split(self, prompt):
+        """Делит промт на абзацы; заголовок блока всегда начинает новый раздел"""
+        sections = []
+        current = []
+
+        def flush():
+            if current:
+                sections.append(self._section('\n'.join(current)))
+
+        for line in prompt.split('\n'):
+            if not line.strip():
+                flush()
+                current = []
+                continue
+            if BLOCK_HEADING_PATTERN.match(line):
+                flush()
+                current = []
+            current.append(line)
+        flush()
+        return sections
+
+    def _section(self, text):
+        """Определяет по заголовку (первой строке), к какому блоку относится раздел"""
+        heading = text.split('\n', 1)[0].strip()
+        if BLOCK_HEADING_PATTERN.match(heading):
+            kind = "profile" if PROFILE_HEADING_PATTERN.match(heading) else "block"
+            return PromptSection(text, normalize_block_name(heading), kind)
+        agent_block = BLOCK_AGENT_HEADINGS.get(heading.lower())
+        if agent_block:
+            return PromptSection(text, agent_block, "agent")
+        if GREETING_HEADING_PATTERN.match(heading):
+            return PromptSection(text, UNUSED_BLOCK)
+        return PromptSection(text)
+
+    def match_block(self, name):
+        """Находит блок промта, соответствующий названию из тега агента-блока"""
+        name = normalize_block_name(name)
+        if not name:
+            return None
+        if name in self.blocks:
+            return name
+
+        for block in self.blocks:
+            if name in block or block in name:
+                return block
+
+        # Совпадение по основам слов
+        best_block, best_score = None, 0.0
+        for block in self.blocks:
+            score = _similarity(name, block)
+            if score > best_score:
+                best_block, best_score = block, score
+        return best_block if best_score >= BLOCK_MATCH_THRESHOLD else None
+
+    def render(self, active_block, with_next=True):
+        """Собирает промт из общего ядра, активного блока и описаний блоков, на которые он ссылается.
+
+        with_next — добавить следующий блок: по промтам переход к нему возможен только после заполнения
+        профайла активного блока, до этого его разделы не нужны.
+        """
+        block = self.match_block(active_block)
+        if block is None:
+            return self.prompt
+
+        selected = {block}
+        position = self.blocks.index(block)
+        if with_next and position + 1 < len(self.blocks):
+            selected.add(self.blocks[position + 1])
+
+        # Описание блока может ссылаться на другой ("совпадает с содержимым блока ..."): нужно его описание, не профайл
+        referenced = set()
+        for section in self.sections:
+            if section.kind == "block" and section.block in selected:
+                for name in BLOCK_REFERENCE_PATTERN.findall(section.text):
+                    referenced.add(self.match_block(name))
+
+        return '\n\n'.join(
+            section.text for section in self.sections
+            if section.block is None or section.block in selected
+            or (section.kind == "block" and section.block in referenced)
+        )
+
+
+class PromptSlicer:
+    """Отправляет в модель только общее ядро промта и разделы активного (и при переходе — следующего) блока"""
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._cache = {}
+        self._unmatched = set()
+
+    def slice(self, prompt, active_block, with_next=True):
+        """Возвращает урезанный промт для активного блока (или полный, если блок неизвестен)"""
+        if not self.enabled or not active_block:
+            sliced = prompt
+        else:
+            parsed = self._cache.get(prompt)
+            if parsed is None:
+                parsed = self._cache[prompt] = SlicedPrompt(prompt)
+            if parsed.match_block(active_block) is None:
+                self._log_unmatched(parsed, active_block)
+                sliced = prompt
+            else:
+                sliced = parsed.render(active_block, with_next)
+
+        metrics.incr("prompt.full_chars", len(prompt))
+        metrics.incr("prompt.sent_chars", len(sliced))
+        return sliced
+
+    def _log_unmatched(self, parsed, active_block):
+        # Блок из тега модели не найден в промте — отправляется полный промт; предупреждение — раз на блок и промт
+        metrics.incr("prompt.unmatched")
+        key = (id(parsed), active_block)
+        if key not in self._unmatched:
+            self._unmatched.add(key)
+            logger.warning(f"Блок «{active_block}» не найден в промте (блоки: {', '.join(parsed.blocks)}), "
+                           f"отправляется полный промт")
+
+
+def format_slicing_report():
+    """Форматирует отчет об экономии символов промта"""
+    full_chars = metrics.get("prompt.full_chars")
+    if not full_chars:
+        return "Промты еще не отправлялись."
+
+    sent_chars = metrics.get("prompt.sent_chars")
+    report = f"Отправлено {sent_chars:.0f} из {full_chars:.0f} символов промта ({1 - sent_chars / full_chars:.0%} экономии)"
+    unmatched = metrics.get("prompt.unmatched")
+    if unmatched:
+        report += f"\nБлок не найден в промте, отправлен полный: {unmatched:.0f}"
+    return report
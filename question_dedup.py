@@ -0,0 +1,140 @@
+import random
+import re
+import zlib
+
+from agent_state import AgentState
+from metrics import metrics
+from model_router import detect_role
+from transcript_search import TOKEN_PATTERN, stem
+
+# Служебные слова не отличают один вопрос от другого ("Расскажите, пожалуйста, о вашем ...")
+STOP_WORDS = {
+    stem(word) for word in (
+        "и", "в", "во", "о", "об", "с", "со", "на", "по", "к", "а", "но", "или", "ли", "же", "бы", "вы", "вас", "вам",
+        "ваш", "ваша", "ваше", "ваши", "вашем", "вашей", "вашего", "как", "что", "какой", "какие", "это", "этот",
+        "пожалуйста", "расскажите", "подробнее", "можете", "могли",
+        "the", "a", "an", "you", "your", "of", "to", "in", "on", "with", "do", "did", "what", "how", "is", "are",
+        "please", "tell", "me", "about", "could", "can", "and", "or",
+    )
+}
+
+SENTENCE_PATTERN = re.compile(r"[^.!?\n]+[.!?]*")
+
+# MinHash: число хеш-функций и их параметры (фиксированное зерно — подписи одинаковы между запусками)
+NUM_PERMUTATIONS = 32
+_PRIME = (1 << 61) - 1
+_random = random.Random(20240501)
+_PERMUTATIONS = [(_random.randrange(1, _PRIME), _random.randrange(0, _PRIME)) for _ in range(NUM_PERMUTATIONS)]
+
+# Вопросы короче этого числа шинглов не сравниваются ("Почему?" не считается повтором)
+MIN_SHINGLES = 3
+
+# Подтверждение профайла промт требует в каждом блоке и после каждой правки ("Всё ли верно в профайле?"),
+# а после подтверждения неполного профайла — переспросить незаполненные поля. Такие повторы не ищутся:
+# ответы агента-подтверждения (роль из model_router) и вопросы о профайле не сравниваются и не запоминаются
+CONFIRMATION_ROLE = "подтверждения"
+PROFILE_QUESTION_PATTERN = re.compile(r"профайл|profile", re.IGNORECASE)
+
+
+def extract_questions(visible_text):
+    """Вопросы из ответа бота: предложения с "?", а если их нет — последнее предложение (просьба рассказать)"""
+    sentences = [sentence.strip() for sentence in SENTENCE_PATTERN.findall(visible_text or "") if sentence.strip()]
+    questions = [sentence for sentence in sentences if sentence.endswith("?")]
+    if not questions and sentences:
+        questions = sentences[-1:]
+    return questions
+
+
+def shingles(text):
+    """Основы значимых слов и пары соседних основ"""
+    tokens = [token for token in (stem(word) for word in TOKEN_PATTERN.findall(text)) if token not in STOP_WORDS]
+    return set(tokens) | {f"{first} {second}" for first, second in zip(tokens, tokens[1:])}
+
+
+def minhash(shingle_set):
+    hashes = [zlib.crc32(shingle.encode("utf-8")) for shingle in shingle_set]
+    return tuple(min((a * value + b) % _PRIME for value in hashes) for a, b in _PERMUTATIONS)
+
+
+def similarity(first, second):
+    """Оценка коэффициента Жаккара по двум подписям MinHash"""
+    return sum(a == b for a, b in zip(first, second)) / NUM_PERMUTATIONS
+
+
+class QuestionIndex:
+    """Вопросы, уже заданные в сессии, в виде подписей MinHash.
+
+    Вопросы сравниваются только в пределах блока собеседования: block — текущий блок агента-блока.
+    role — роль финального агента ответа: ответы агента-подтверждения не проверяются, а подтверждение
+    начинает блок заново — после него переспросить незаполненные поля не считается повтором.
+    """
+
+    def __init__(self, threshold=0.6):
+        self.threshold = threshold
+        self.questions = []
+        self.signatures = []
+        self.blocks = []
+
+    @classmethod
+    def from_history(cls, conversation_history, threshold=0.6):
+        index = cls(threshold)
+        agent_state = AgentState()
+        for message in conversation_history:
+            if message["is_bot"]:
+                agent_state.update(message["text"])
+                index.add(message["visible_text"], agent_state.block, detect_role(message["text"]))
+        return index
+
+    def add(self, visible_text, block=None, role=None):
+        """Запоминает вопросы из ответа бота"""
+        if role == CONFIRMATION_ROLE:
+            self._forget_block(block)
+            return
+        for question in extract_questions(visible_text):
+            shingle_set = shingles(question)
+            if len(shingle_set) >= MIN_SHINGLES and not PROFILE_QUESTION_PATTERN.search(question):
+                self.questions.append(question)
+                self.signatures.append(minhash(shingle_set))
+                self.blocks.append(block)
+
+    def find_duplicate(self, visible_text, block=None, role=None):
+        """Ранее заданный в том же блоке вопрос, почти совпадающий с вопросом из нового ответа бота, или None"""
+        if role == CONFIRMATION_ROLE:
+            return None
+        for question in extract_questions(visible_text):
+            shingle_set = shingles(question)
+            if len(shingle_set) < MIN_SHINGLES or PROFILE_QUESTION_PATTERN.search(question):
+                continue
+            signature = minhash(shingle_set)
+            for previous, previous_signature, previous_block in zip(self.questions, self.signatures, self.blocks):
+                if previous_block == block and similarity(signature, previous_signature) >= self.threshold:
+                    return previous
+        return None
+
+    def _forget_block(self, block):
+        kept = [entry for entry in zip(self.questions, self.signatures, self.blocks) if entry[2] != block]
+        self.questions = [question for question, _, _ in kept]
+        self.signatures = [signature for _, signature, _ in kept]
+        self.blocks = [entry_block for _, _, entry_block in kept]
+
+
+def compact_bot_message(message):
+    """Старая реплика бота для истории в промте: теги агентов и сами вопросы, без вступлений и разборов"""
+    tags = " ".join(f"{{{tag}}}" for tag in message.get("agent_trace", []))
+    questions = " ".join(extract_questions(message.get("visible_text", message["text"])))
+    return f"{tags} {questions}".strip()
+
+
+def format_dedup_report():
+    """Форматирует отчет о повторах вопросов и сокращении истории"""
+    detected = metrics.get("dedup.detected")
+    checked = metrics.get("dedup.checked")
+    if not checked:
+        return "Проверок на повтор вопросов еще не было."
+
+    return (
+        f"Проверено ответов: {checked:.0f}, повторов: {detected:.0f} ({detected / checked:.1%})\n"
+        f"Исправлено перегенерацией: {metrics.get('dedup.regenerated'):.0f}, "
+        f"осталось повторов: {metrics.get('dedup.unresolved'):.0f}\n"
+        f"Сокращено старых реплик бота в истории: {metrics.get('history.trimmed_chars'):.0f} символов"
+    )
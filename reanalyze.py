@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Повторный анализ прошлых собеседований текущим analytics_prompt.txt
+
+Запуск: python reanalyze.py [--concurrency 4] [--retries 3] [--type hard] [--since 2024-01-01] [--limit 100]
+
+Собеседования берутся из индекса отчетов, диалоги — из журналов сессий (transcripts/).
+Каждое собеседование анализируется промтом аналитики своей вакансии (vacancies.json).
+Новая рекомендация, оценки и версия промта записываются обратно в индекс, текст аналитики —
+в полнотекстовый поиск. Версия промта в индексе служит контрольной точкой: прерванный запуск
+продолжается с необработанных собеседований, а уже оцененные текущим промтом пропускаются.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+
+from metrics import metrics
+from report_archive import ReportArchive, analytics_prompt_version, parse_recommendation, parse_scores
+from vacancies import DEFAULT_VACANCY, current_vacancy, load_vacancies
+
+logger = logging.getLogger(__name__)
+
+
+class AnalysisFailed(Exception):
+    """LLM не вернула пригодный отчет (ошибка запроса или нет строки оценок)"""
+
+
+class Reanalyzer:
+    """Прогоняет generate_analytics_report по сохраненным диалогам с ограниченной параллельностью и повторами"""
+
+    def __init__(self, openai_client, archive, transcript_dir="transcripts", search_index=None,
+                 concurrency=4, max_retries=3, retry_delay=2.0, progress_every=10, vacancies=None):
+        self.openai_client = openai_client
+        self.archive = archive
+        self.transcript_dir = transcript_dir
+        self.search_index = search_index
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.progress_every = progress_every
+        self.vacancies = {vacancy.key: vacancy for vacancy in vacancies or [DEFAULT_VACANCY]}
+        # Версия промта аналитики каждой вакансии
+        self.versions = {key: analytics_prompt_version(vacancy.analytics_prompt) for key, vacancy in self.vacancies.items()}
+        self.done = 0
+        self.failed = 0
+        self.skipped = 0
+        self.started = None
+
+    def pending(self, interview_type=None, since=None, limit=None):
+        """Отчеты известных вакансий, оцененные не текущей версией промта своей вакансии, старые первыми"""
+        reports = []
+        for key, version in self.versions.items():
+            reports += self.archive.pending_analysis(version, interview_type, since, limit, vacancy=key)
+        reports.sort(key=lambda report: report["id"])
+        return reports if limit is None else reports[:limit]
+
+    async def run(self, reports):
+        """Обрабатывает отчеты; возвращает {"done", "failed", "skipped", "per_minute"}"""
+        from usage_ledger import bind_session
+
+        queue = asyncio.Queue()
+        for report in reports:
+            queue.put_nowait(report)
+        total = queue.qsize()
+        self.started = time.monotonic()
+
+        async def worker():
+            while not queue.empty():
+                report = queue.get_nowait()
+                # Токены повторного анализа учитываются на исходную сессию
+                bind_session(report["session_id"], report["user_id"], report["interview_mode"], report["interview_type"])
+                await self._process(report)
+                processed = self.done + self.failed + self.skipped
+                if self.progress_every and processed % self.progress_every == 0:
+                    logger.info(f"Обработано {processed}/{total}, {self.per_minute():.1f} собеседований/мин")
+
+        await asyncio.gather(*(worker() for _ in range(min(self.concurrency, total) or 1)))
+        self.openai_client.ledger.flush()
+        return {"done": self.done, "failed": self.failed, "skipped": self.skipped, "per_minute": self.per_minute()}
+
+    def per_minute(self):
+        elapsed = time.monotonic() - self.started
+        return self.done / elapsed * 60 if elapsed > 0 else 0.0
+
+    async def _process(self, report):
+        from transcript_log import load_transcript, rebuild_agent_state
+
+        vacancy = self.vacancies.get(report["vacancy"])
+        path = os.path.join(self.transcript_dir, f"{report['session_id']}.jsonl")
+        if vacancy is None or not os.path.exists(path):
+            self.skipped += 1
+            metrics.incr("reanalysis.skipped")
+            return
+        _, history = await asyncio.to_thread(load_transcript, path)
+        if not history:
+            self.skipped += 1
+            metrics.incr("reanalysis.skipped")
+            return
+
+        # Промт аналитики — вакансии собеседования
+        token = current_vacancy.set(vacancy)
+        try:
+            analytics_report = await self._analyze_with_retries(history, rebuild_agent_state(history))
+        except AnalysisFailed as e:
+            self.failed += 1
+            metrics.incr("reanalysis.failed")
+            logger.error(f"Отчет #{report['id']} (сессия {report['session_id']}) не переоценен: {e}")
+            return
+        finally:
+            current_vacancy.reset(token)
+
+        # Результат пишется сразу: прерванный запуск не теряет уже сделанное
+        self.archive.update_analysis(
+            report["id"], parse_recommendation(analytics_report), parse_scores(analytics_report),
+            self.versions[vacancy.key]
+        )
+        if self.search_index is not None:
+            self.search_index.add_interview(
+                report["session_id"], report["user_id"], history, analytics_report, name=report["name"],
+                interview_mode=report["interview_mode"], interview_type=report["interview_type"],
+                language=report["language"], finished_at=datetime.fromisoformat(report["created_at"]),
+                vacancy=vacancy.key
+            )
+        self.done += 1
+        metrics.incr("reanalysis.done")
+
+    async def _analyze_with_retries(self, history, agent_state):
+        from openai_client import ANALYTICS_FAILED_TEXT
+
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                metrics.incr("reanalysis.retries")
+                await asyncio.sleep(self.retry_delay * 2 ** (attempt - 1))
+            # Отчет строится по полному диалогу: профиля кандидата из живой сессии здесь нет
+            analytics_report = await self.openai_client.generate_analytics_report(history, agent_state=agent_state)
+            if analytics_report == ANALYTICS_FAILED_TEXT:
+                error = "ошибка запроса к LLM"
+            elif not parse_scores(analytics_report):
+                error = "в отчете нет строки оценок"
+            else:
+                return analytics_report
+        raise AnalysisFailed(f"{error} после {self.max_retries + 1} попыток")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Повторный анализ прошлых собеседований текущим промтом")
+    parser.add_argument("--index", default=os.getenv("REPORT_INDEX_PATH", "dialogs/reports.sqlite3"))
+    parser.add_argument("--search-index", default=os.getenv("SEARCH_INDEX_PATH", "dialogs/search.sqlite3"))
+    parser.add_argument("--transcripts", default=os.getenv("TRANSCRIPT_DIR", "transcripts"))
+    parser.add_argument("--vacancies", default=os.getenv("VACANCIES_FILE", "vacancies.json"))
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--type", dest="interview_type", choices=["soft", "hard", "experience"])
+    parser.add_argument("--since", type=datetime.fromisoformat)
+    parser.add_argument("--limit", type=int)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    from openai_client import OpenAIClient
+    from transcript_search import TranscriptSearch
+
+    archive = ReportArchive(args.index)
+    search_index = TranscriptSearch(args.search_index) if args.search_index else None
+    reanalyzer = Reanalyzer(
+        OpenAIClient(), archive, args.transcripts, search_index, args.concurrency, args.retries,
+        vacancies=load_vacancies(args.vacancies, require_token=False)
+    )
+    reports = reanalyzer.pending(args.interview_type, args.since, args.limit)
+    versions = ", ".join(f"{key} {version}" for key, version in reanalyzer.versions.items())
+    print(f"Версии промта ({versions}), к повторному анализу: {len(reports)}")
+
+    result = asyncio.run(reanalyzer.run(reports))
+    print(
+        f"✅ Переоценено: {result['done']}, ошибок: {result['failed']}, без журнала: {result['skipped']}, "
+        f"скорость {result['per_minute']:.1f} собеседований/мин"
+    )
+
+
+if __name__ == "__main__":
+    main()
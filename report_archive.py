@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+"""
+Индекс отчетов по собеседованиям в SQLite и упаковка старых отчетов в помесячные архивы
+
+Поиск отчетов:     python report_archive.py find --user 123456 [--recommendation принять] [--vacancy default]
+Выгрузка отчета:   python report_archive.py get <id> [-o report.docx]
+Упаковка старых:   python report_archive.py compact [--days 30]
+Индексация папки:  python report_archive.py backfill [dialogs]
+"""
+
+import argparse
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import zipfile
+from datetime import datetime, timedelta
+
+from metrics import metrics
+from vacancies import DEFAULT_VACANCY_KEY
+
+logger = logging.getLogger(__name__)
+
+# Финальная рекомендация из аналитического отчета (см. раздел 7 analytics_prompt.txt)
+RECOMMENDATIONS = {
+    "принять": re.compile(r"\bприня|\bhire|\baccept", re.IGNORECASE),
+    "отклонить": re.compile(r"\bотклон|\breject", re.IGNORECASE),
+    "рассмотреть": re.compile(r"\bрассмотр|\bconsider", re.IGNORECASE),
+}
+FINAL_RECOMMENDATION_PATTERN = re.compile(
+    # Вердикт бывает в той же строке или на следующей ("**Финальная рекомендация:**\nПринять")
+    r"(?:финальная\s+рекомендация|final\s+recommendation)[^\n]*(?:\n\s*[^\n]*)?", re.IGNORECASE
+)
+
+# Оценки разделов 1-6 из последней строки аналитики: "ОЦЕНКИ: общая=7; образование=6; ..." (0-10)
+SCORE_SECTIONS = {
+    "общая": "overall",
+    "образование": "education",
+    "опыт": "experience",
+    "проекты": "projects",
+    "технические": "technical",
+    "soft": "soft_skills",
+}
+SCORES_LINE_PATTERN = re.compile(r"ОЦЕНКИ\s*:([^\n]*)", re.IGNORECASE)
+SCORE_PATTERN = re.compile(r"([\w ]+?)\s*=\s*(\d+(?:[.,]\d+)?)")
+
+# Имя файла из DocumentGenerator.save_document
+REPORT_FILENAME_PATTERN = re.compile(r"^interview_report_(.+)_(\d{8}_\d{6})\.docx$")
+
+
+def parse_recommendation(analytics_report):
+    """Находит финальную рекомендацию (принять/отклонить/рассмотреть) в тексте аналитики или возвращает None"""
+    if not analytics_report:
+        return None
+
+    # Берется последнее упоминание финальной рекомендации
+    for fragment in reversed(FINAL_RECOMMENDATION_PATTERN.findall(analytics_report)):
+        found = sorted(
+            (match.start(), recommendation)
+            for recommendation, pattern in RECOMMENDATIONS.items()
+            for match in [pattern.search(fragment)] if match
+        )
+        # Все три варианта подряд — это повтор шаблона "(принять/отклонить/рассмотреть)", а не вердикт
+        if found and len(found) < len(RECOMMENDATIONS):
+            # Вариант, названный первым ("рассмотреть, скорее принять" — рассмотреть)
+            return found[0][1]
+    return None
+
+
+def analytics_prompt_version(path="analytics_prompt.txt"):
+    """Версия промта аналитики (хеш текста): по ней видно, какие отчеты оценены старым промтом"""
+    with open(path, "rb") as file:
+        return hashlib.sha256(file.read()).hexdigest()[:12]
+
+
+def parse_scores(analytics_report):
+    """Оценки разделов из строки "ОЦЕНКИ: ..." как {section: 0-10}; нераспознанные и пропущенные разделы не попадают"""
+    lines = SCORES_LINE_PATTERN.findall(analytics_report or "")
+    if not lines:
+        return {}
+
+    scores = {}
+    for label, value in SCORE_PATTERN.findall(lines[-1]):
+        section = SCORE_SECTIONS.get(label.strip().lower())
+        if section is not None:
+            scores[section] = min(max(float(value.replace(",", ".")), 0.0), 10.0)
+    return scores
+
+
+class ReportArchive:
+    """Индекс DOCX отчетов: кто, когда, в каком режиме и с какой рекомендацией; старые отчеты упакованы в zip по месяцам.
+
+    add, find и compact открывают свое соединение, поэтому бот вызывает их из фонового потока.
+    """
+
+    def __init__(self, path="dialogs/reports.sqlite3", archive_dir="dialogs/archive"):
+        self.path = path
+        self.archive_dir = archive_dir
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = self._connect()
+        self.connection.execute(
+            """CREATE TABLE IF NOT EXISTS reports (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id TEXT NOT NULL,
+                session_id TEXT,
+                name TEXT,
+                created_at TEXT NOT NULL,
+                interview_mode TEXT,
+                interview_type TEXT,
+                recommendation TEXT,
+                path TEXT NOT NULL,
+                archive TEXT
+            )"""
+        )
+        self._add_missing_columns()
+        self.connection.execute("CREATE INDEX IF NOT EXISTS reports_user ON reports (user_id, created_at)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS reports_created ON reports (created_at)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS reports_vacancy ON reports (vacancy, created_at)")
+        self.connection.commit()
+
+    def _add_missing_columns(self):
+        # Индексы, созданные до появления оценок, дополняются столбцами на месте
+        existing = {row["name"] for row in self.connection.execute("PRAGMA table_info(reports)")}
+        columns = ["language", "analysis_version", "analyzed_at", "vacancy", "variant", "turns"] + [f"score_{section}" for section in SCORE_SECTIONS.values()]
+        for column in columns:
+            if column not in existing:
+                column_type = "REAL" if column.startswith("score_") else "INTEGER" if column == "turns" else "TEXT"
+                self.connection.execute(f"ALTER TABLE reports ADD COLUMN {column} {column_type}")
+        if "vacancy" not in existing:
+            # Отчеты, сохраненные до появления вакансий, — отчеты бота по умолчанию
+            self.connection.execute("UPDATE reports SET vacancy = ?", (DEFAULT_VACANCY_KEY,))
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path)
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    def add(self, user_id, path, interview_mode=None, interview_type=None, recommendation=None,
+            session_id=None, name=None, created_at=None, language=None, scores=None, analysis_version=None,
+            vacancy=DEFAULT_VACANCY_KEY, variant=None, turns=None):
+        """Добавляет сохраненный отчет в индекс и возвращает его id.
+
+        scores — {section: 0-10} из parse_scores; variant — вариант A/B-эксперимента, turns — число ответов кандидата.
+        Без оценок (аналитика не получена или без строки ОЦЕНКИ) версия промта не записывается:
+        такой отчет остается в pending_analysis и будет оценен заново.
+        """
+        created_at = created_at or datetime.now()
+        scores = scores or {}
+        if not scores:
+            analysis_version = None
+        score_columns = [f"score_{section}" for section in SCORE_SECTIONS.values()]
+        connection = self._connect()
+        try:
+            with connection:
+                cursor = connection.execute(
+                    f"""INSERT INTO reports
+                       (user_id, session_id, name, created_at, interview_mode, interview_type, recommendation, path,
+                        language, analysis_version, vacancy, variant, turns, {", ".join(score_columns)})
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, {", ".join("?" * len(score_columns))})""",
+                    (str(user_id), session_id, name, created_at.isoformat(sep=" ", timespec="seconds"),
+                     interview_mode, interview_type, recommendation, path,
+                     language, analysis_version, vacancy, variant, turns, *(scores.get(section) for section in SCORE_SECTIONS.values()))
+                )
+        finally:
+            connection.close()
+        metrics.incr("reports.indexed")
+        return cursor.lastrowid
+
+    def find(self, user_id=None, interview_mode=None, interview_type=None, recommendation=None,
+             since=None, until=None, limit=50, vacancy=None):
+        """Отчеты по условиям, новые первыми"""
+        conditions = []
+        values = []
+        for column, value in (("user_id", None if user_id is None else str(user_id)),
+                              ("interview_mode", interview_mode),
+                              ("interview_type", interview_type),
+                              ("recommendation", recommendation),
+                              ("vacancy", vacancy)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                values.append(value)
+        if since is not None:
+            conditions.append("created_at >= ?")
+            values.append(since.isoformat(sep=" ", timespec="seconds"))
+        if until is not None:
+            conditions.append("created_at < ?")
+            values.append(until.isoformat(sep=" ", timespec="seconds"))
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        connection = self._connect()
+        try:
+            rows = connection.execute(
+                f"SELECT * FROM reports {where} ORDER BY created_at DESC, id DESC LIMIT ?", (*values, limit)
+            ).fetchall()
+        finally:
+            connection.close()
+        return [dict(row) for row in rows]
+
+    def update_analysis(self, report_id, recommendation, scores, analysis_version):
+        """Записывает результат повторного анализа: рекомендацию, оценки и версию промта"""
+        score_columns = [f"score_{section}" for section in SCORE_SECTIONS.values()]
+        self.connection.execute(
+            f"""UPDATE reports SET recommendation = ?, analysis_version = ?, analyzed_at = ?,
+                {", ".join(f"{column} = ?" for column in score_columns)}
+                WHERE id = ?""",
+            (recommendation, analysis_version, datetime.now().isoformat(sep=" ", timespec="seconds"),
+             *(scores.get(section) for section in SCORE_SECTIONS.values()), report_id)
+        )
+        self.connection.commit()
+
+    def pending_analysis(self, analysis_version, interview_type=None, since=None, limit=None, vacancy=None):
+        """Отчеты с журналом сессии, оцененные не текущей версией промта, старые первыми.
+
+        У каждой вакансии свой промт аналитики, поэтому версия сравнивается в пределах вакансии (vacancy).
+        """
+        conditions = ["session_id IS NOT NULL", "(analysis_version IS NULL OR analysis_version != ?)"]
+        values = [analysis_version]
+        if vacancy is not None:
+            conditions.append("vacancy = ?")
+            values.append(vacancy)
+        if interview_type is not None:
+            conditions.append("interview_type = ?")
+            values.append(interview_type)
+        if since is not None:
+            conditions.append("created_at >= ?")
+            values.append(since.isoformat(sep=" ", timespec="seconds"))
+        rows = self.connection.execute(
+            f"SELECT * FROM reports WHERE {' AND '.join(conditions)} ORDER BY id LIMIT ?",
+            (*values, -1 if limit is None else limit)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def get(self, report_id):
+        row = self.connection.execute("SELECT * FROM reports WHERE id = ?", (report_id,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def read(self, report_id):
+        """Содержимое отчета по id: из папки или из помесячного архива"""
+        report = self.get(report_id)
+        if report is None:
+            raise KeyError(f"Отчет {report_id} не найден в индексе")
+        return read_report_file(report)
+
+    def compact(self, retention_days, now=None):
+        """Упаковывает отчеты старше retention_days в архивы archive_dir/YYYY-MM.zip; возвращает число упакованных.
+
+        Файл удаляется только после записи архива и обновления индекса, поэтому прерванная
+        упаковка оставляет отчет доступным. Работает со своим соединением: вызывается из фонового потока.
+        """
+        cutoff = (now or datetime.now()) - timedelta(days=retention_days)
+        connection = self._connect()
+        try:
+            rows = connection.execute(
+                "SELECT id, created_at, path FROM reports WHERE archive IS NULL AND created_at < ? ORDER BY created_at",
+                (cutoff.isoformat(sep=" ", timespec="seconds"),)
+            ).fetchall()
+
+            by_month = {}
+            for row in rows:
+                by_month.setdefault(row["created_at"][:7], []).append(row)
+
+            compacted = 0
+            for month, month_rows in by_month.items():
+                compacted += self._compact_month(connection, month, month_rows)
+            return compacted
+        finally:
+            connection.close()
+
+    def _compact_month(self, connection, month, rows):
+        os.makedirs(self.archive_dir, exist_ok=True)
+        archive_path = os.path.join(self.archive_dir, f"{month}.zip")
+
+        packed = []
+        with zipfile.ZipFile(archive_path, "a", compression=zipfile.ZIP_DEFLATED, compresslevel=9) as archive:
+            names = set(archive.namelist())
+            for row in rows:
+                member = os.path.basename(row["path"])
+                if member not in names:
+                    if not os.path.exists(row["path"]):
+                        logger.warning(f"Отчет {row['id']} пропал с диска: {row['path']}")
+                        metrics.incr("reports.missing")
+                        continue
+                    archive.write(row["path"], member)
+                    names.add(member)
+                packed.append(row)
+
+        connection.executemany(
+            "UPDATE reports SET archive = ? WHERE id = ?", [(archive_path, row["id"]) for row in packed]
+        )
+        connection.commit()
+
+        for row in packed:
+            if os.path.exists(row["path"]):
+                metrics.incr("reports.compacted_bytes", os.path.getsize(row["path"]))
+                os.remove(row["path"])
+        metrics.incr("reports.compacted", len(packed))
+        return len(packed)
+
+    def backfill(self, directory="dialogs"):
+        """Добавляет в индекс отчеты, сохраненные до его появления (пользователь и время — из имени файла)"""
+        known = {row[0] for row in self.connection.execute("SELECT path FROM reports")}
+        added = 0
+        for filename in sorted(os.listdir(directory)):
+            match = REPORT_FILENAME_PATTERN.match(filename)
+            path = os.path.join(directory, filename)
+            if match is None or path in known:
+                continue
+            self.add(match.group(1), path, created_at=datetime.strptime(match.group(2), "%Y%m%d_%H%M%S"))
+            added += 1
+        return added
+
+    def close(self):
+        self.connection.close()
+
+
+def read_report_file(report):
+    """Читает отчет по записи индекса; не обращается к SQLite, поэтому годится для фонового потока"""
+    if report["archive"] is None:
+        with open(report["path"], "rb") as file:
+            return file.read()
+    with zipfile.ZipFile(report["archive"]) as archive:
+        return archive.read(os.path.basename(report["path"]))
+
+
+def format_report_row(report):
+    """Строка списка отчетов для CLI и /reports"""
+    location = f"архив {os.path.basename(report['archive'])}" if report["archive"] else "папка"
+    details = ", ".join(value for value in (report["interview_type"], report["interview_mode"]) if value)
+    return (
+        f"#{report['id']} {report['created_at']} пользователь {report['user_id']}"
+        f"{' (' + report['name'] + ')' if report['name'] else ''}"
+        f"{', ' + details if details else ''}"
+        f", рекомендация: {report['recommendation'] or '—'}, {location}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Индекс и архив отчетов по собеседованиям")
+    parser.add_argument("--index", default=os.getenv("REPORT_INDEX_PATH", "dialogs/reports.sqlite3"))
+    parser.add_argument("--archive-dir", default=os.getenv("REPORT_ARCHIVE_DIR", "dialogs/archive"))
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    find_parser = commands.add_parser("find", help="Поиск отчетов")
+    find_parser.add_argument("--user")
+    find_parser.add_argument("--mode")
+    find_parser.add_argument("--type")
+    find_parser.add_argument("--recommendation")
+    find_parser.add_argument("--vacancy")
+    find_parser.add_argument("--since", type=datetime.fromisoformat)
+    find_parser.add_argument("--until", type=datetime.fromisoformat)
+    find_parser.add_argument("--limit", type=int, default=50)
+
+    get_parser = commands.add_parser("get", help="Выгрузка отчета по id")
+    get_parser.add_argument("id", type=int)
+    get_parser.add_argument("-o", "--output")
+
+    compact_parser = commands.add_parser("compact", help="Упаковка старых отчетов в помесячные архивы")
+    compact_parser.add_argument("--days", type=int, default=int(os.getenv("REPORT_RETENTION_DAYS", "30")))
+
+    backfill_parser = commands.add_parser("backfill", help="Индексация ранее сохраненных отчетов")
+    backfill_parser.add_argument("directory", nargs="?", default="dialogs")
+
+    args = parser.parse_args()
+    archive = ReportArchive(args.index, args.archive_dir)
+
+    if args.command == "find":
+        reports = archive.find(args.user, args.mode, args.type, args.recommendation, args.since, args.until, args.limit,
+                               vacancy=args.vacancy)
+        for report in reports:
+            print(format_report_row(report))
+        print(f"Найдено: {len(reports)}")
+    elif args.command == "get":
+        report = archive.get(args.id)
+        if report is None:
+            parser.error(f"отчет {args.id} не найден")
+        output = args.output or os.path.basename(report["path"])
+        with open(output, "wb") as file:
+            file.write(archive.read(args.id))
+        print(f"✅ Отчет сохранен: {output}")
+    elif args.command == "compact":
+        print(f"✅ Упаковано отчетов: {archive.compact(args.days)}")
+    elif args.command == "backfill":
+        print(f"✅ Добавлено в индекс: {archive.backfill(args.directory)}")
+    archive.close()
+
+
+if __name__ == "__main__":
+    main()
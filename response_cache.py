@@ -0,0 +1,116 @@
+import json
+import os
+import sqlite3
+import time
+
+from llm_cassette import request_key
+from metrics import metrics
+from model_router import estimate_cost
+
+
+class ResponseCache:
+    """Кэш ответов LLM в SQLite с TTL и вытеснением давно не использованных записей (LRU).
+
+    get и put обращаются к диску и выполняются вне цикла событий (asyncio.to_thread), каждый вызов — со своим
+    соединением, как в индексе отчетов.
+    """
+
+    def __init__(self, path="cache/llm_cache.sqlite3", ttl_seconds=86400, max_entries=5000):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = self._connect()
+        try:
+            with connection:
+                connection.execute(
+                    """CREATE TABLE IF NOT EXISTS responses (
+                        key TEXT PRIMARY KEY,
+                        call_type TEXT,
+                        response TEXT NOT NULL,
+                        created_at REAL NOT NULL,
+                        last_access REAL NOT NULL
+                    )"""
+                )
+                connection.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+        finally:
+            connection.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.path)
+
+    def get(self, params, call_type=None):
+        """Возвращает ответ из кэша или None"""
+        from openai.types.chat import ChatCompletion
+
+        key = request_key(params)
+        now = time.time()
+        connection = self._connect()
+        try:
+            with connection:
+                row = connection.execute(
+                    "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and now - row[1] > self.ttl_seconds:
+                    connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    row = None
+                elif row is not None:
+                    connection.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+        finally:
+            connection.close()
+
+        if row is None:
+            metrics.incr(f"cache.{call_type}.miss")
+            return None
+
+        response = ChatCompletion.model_validate(json.loads(row[0]))
+        metrics.incr(f"cache.{call_type}.hit")
+        if response.usage is not None:
+            metrics.incr(
+                "cache.saved_cost_usd",
+                estimate_cost(response.model, response.usage.prompt_tokens, response.usage.completion_tokens)
+            )
+            metrics.incr("cache.saved_tokens", response.usage.total_tokens)
+        return response
+
+    def put(self, params, response, call_type=None):
+        """Сохраняет ответ и вытесняет лишние записи"""
+        now = time.time()
+        connection = self._connect()
+        try:
+            with connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO responses (key, call_type, response, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                    (request_key(params), call_type, json.dumps(response.model_dump(), ensure_ascii=False), now, now)
+                )
+                connection.execute(
+                    """DELETE FROM responses WHERE key IN (
+                        SELECT key FROM responses ORDER BY last_access DESC LIMIT -1 OFFSET ?
+                    )""",
+                    (self.max_entries,)
+                )
+        finally:
+            connection.close()
+
+
+def format_cache_report():
+    """Форматирует отчет о попаданиях в кэш и сэкономленных токенах"""
+    call_types = sorted(set(
+        name.split(".")[1] for name in metrics.names_with_prefix("cache.")
+        if name.endswith(".hit") or name.endswith(".miss")
+    ))
+    if not call_types:
+        return "Кэш ответов не использовался."
+
+    lines = []
+    for call_type in call_types:
+        hits = metrics.get(f"cache.{call_type}.hit")
+        misses = metrics.get(f"cache.{call_type}.miss")
+        lines.append(f"{call_type}: попаданий {hits:.0f} из {hits + misses:.0f} ({hits / (hits + misses):.0%})")
+    lines.append(
+        f"Сэкономлено: {metrics.get('cache.saved_tokens'):.0f} токенов, ${metrics.get('cache.saved_cost_usd'):.4f}"
+    )
+    return "\n".join(lines)
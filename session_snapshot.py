@@ -0,0 +1,53 @@
+import asyncio
+import json
+import os
+
+from metrics import metrics
+
+
+class InFlightTracker:
+    """Учет обрабатываемых обновлений Telegram (outer middleware aiogram) для корректной остановки"""
+
+    def __init__(self):
+        self.tasks = set()
+
+    async def __call__(self, handler, event, data):
+        task = asyncio.current_task()
+        self.tasks.add(task)
+        try:
+            return await handler(event, data)
+        finally:
+            self.tasks.discard(task)
+
+    async def drain(self, timeout):
+        """Дожидается завершения начатых обработчиков; возвращает число незавершенных"""
+        pending = {task for task in self.tasks if task is not asyncio.current_task()}
+        if not pending:
+            return 0
+        _, pending = await asyncio.wait(pending, timeout=max(timeout, 0))
+        return len(pending)
+
+
+def save_snapshot(path, states):
+    """Атомарно сохраняет состояния пользователей (список словарей) в JSON"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as file:
+        json.dump(states, file, ensure_ascii=False)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, path)
+    metrics.incr("snapshot.saved", len(states))
+
+
+def load_snapshot(path):
+    """Загружает сохраненные состояния; снимок удаляется, чтобы не восстановить его повторно"""
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as file:
+        states = json.load(file)
+    os.remove(path)
+    metrics.incr("snapshot.restored", len(states))
+    return states
@@ -0,0 +1,96 @@
+import re
+
+# Символы, меняющие состояние парсера
+SPECIAL_CHARS = re.compile(r'[{}\n]')
+
+
+class TechnicalBlockParser:
+    """Потоковый парсер ответа модели.
+
+    Принимает ответ частями (feed) и отдает текст для кандидата без технических блоков {…}
+    и без пустых строк; содержимое блоков сохраняется в self.blocks (трасса агентов).
+    Блоки могут быть разорваны между частями. Работает за линейное время.
+    """
+
+    def __init__(self):
+        self.blocks = []
+        self._depth = 0
+        self._block_parts = []
+        self._line_parts = []
+        self._has_output = False
+
+    def feed(self, chunk):
+        """Обрабатывает очередную часть ответа и возвращает завершенные видимые строки"""
+        emitted = []
+        position = 0
+
+        for match in SPECIAL_CHARS.finditer(chunk):
+            self._consume_text(chunk[position:match.start()])
+            char = match.group()
+
+            if char == '{':
+                if self._depth:
+                    self._block_parts.append(char)
+                self._depth += 1
+            elif char == '}':
+                if not self._depth:
+                    # Непарная закрывающая скобка остается в тексте
+                    self._line_parts.append(char)
+                else:
+                    self._depth -= 1
+                    if self._depth:
+                        self._block_parts.append(char)
+                    else:
+                        self.blocks.append(''.join(self._block_parts).strip())
+                        self._block_parts = []
+            elif self._depth:
+                self._block_parts.append(char)
+            else:
+                emitted.append(self._end_line())
+
+            position = match.end()
+
+        self._consume_text(chunk[position:])
+        return ''.join(emitted)
+
+    def finish(self):
+        """Завершает разбор и возвращает остаток видимого текста"""
+        emitted = []
+        if self._depth:
+            # Незакрытый блок не является техническим — возвращаем его в текст как есть
+            unclosed = '{' + ''.join(self._block_parts)
+            self._depth = 0
+            self._block_parts = []
+            for line in unclosed.split('\n')[:-1]:
+                self._line_parts.append(line)
+                emitted.append(self._end_line())
+            self._line_parts.append(unclosed.rpartition('\n')[2])
+
+        emitted.append(self._end_line())
+        return ''.join(emitted)
+
+    def _consume_text(self, text):
+        if not text:
+            return
+        if self._depth:
+            self._block_parts.append(text)
+        else:
+            self._line_parts.append(text)
+
+    def _end_line(self):
+        """Закрывает текущую видимую строку, пропуская пустые"""
+        line = ''.join(self._line_parts).strip()
+        self._line_parts = []
+        if not line:
+            return ''
+        if self._has_output:
+            return '\n' + line
+        self._has_output = True
+        return line
+
+
+def parse_response(response):
+    """Разбирает полный ответ: возвращает текст для кандидата и список технических блоков"""
+    parser = TechnicalBlockParser()
+    visible_text = parser.feed(response or '') + parser.finish()
+    return visible_text, parser.blocks
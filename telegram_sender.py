@@ -0,0 +1,346 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+
+from aiogram.exceptions import TelegramRetryAfter
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Максимальная длина текстового сообщения Telegram
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+
+def split_message(text, limit=TELEGRAM_MESSAGE_LIMIT):
+    """Делит длинный текст на части не длиннее limit: по абзацам, строкам или словам"""
+    chunks = []
+    while len(text) > limit:
+        cut = text.rfind("\n\n", 0, limit)
+        if cut <= 0:
+            cut = text.rfind("\n", 0, limit)
+        if cut <= 0:
+            cut = text.rfind(" ", 0, limit)
+        if cut <= 0:
+            cut = limit
+        chunks.append(text[:cut].rstrip())
+        text = text[cut:].lstrip()
+    chunks.append(text)
+    return chunks
+
+
+class TokenBucket:
+    """Ограничитель частоты: rate операций в секунду с запасом burst"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now):
+        """Сколько секунд ждать до следующей операции"""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now):
+        self._refill(now)
+        self.tokens -= 1
+
+
+class OutboundOperation:
+    """Одна исходящая операция Telegram в очереди чата"""
+
+    def __init__(self, chat_id, kind, call, key=None):
+        self.chat_id = chat_id
+        self.kind = kind
+        self.call = call
+        self.key = key
+        self.future = asyncio.get_running_loop().create_future()
+        self.created = time.monotonic()
+        self.started = False
+        self.attempts = 0
+
+
+class Placeholder:
+    """Временное сообщение (например, "Бот думает..."), которое потом удаляется.
+
+    sender — очередь, в которой сообщение создано: изменения и удаление идут через нее же.
+    """
+
+    def __init__(self, operation, sender):
+        self.operation = operation
+        self.sender = sender
+        self.deleted = False
+
+
+class TelegramSender:
+    """Очередь исходящих сообщений: лимиты на чат и на бота, склейка лишних операций, повтор при RetryAfter.
+
+    Обработчики ставят операции в очередь и не ждут отправки. Операции одного чата выполняются
+    строго по порядку, разные чаты обслуживаются по кругу.
+    """
+
+    def __init__(self, bot, chat_rate=1.0, chat_burst=3, global_rate=25, max_retries=3):
+        self.bot = bot
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.max_retries = max_retries
+        self.queues = OrderedDict()
+        self.chat_buckets = {}
+        self.paused_until = {}
+        self._busy = set()
+        self._wakeup = None
+        self._worker = None
+
+    # --- Постановка операций в очередь ---
+
+    def _enqueue(self, chat_id, kind, call, key=None):
+        operation = OutboundOperation(chat_id, kind, call, key)
+        self.queues.setdefault(chat_id, deque()).append(operation)
+        metrics.incr("telegram.queued")
+        self._ensure_worker()
+        self._wakeup.set()
+        return operation
+
+    def send(self, chat_id, text, reply_markup=None):
+        """Ставит в очередь текстовое сообщение; длинный текст делится на части"""
+        chunks = split_message(text)
+        if len(chunks) > 1:
+            metrics.incr("telegram.split")
+
+        operation = None
+        for index, chunk in enumerate(chunks):
+            markup = reply_markup if index == len(chunks) - 1 else None
+            operation = self._enqueue(
+                chat_id, "send",
+                lambda chunk=chunk, markup=markup: self.bot.send_message(chat_id, chunk, reply_markup=markup)
+            )
+        return operation.future
+
+    def send_document(self, chat_id, document, caption=None):
+        """Ставит в очередь отправку документа"""
+        operation = self._enqueue(
+            chat_id, "document",
+            lambda: self.bot.send_document(chat_id, document, caption=caption)
+        )
+        return operation.future
+
+    def edit_text(self, chat_id, message_id, text, reply_markup=None):
+        """Ставит в очередь изменение сообщения; неотправленное изменение того же сообщения заменяется новым"""
+        def call():
+            return self.bot.edit_message_text(
+                text=text, chat_id=chat_id, message_id=message_id, reply_markup=reply_markup
+            )
+
+        return self._enqueue_coalesced(chat_id, "edit", call, ("edit", message_id)).future
+
+    def _enqueue_coalesced(self, chat_id, kind, call, key):
+        # Неотправленная операция с тем же ключом заменяется новой
+        for operation in self.queues.get(chat_id, ()):
+            if operation.key == key and not operation.started:
+                operation.call = call
+                metrics.incr("telegram.coalesced")
+                return operation
+        return self._enqueue(chat_id, kind, call, key)
+
+    def placeholder(self, chat_id, text):
+        """Ставит в очередь временное сообщение и возвращает его описатель"""
+        return Placeholder(self._enqueue(
+            chat_id, "send",
+            lambda: self.bot.send_message(chat_id, text)
+        ), self)
+
+    def edit_placeholder(self, placeholder, text):
+        """Меняет текст временного сообщения (например, позицию в очереди)"""
+        if placeholder.deleted:
+            return
+        operation = placeholder.operation
+        chat_id = operation.chat_id
+
+        # Еще не отправлено — просто отправится уже с новым текстом
+        if not operation.started:
+            operation.call = lambda: self.bot.send_message(chat_id, text)
+            metrics.incr("telegram.coalesced")
+            return
+
+        async def call():
+            sent = await operation.future
+            if sent is None:
+                return None
+            return await self.bot.edit_message_text(text=text, chat_id=chat_id, message_id=sent.message_id)
+
+        self._enqueue_coalesced(chat_id, "edit", call, ("placeholder", id(placeholder)))
+
+    def delete(self, placeholder):
+        """Удаляет временное сообщение; если оно еще не отправлено, обе операции отменяются"""
+        if placeholder.deleted:
+            return
+        placeholder.deleted = True
+        operation = placeholder.operation
+
+        queue = self.queues.get(operation.chat_id)
+        # Неотправленные изменения удаляемого сообщения не нужны
+        for edit in [op for op in queue or () if op.key == ("placeholder", id(placeholder)) and not op.started]:
+            queue.remove(edit)
+            edit.future.set_result(None)
+            metrics.incr("telegram.coalesced")
+
+        if not operation.started and queue is not None and operation in queue:
+            queue.remove(operation)
+            operation.future.set_result(None)
+            metrics.incr("telegram.coalesced", 2)
+            return
+
+        async def call():
+            sent = await operation.future
+            if sent is None:
+                return None
+            return await self.bot.delete_message(operation.chat_id, sent.message_id)
+
+        self._enqueue(operation.chat_id, "delete", call)
+
+    # --- Обработка очереди ---
+
+    def _ensure_worker(self):
+        if self._worker is None or self._worker.done():
+            self._wakeup = asyncio.Event()
+            self._worker = asyncio.ensure_future(self._run())
+
+    async def _run(self):
+        while True:
+            now = time.monotonic()
+            next_wake = None
+
+            for chat_id in list(self.queues):
+                queue = self.queues[chat_id]
+                if not queue:
+                    if chat_id not in self._busy:
+                        del self.queues[chat_id]
+                        self._forget_chat(chat_id, now)
+                    continue
+                if chat_id in self._busy:
+                    continue
+
+                bucket = self.chat_buckets.setdefault(chat_id, TokenBucket(self.chat_rate, self.chat_burst))
+                wait = max(
+                    self.paused_until.get(chat_id, 0) - now,
+                    bucket.delay(now),
+                    self.global_bucket.delay(now)
+                )
+                if wait > 0:
+                    next_wake = wait if next_wake is None else min(next_wake, wait)
+                    continue
+
+                bucket.take(now)
+                self.global_bucket.take(now)
+                operation = queue.popleft()
+                operation.started = True
+                self._busy.add(chat_id)
+                # Чат уходит в конец круга, чтобы активные чаты не вытесняли остальные
+                self.queues.move_to_end(chat_id)
+                asyncio.ensure_future(self._execute(operation))
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), next_wake)
+            except asyncio.TimeoutError:
+                pass
+
+    def _forget_chat(self, chat_id, now):
+        # Состояние лимитов хранится только для чатов, которые еще не восстановили запас
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is not None and bucket.delay(now) == 0 and bucket.tokens >= bucket.burst:
+            del self.chat_buckets[chat_id]
+        if self.paused_until.get(chat_id, 0) <= now:
+            self.paused_until.pop(chat_id, None)
+
+    async def _execute(self, operation):
+        metrics.observe("telegram.queue_delay", time.monotonic() - operation.created)
+        try:
+            result = await operation.call()
+        except TelegramRetryAfter as e:
+            operation.attempts += 1
+            metrics.incr("telegram.retry_after")
+            if operation.attempts <= self.max_retries:
+                # Чат ставится на паузу, операция возвращается в начало его очереди
+                self.paused_until[operation.chat_id] = time.monotonic() + e.retry_after
+                operation.started = False
+                self.queues.setdefault(operation.chat_id, deque()).appendleft(operation)
+            else:
+                self._fail(operation, e)
+        except Exception as e:
+            self._fail(operation, e)
+        else:
+            metrics.incr(f"telegram.{operation.kind}")
+            operation.future.set_result(result)
+        finally:
+            self._busy.discard(operation.chat_id)
+            self._wakeup.set()
+
+    def _fail(self, operation, error):
+        # Ошибка отправки не доходит до обработчиков: они не ждут результата
+        metrics.incr("telegram.failed")
+        logger.error(f"Ошибка отправки в Telegram ({operation.kind}, чат {operation.chat_id}): {error}")
+        operation.future.set_result(None)
+
+    def pending(self):
+        """Число операций в очереди и в работе"""
+        return sum(len(queue) for queue in self.queues.values()) + len(self._busy)
+
+    async def drain(self, timeout=None):
+        """Дожидается отправки всей очереди (не дольше timeout секунд)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.pending():
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(0.05)
+        return True
+
+
+class SenderPool:
+    """Очереди исходящих сообщений нескольких ботов: у каждого бота свои лимиты Telegram.
+
+    Вызовы pool.send(...), pool.placeholder(...) и т. д. идут в очередь бота, выбранного current_key().
+    Изменение и удаление временного сообщения идут в очередь, где оно создано: их вызывают и из чужих задач
+    (позицию в очереди к LLM обновляет задача, которая заняла или освободила место).
+    """
+
+    def __init__(self, senders, current_key):
+        self.senders = senders
+        self.current_key = current_key
+
+    def __getattr__(self, name):
+        return getattr(self.senders[self.current_key()], name)
+
+    def edit_placeholder(self, placeholder, text):
+        placeholder.sender.edit_placeholder(placeholder, text)
+
+    def delete(self, placeholder):
+        placeholder.sender.delete(placeholder)
+
+    def pending(self):
+        return sum(sender.pending() for sender in self.senders.values())
+
+    async def drain(self, timeout=None):
+        results = await asyncio.gather(*(sender.drain(timeout) for sender in self.senders.values()))
+        return all(results)
+
+
+def format_sender_report():
+    """Форматирует отчет об исходящей очереди Telegram"""
+    delay = metrics.summary("telegram.queue_delay")
+    if not delay["count"]:
+        return "Исходящих сообщений еще не было."
+
+    return (
+        f"Операций: {delay['count']}, в очереди p50={delay['p50']:.2f}с p95={delay['p95']:.2f}с\n"
+        f"Склеено: {metrics.get('telegram.coalesced'):.0f}, разбито длинных: {metrics.get('telegram.split'):.0f}\n"
+        f"RetryAfter: {metrics.get('telegram.retry_after'):.0f}, ошибок: {metrics.get('telegram.failed'):.0f}"
+    )
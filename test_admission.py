@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Тест контроля допуска запросов к LLM
+"""
+
+import asyncio
+
+
+def test_priorities_and_positions():
+    """Ходы идущих собеседований обслуживаются раньше новых, ожидающие видят свою позицию"""
+    from admission import AdmissionController
+
+    print("🧪 Тестирование очереди с приоритетами...")
+
+    order = []
+    positions = {}
+
+    async def request(controller, name, priority, hold):
+        def on_queued(position, eta):
+            positions.setdefault(name, []).append((position, eta))
+
+        async with controller.slot(priority, on_queued):
+            order.append(name)
+            await hold.wait()
+
+    async def scenario():
+        controller = AdmissionController(max_concurrency=1, max_queue=10, initial_service_seconds=5)
+        hold = asyncio.Event()
+        tasks = [asyncio.ensure_future(request(controller, "первый", "turn", hold))]
+        await asyncio.sleep(0)
+        for name, priority in [("новый", "opening"), ("ход", "turn")]:
+            tasks.append(asyncio.ensure_future(request(controller, name, priority, hold)))
+            await asyncio.sleep(0)
+        hold.set()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(scenario())
+
+    assert order == ["первый", "ход", "новый"]
+    assert positions["новый"][0] == (1, 5) and positions["новый"][1][0] == 2
+    print("✅ Ход собеседования обогнал новое собеседование, позиция обновлялась")
+
+
+def test_fast_rejection():
+    """При исчерпании лимита новые собеседования отклоняются сразу"""
+    from admission import AdmissionController, AdmissionRejected
+
+    print("\n🧪 Тестирование быстрого отказа...")
+
+    async def scenario():
+        controller = AdmissionController(max_concurrency=1, max_queue=10, priority_limits={"opening": 1})
+        hold = asyncio.Event()
+
+        async def request(priority):
+            async with controller.slot(priority):
+                await hold.wait()
+
+        tasks = [asyncio.ensure_future(request("turn")), asyncio.ensure_future(request("opening"))]
+        await asyncio.sleep(0)
+        assert controller.would_reject("opening")
+        assert not controller.would_reject("turn")
+
+        try:
+            await request("opening")
+            raise AssertionError("Запрос должен быть отклонен")
+        except AdmissionRejected:
+            pass
+
+        hold.set()
+        await asyncio.gather(*tasks)
+        assert controller.active == 0
+
+    asyncio.run(scenario())
+    print("✅ Лишнее новое собеседование отклонено без ожидания")
+
+
+def test_unadmitted_calls():
+    """Запросы без места в допуске учитываются отдельно и попадают в общее число запросов к LLM"""
+    from admission import AdmissionController, format_admission_report, unadmitted, unadmitted_active
+
+    print("\n🧪 Тестирование учета запросов вне допуска...")
+
+    async def scenario():
+        controller = AdmissionController(max_concurrency=1, max_queue=10)
+        async with controller.slot("turn"):
+            with unadmitted("teacher_split"):
+                assert unadmitted_active() == 1
+                return format_admission_report(controller)
+
+    before = unadmitted_active()
+    report = asyncio.run(scenario())
+    assert "вне допуска 1 (всего к LLM 2)" in report
+    assert unadmitted_active() == before
+    print("✅ Второй запрос хода преподавателя учтен вне допуска")
+
+
+if __name__ == "__main__":
+    print("🚀 Запуск тестирования контроля допуска...\n")
+    test_priorities_and_positions()
+    test_fast_rejection()
+    test_unadmitted_calls()
+    print("\n🎯 Все тесты контроля допуска пройдены!")
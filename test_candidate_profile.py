@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Тест профиля кандидата, который дополняется между ходами
+"""
+
+import asyncio
+
+
+class FakeProfileClient:
+    """Имитирует OpenAIClient.extract_profile_update"""
+
+    def __init__(self):
+        self.calls = []
+
+    async def extract_profile_update(self, last_question, answer):
+        from candidate_profile import parse_profile_update
+
+        self.calls.append(answer)
+        await asyncio.sleep(0.01)
+        return parse_profile_update(
+            '```json\n{"education": [], "tech_stack": ["Python", "%s"], "soft_skills": []}\n```' % answer
+        )
+
+
+def test_parse_profile_update():
+    """JSON с фактами извлекается даже из ответа с обрамлением"""
+    from candidate_profile import parse_profile_update
+
+    print("🧪 Тестирование разбора обновления профиля...")
+
+    update = parse_profile_update('Вот факты: {"education": ["МГУ, ВМК"], "projects": []}')
+    assert update["education"] == ["МГУ, ВМК"]
+    assert update["tech_stack"] == []
+    assert parse_profile_update("не JSON") == {}
+    print("✅ Обновление профиля разобрано")
+
+
+def test_background_updates_are_serialized():
+    """Фоновые обновления применяются по очереди и без повторов"""
+    from candidate_profile import CandidateProfile
+
+    print("\n🧪 Тестирование фонового обновления профиля...")
+
+    profile = CandidateProfile()
+    client = FakeProfileClient()
+
+    async def scenario():
+        profile.schedule_update(client, "Какой стек?", "PyTorch")
+        profile.schedule_update(client, "А еще?", "pandas")
+        await profile.wait(timeout=1)
+
+    asyncio.run(scenario())
+
+    assert client.calls == ["PyTorch", "pandas"]
+    assert profile.sections["tech_stack"] == ["Python", "PyTorch", "pandas"]
+    assert profile.updates == 2
+    assert "- PyTorch" in profile.to_text()
+    print("✅ Профиль дополнен без повторов")
+
+
+if __name__ == "__main__":
+    print("🚀 Запуск тестирования профиля кандидата...\n")
+    test_parse_profile_update()
+    test_background_updates_are_serialized()
+    print("\n🎯 Все тесты профиля кандидата пройдены!")
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Тест ранжирования кандидатов по оценкам из отчетов
+"""
+
+import os
+import tempfile
+from datetime import datetime
+
+
+def test_parse_scores():
+    """Строка оценок из аналитики разбирается по разделам"""
+    from report_archive import parse_scores
+
+    print("🧪 Тестирование разбора оценок...")
+
+    report = "7. РЕКОМЕНДАЦИИ\n...\nОЦЕНКИ: общая=7; образование=6,5; опыт=8; проекты=-; технические=11; soft=6"
+    assert parse_scores(report) == {
+        "overall": 7.0, "education": 6.5, "experience": 8.0, "technical": 10.0, "soft_skills": 6.0
+    }
+    assert parse_scores("Отчет без оценок") == {}
+    print("✅ Оценки разобраны, пропуски и выход за шкалу учтены")
+
+
+def test_shortlist_from_archive():
+    """Короткий список учитывает фильтры, веса, пропуски и одно лучшее собеседование на кандидата"""
+    from candidate_ranking import load_interviews, rank_candidates
+    from report_archive import ReportArchive
+
+    print("\n🧪 Тестирование короткого списка...")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "reports.sqlite3")
+        archive = ReportArchive(path, os.path.join(directory, "archive"))
+
+        def add(user_id, created_at, interview_type, recommendation, **scores):
+            archive.add(user_id, f"{user_id}.docx", interview_type=interview_type, recommendation=recommendation,
+                        name=f"Кандидат {user_id}", created_at=created_at, language="russian", scores=scores)
+
+        add(1, datetime(2024, 3, 1), "hard", "принять", overall=8, technical=9)
+        add(1, datetime(2024, 4, 1), "hard", "рассмотреть", overall=5, technical=5)
+        add(2, datetime(2024, 3, 2), "hard", "рассмотреть", overall=9, technical=6)
+        add(3, datetime(2024, 3, 3), "hard", "отклонить", overall=9, technical=6)
+        add(4, datetime(2024, 3, 4), "soft", "принять", overall=10, soft_skills=10)
+        add(5, datetime(2024, 3, 5), "hard", None)
+        archive.close()
+
+        table = load_interviews(path)
+        assert len(table) == 6
+
+        # Равные веса: 8.5, 7.5 (и 7.5 у отклоненного ниже), у пользователя 1 берется лучшее собеседование
+        shortlist = rank_candidates(table, interview_type="hard")
+        assert [candidate["user_id"] for candidate in shortlist] == ["1", "2", "3"]
+        assert shortlist[0]["score"] == 8.5 and shortlist[0]["scores"] == {"overall": 8.0, "technical": 9.0}
+        assert shortlist[0]["percentile"] == 100.0
+
+        # Общая оценка важнее технической
+        weighted = rank_candidates(table, weights={"overall": 5}, interview_type="hard")
+        assert [candidate["user_id"] for candidate in weighted] == ["2", "3", "1"]
+
+        assert [c["user_id"] for c in rank_candidates(table, min_recommendation="рассмотреть", top=2)] == ["4", "1"]
+        assert [c["user_id"] for c in rank_candidates(table, since="2024-03-04")] == ["4", "1"]
+        assert rank_candidates(table, language="english") == []
+        assert len(rank_candidates(table, interview_type="hard", best_per_user=False)) == 4
+    print("✅ Короткий список построен")
+
+
+def test_vectorized_speed():
+    """100 тысяч собеседований ранжируются заметно быстрее секунды"""
+    import time
+
+    from candidate_ranking import rank_candidates, synthetic_table
+
+    print("\n🧪 Тестирование скорости ранжирования...")
+
+    table = synthetic_table(100000)
+    started = time.perf_counter()
+    shortlist = rank_candidates(table, weights={"technical": 2}, interview_type="hard", since="2024-03-01")
+    elapsed = time.perf_counter() - started
+    assert len(shortlist) == 20
+    assert elapsed < 0.5, elapsed
+    print(f"✅ 100 тысяч собеседований за {elapsed * 1000:.0f} мс")
+
+
+if __name__ == "__main__":
+    print("🚀 Запуск тестирования ранжирования кандидатов...\n")
+    test_parse_scores()
+    test_shortlist_from_archive()
+    test_vectorized_speed()
+    print("\n🎯 Все тесты ранжирования пройдены!")
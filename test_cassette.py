@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Тест записи и воспроизведения кассет LLM без реального API
+"""
+
+import os
+import asyncio
+import tempfile
+import time
+
+# Устанавливаем тестовые переменные окружения
+os.environ['TELEGRAM_BOT_TOKEN'] = 'test_token'
+os.environ['OPENAI_API_KEY'] = 'test_key'
+
+from fake_openai import install_fake_api, make_completion
+
+
+def test_record_and_replay():
+    """Ответ, записанный в режиме record, воспроизводится в режиме replay"""
+    from llm_cassette import CassetteMissError
+    from openai_client import OpenAIClient
+
+    print("🧪 Тестирование записи и воспроизведения кассет...")
+
+    with tempfile.TemporaryDirectory() as cassette_dir:
+        recorder = OpenAIClient(cassette_mode="record", cassette_dir=cassette_dir)
+        completions = install_fake_api(recorder, "{Агент-ветки: Ветка Собеседование (основная)} Здравствуйте!")
+
+        recorded = asyncio.run(recorder.get_response("Промт", "Привет", [], "hope", "russian", "Анна", "soft"))
+        assert completions.calls == 1
+        print("✅ Ответ записан в кассету")
+
+        player = OpenAIClient(cassette_mode="replay", cassette_dir=cassette_dir)
+        assert player.client is None
+        replayed = asyncio.run(player.get_response("Промт", "Привет", [], "hope", "russian", "Анна", "soft"))
+        assert replayed == recorded
+        print("✅ Ответ воспроизведен из кассеты без обращения к API")
+
+        # Незаписанный запрос роняет тест, а не превращается в текст извинения
+        try:
+            asyncio.run(player.get_response("Промт", "Другой ответ", [], "hope", "russian", "Анна", "soft"))
+            assert False, "Ожидалась ошибка CassetteMissError"
+        except CassetteMissError:
+            print("✅ Отсутствующая кассета в get_response приводит к CassetteMissError")
+
+
+def test_replay_latency():
+    """В режиме replay с задержкой выдерживается записанная латентность"""
+    from llm_cassette import CassetteStore, CassetteMissError
+
+    print("\n🧪 Тестирование воспроизведения задержки...")
+
+    with tempfile.TemporaryDirectory() as cassette_dir:
+        params = {"model": "gpt-4.1-mini", "messages": [{"role": "user", "content": "Привет"}]}
+        store = CassetteStore(cassette_dir, replay_latency=True)
+        store.record(params, make_completion("Ответ"), 0.2)
+
+        start_time = time.perf_counter()
+        response = asyncio.run(store.replay(params))
+        elapsed = time.perf_counter() - start_time
+
+        assert response.choices[0].message.content == "Ответ"
+        assert elapsed >= 0.2
+        print(f"✅ Задержка воспроизведена: {elapsed:.2f} с")
+
+        try:
+            asyncio.run(store.replay({"model": "gpt-4.1-mini", "messages": []}))
+            assert False, "Ожидалась ошибка CassetteMissError"
+        except CassetteMissError:
+            print("✅ Отсутствующая кассета приводит к CassetteMissError")
+
+
+if __name__ == "__main__":
+    print("🚀 Запуск тестирования кассет...\n")
+    test_record_and_replay()
+    test_replay_latency()
+    print("\n🎯 Все тесты кассет пройдены!")
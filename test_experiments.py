@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Тест A/B-экспериментов над промтами: распределение сессий по вариантам и сравнение вариантов
+"""
+
+import os
+import json
+import tempfile
+from collections import Counter
+
+PROMPT_SOFT = "Промт Soft Skills нейро-рекрутера для собеседований.txt"
+
+
+def make_experiments(directory, items):
+    from experiments import Experiments
+
+    path = os.path.join(directory, "experiments.json")
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(items, file, ensure_ascii=False)
+    return Experiments(path)
+
+
+def test_assignment():
+    """Вариант зависит только от user_id и эксперимента, пользователи делятся между вариантами поровну"""
+    print("🧪 Тестирование распределения по вариантам...")
+
+    with tempfile.TemporaryDirectory() as directory:
+        experiments = make_experiments(directory, [
+            {"name": "soft-short", "interview_type": "soft", "variants": {"control": PROMPT_SOFT, "short": "prompt.txt"}},
+            {"name": "hard-ds", "interview_type": "hard", "vacancy": "ds", "variants": {"control": "prompt.txt"}},
+        ])
+
+        label, prompt_file = experiments.assign("soft", "default", 42)
+        assert experiments.assign("soft", "default", 42) == (label, prompt_file)
+        assert experiments.prompt_file(label) == prompt_file
+
+        counts = Counter(experiments.assign("soft", "default", user_id)[0] for user_id in range(2000))
+        assert set(counts) == {"soft-short/control", "soft-short/short"}
+        assert abs(counts["soft-short/control"] - 1000) < 100, counts
+
+        # Тип без эксперимента и эксперимент другой вакансии — промт вакансии
+        assert experiments.assign("experience", "default", 42) == (None, None)
+        assert experiments.assign("hard", "default", 42) == (None, None)
+        assert experiments.assign("hard", "ds", 42) == ("hard-ds/control", "prompt.txt")
+        assert experiments.prompt_file("удален/вариант") is None
+    print(f"✅ Распределение детерминированное и равномерное: {dict(counts)}")
+
+
+def test_report():
+    """Сравнение строится по индексу отчетов и журналу токенов: токены, задержка, завершаемость и оценки"""
+    from datetime import datetime
+    from experiments import format_experiment_report, load_variant_stats
+    from report_archive import ReportArchive
+    from usage_ledger import SessionInfo, UsageLedger
+
+    print("🧪 Тестирование сравнения вариантов...")
+
+    class Usage:
+        def __init__(self, prompt_tokens, completion_tokens):
+            self.prompt_tokens = prompt_tokens
+            self.completion_tokens = completion_tokens
+
+    with tempfile.TemporaryDirectory() as directory:
+        experiments = make_experiments(directory, [
+            {"name": "report-test", "interview_type": "soft", "variants": {"control": PROMPT_SOFT, "short": "prompt.txt"}},
+        ])
+        index_path = os.path.join(directory, "reports.sqlite3")
+        ledger_path = os.path.join(directory, "ledger.jsonl")
+        archive = ReportArchive(index_path, os.path.join(directory, "archive"))
+        ledger = UsageLedger(ledger_path)
+
+        for label, prompt_tokens, latency, score in (("report-test/control", 1000, 2.0, 6), ("report-test/short", 500, 1.0, 8)):
+            # Два собеседования варианта, завершено одно
+            for session_id in (f"{label}-1", f"{label}-2"):
+                session = SessionInfo(session_id, 42, "hope", "soft", variant=label)
+                for _ in range(2):
+                    ledger.record("turn", "gpt-4.1-mini", Usage(prompt_tokens, 100), session=session, latency=latency)
+                # Фоновые вызовы учитываются в токенах, но не в задержке ответа кандидату
+                ledger.record("profile", "gpt-4.1-mini", Usage(prompt_tokens // 2, 50), session=session, latency=30.0)
+            archive.add(42, f"{label}.docx", "hope", "soft", session_id=f"{label}-1", created_at=datetime(2024, 5, 1),
+                        scores={"overall": score, "soft_skills": score}, variant=label, turns=6)
+        # Собеседование без эксперимента в сравнение не попадает
+        archive.add(43, "plain.docx", "hope", "soft", session_id="plain", scores={"overall": 1}, turns=2)
+        ledger.flush()
+        archive.close()
+        with open(ledger_path, "a", encoding="utf-8") as file:
+            file.write('{"ts": "2024-05')
+
+        report = format_experiment_report(experiments, load_variant_stats(index_path, ledger_path))
+        assert "control: собеседований 2, завершено 50%, токенов вход/выход 2500/250" in report
+        assert "short: собеседований 2, завершено 50%, токенов вход/выход 1250/250 на собеседование (-45%)" in report
+        assert "ходов 6.0" in report
+        assert "p95=1.0с (-50%)" in report and "оценка 8.0 (+33%)" in report
+        assert "собеседований 0" not in report
+    print("✅ Варианты сравниваются по сохраненным отчетам и журналу токенов")
+    print(report)
+
+
+if __name__ == "__main__":
+    print("🚀 Запуск тестирования экспериментов...\n")
+    test_assignment()
+    test_report()
+    print("\n🎯 Все тесты экспериментов пройдены!")
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Тест защиты от флуда
+"""
+
+
+def test_turn_limit_and_mute():
+    """Серия сообщений ограничивается, устойчивый флуд приводит к заглушению"""
+    from flood_control import ALLOWED, LIMITED, LIMITED_NOTIFY, MUTED, MUTED_NOW, FloodControl
+
+    print("🧪 Тестирование лимита ходов...")
+
+    flood = FloodControl({"turn": (1 / 60, 2), "start": (1 / 3600, 1)}, violations_to_mute=4, mute_seconds=60)
+    verdicts = [flood.check(1, "turn", "ответ") for _ in range(7)]
+    # Нарушения остывают со временем, поэтому заглушение наступает на 4-м или 5-м нарушении
+    assert verdicts[:5] == [ALLOWED, ALLOWED, LIMITED_NOTIFY, LIMITED, LIMITED]
+    assert verdicts.count(MUTED_NOW) == 1
+    assert flood.check(1, "turn", "ответ") == MUTED
+    assert flood.is_muted(1)
+    print("✅ Предупреждение отправлено один раз, флудер заглушен")
+
+    assert flood.check(2, "turn", "ответ") == ALLOWED
+    assert flood.check(2, "start") == ALLOWED
+    assert flood.check(2, "start") == LIMITED_NOTIFY
+    print("✅ Лимиты считаются отдельно для пользователей и действий")
+
+
+def test_message_length_and_memory_bound():
+    """Длинные сообщения отклоняются, память ограничена числом пользователей"""
+    from flood_control import TOO_LONG, FloodControl
+
+    print("\n🧪 Тестирование длины сообщений и памяти...")
+
+    flood = FloodControl(max_message_chars=10, max_users=100)
+    assert flood.check(1, "turn", "x" * 11) == TOO_LONG
+    assert flood.check(1, "turn", "x" * 11) == TOO_LONG
+    print("✅ Длинное сообщение не пропущено")
+
+    for user_id in range(1000):
+        flood.check(user_id, "turn", "ответ")
+    assert len(flood.users) == 100
+    assert 999 in flood.users and 0 not in flood.users
+    print("✅ Храним состояние не более чем для 100 пользователей")
+
+
+if __name__ == "__main__":
+    print("🚀 Запуск тестирования защиты от флуда...\n")
+    test_turn_limit_and_mute()
+    test_message_length_and_memory_bound()
+    print("\n🎯 Все тесты защиты от флуда пройдены!")
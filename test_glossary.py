@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Тест глоссария: распознавание просьб о переводе и ответ без LLM
+"""
+
+
+def test_extract_term():
+    """Слово берется из разных формулировок просьбы, обычные ответы не считаются просьбой"""
+    from glossary import extract_term
+
+    print("🧪 Тестирование распознавания просьб о переводе...")
+
+    assert extract_term("Переведи, пожалуйста, overfitting") == "overfitting"
+    assert extract_term("Как переводится слово «feature engineering»?") == "feature engineering"
+    assert extract_term("Как будет по-английски обратная связь?") == "обратная связь"
+    assert extract_term("Stakeholder — это что означает?") == "Stakeholder"
+    assert extract_term("What does the word recall mean?") == "recall"
+    assert extract_term("how do you say градиентный бустинг in English") == "градиентный бустинг"
+    assert extract_term("Я работал с pandas три года") is None
+    assert extract_term("Перевод слова recall") == "recall"
+    assert extract_term("Перевод: overfitting") == "overfitting"
+    # Слова с тем же началом и "перевод" в другом смысле — не просьбы о переводе
+    assert extract_term("Перевод модели") is None
+    assert extract_term("Перевод модели в прод") is None
+    assert extract_term("Переводчиком работал") is None
+    assert extract_term("Перевестись в другой отдел") is None
+    assert extract_term("Что значит для вас работа в команде, которая постоянно меняет приоритеты?") is None
+    print("✅ Просьбы о переводе распознаются")
+
+
+def test_answer():
+    """Найденное слово переводится в обе стороны, ненайденное уходит в LLM"""
+    from glossary import Glossary
+    from metrics import metrics
+    from tech_parser import parse_response
+
+    print("🧪 Тестирование ответов глоссария...")
+
+    glossary = Glossary("glossary.tsv")
+    misses = metrics.get("glossary.misses")
+
+    reply = glossary.answer("что значит overfitting?", "russian", "Отлично! Какую специальность вы получили?")
+    visible_text, tags = parse_response(reply)
+    assert visible_text == "«overfitting» — переобучение. Продолжим: Какую специальность вы получили?"
+    assert "Финальный агент - агент-консультант" in tags
+
+    # Форма слова не важна: поиск по основам
+    reply = glossary.answer("translate переобучения", "english")
+    assert parse_response(reply)[0] == "\"переобучения\" means \"overfitting\"."
+
+    assert glossary.answer("что значит xyzzy?") is None
+    assert metrics.get("glossary.misses") == misses + 1
+    assert glossary.answer("Я учился в МГУ") is None
+    print(f"✅ Глоссарий отвечает без LLM ({len(glossary)} ключей)")
+
+
+def test_malformed_lines():
+    """Строки без двух столбцов пропускаются, остальной глоссарий загружается"""
+    import os
+    import tempfile
+    from glossary import Glossary
+
+    print("🧪 Тестирование испорченного глоссария...")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "glossary.tsv")
+        with open(path, "w", encoding="utf-8") as file:
+            file.write("# комментарий\noverfitting\tпереобучение\nrecall без табуляции\nprecision\tточность\tлишнее\n"
+                       "dropout\t\nbatch\tбатч|пакет\n")
+        glossary = Glossary(path)
+
+    assert glossary.lookup("overfitting") == "переобучение"
+    assert glossary.lookup("пакет") == "batch"
+    assert glossary.lookup("precision") is None and glossary.lookup("dropout") is None
+    print("✅ Испорченные строки пропущены")
+
+
+if __name__ == "__main__":
+    print("🚀 Запуск тестирования глоссария...\n")
+    test_extract_term()
+    test_answer()
+    test_malformed_lines()
+    print("\n🎯 Все тесты глоссария пройдены!")
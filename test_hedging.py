@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Тест хеджирования запросов к LLM
+"""
+
+import asyncio
+
+from hedging import HedgePolicy, run_hedged
+from metrics import metrics
+
+
+def make_request_factory(delays, calls):
+    """Создает фабрику запросов с заданной задержкой для каждой модели"""
+    def make_request(model=None):
+        async def request():
+            name = model or "primary"
+            calls.append(name)
+            try:
+                await asyncio.sleep(delays[name])
+            except asyncio.CancelledError:
+                calls.append(f"{name}:cancelled")
+                raise
+            return name
+        return request()
+    return make_request
+
+
+def test_fast_primary_is_not_hedged():
+    """Быстрый основной запрос не вызывает хеджирования"""
+    print("🧪 Тестирование быстрого основного запроса...")
+
+    calls = []
+    fired_before = metrics.get("hedge.fired")
+    policy = HedgePolicy(slo_seconds=0.2, fallback_model="fallback")
+    result = asyncio.run(run_hedged(make_request_factory({"primary": 0.01}, calls), policy))
+
+    assert result == "primary"
+    assert calls == ["primary"]
+    assert metrics.get("hedge.fired") == fired_before
+    print("✅ Хедж не отправлен")
+
+
+def test_slow_primary_is_hedged_and_cancelled():
+    """Медленный основной запрос хеджируется, проигравший запрос отменяется"""
+    print("\n🧪 Тестирование хеджирования медленного запроса...")
+
+    calls = []
+    won_before = metrics.get("hedge.won")
+    policy = HedgePolicy(slo_seconds=0.05, fallback_model="fallback")
+
+    async def scenario():
+        result = await run_hedged(make_request_factory({"primary": 1.0, "fallback": 0.01}, calls), policy)
+        # Даем отмене основного запроса отработать
+        await asyncio.sleep(0)
+        return result
+
+    result = asyncio.run(scenario())
+
+    assert result == "fallback"
+    assert "primary:cancelled" in calls
+    assert metrics.get("hedge.won") == won_before + 1
+    # Запасной запрос учтен вне допуска и после завершения не числится идущим
+    assert metrics.get("admission.unadmitted.hedge") >= 1
+    assert metrics.get("admission.unadmitted.hedge.active") == 0
+    print("✅ Победил хедж, основной запрос отменен")
+
+
+def test_caller_cancelled_before_slo():
+    """Отмена вызывающего до истечения SLO отменяет основной запрос"""
+    print("\n🧪 Тестирование отмены до SLO...")
+
+    calls = []
+    policy = HedgePolicy(slo_seconds=1.0, fallback_model="fallback")
+
+    async def scenario():
+        task = asyncio.ensure_future(run_hedged(make_request_factory({"primary": 5.0}, calls), policy))
+        await asyncio.sleep(0.02)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        await asyncio.sleep(0)
+
+    asyncio.run(scenario())
+
+    assert calls == ["primary", "primary:cancelled"]
+    print("✅ Основной запрос отменен вместе с вызывающим")
+
+
+if __name__ == "__main__":
+    print("🚀 Запуск тестирования хеджирования...\n")
+    test_fast_primary_is_not_hedged()
+    test_slow_primary_is_hedged_and_cancelled()
+    test_caller_cancelled_before_slo()
+    print("\n🎯 Все тесты хеджирования пройдены!")
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Тест маршрутизации моделей по ролям агентов
+"""
+
+import os
+import json
+import tempfile
+
+# Устанавливаем тестовые переменные окружения
+os.environ['TELEGRAM_BOT_TOKEN'] = 'test_token'
+os.environ['OPENAI_API_KEY'] = 'test_key'
+
+
+def test_detect_role():
+    """Роль определяется по тегу финального агента"""
+    from model_router import detect_role
+
+    print("🧪 Тестирование определения роли агента...")
+
+    response = """{Агент-ветки: Ветка Собеседование (основная)}
+{Агент-блока: Блок Образование}
+{Финальный агент - агент-подтверждения}
+Все ли верно в профайле?"""
+    assert detect_role(response) == "подтверждения"
+    assert detect_role("{Финальный агент - агент-генератор вопросов}") == "генератор вопросов"
+    assert detect_role("Текст без тегов") is None
+    print("✅ Роли агентов определяются корректно")
+
+
+def test_resolve_and_override():
+    """Маршруты выбираются по типу вызова и роли и переопределяются из файла"""
+    from model_router import ModelRoute, ModelRouter
+
+    print("\n🧪 Тестирование выбора маршрута...")
+
+    router = ModelRouter()
+    route_key, route = router.resolve("turn", "подтверждения")
+    assert route_key == "turn/подтверждения"
+    assert route.model == "gpt-4.1-nano"
+
+    route_key, route = router.resolve("turn", "генератор вопросов")
+    assert route_key == "turn/default"
+    assert route.max_tokens == 2000
+
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False, encoding="utf-8") as file:
+        json.dump({"analytics": {"default": {"model": "gpt-4.1", "max_tokens": 4000, "temperature": 0.2}}}, file)
+
+    try:
+        router = ModelRouter(routes_file=file.name)
+        route_key, route = router.resolve("analytics")
+        assert route.model == "gpt-4.1"
+        assert route.max_tokens == 4000
+        print("✅ Маршруты переопределяются из файла")
+    finally:
+        os.remove(file.name)
+
+    # Тип вызова без маршрута default получает общий маршрут по умолчанию
+    router = ModelRouter({"summary": {"подтверждения": ModelRoute("gpt-4.1-nano", 500, 0.0)}})
+    assert router.resolve("summary", "подтверждения")[1].model == "gpt-4.1-nano"
+    route_key, route = router.resolve("summary", "генератор вопросов")
+    assert route_key == "summary/default"
+    assert route is router.resolve("turn")[1]
+    print("✅ Тип вызова без default использует общий маршрут")
+
+
+if __name__ == "__main__":
+    print("🚀 Запуск тестирования маршрутизации моделей...\n")
+    test_detect_role()
+    test_resolve_and_override()
+    print("\n🎯 Все тесты маршрутизации пройдены!")
@@ -16,8 +16,8 @@ def test_imports():
         print("Тестирование импорта модулей...")
         
         # Тестируем импорт конфига
-        import config
-        print("✓ config.py импортируется успешно")
+        import config_direct
+        print("✓ config_direct.py импортируется успешно")
         
         # Тестируем импорт OpenAI клиента
         from openai_client import OpenAIClient
@@ -86,6 +86,43 @@ def test_document_generator():
         print(f"❌ Ошибка при тестировании генератора документов: {e}")
         return False
 
+def test_lazy_imports():
+    """Тяжелые зависимости не загружаются при импорте модулей бота"""
+    import subprocess
+
+    print("\nТестирование ленивых импортов...")
+
+    result = subprocess.run(
+        [sys.executable, "-c",
+         "import sys, openai_client, document_generator; "
+         "openai_client.OpenAIClient(); document_generator.DocumentGenerator(); "
+         "print(sorted(name for name in ('openai', 'docx') if name in sys.modules))"],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "[]", result.stdout
+    print("✓ openai и python-docx загружаются только при первом использовании")
+
+def test_warm_up_single_client():
+    """Запрос во время прогрева получает тот же сетевой клиент, что и прогрев"""
+    import asyncio
+    from openai_client import OpenAIClient
+
+    print("\nТестирование прогрева клиента OpenAI...")
+
+    async def scenario():
+        client = OpenAIClient(cassette_mode="off")
+        warm_up = asyncio.ensure_future(client.warm_up())
+        await asyncio.sleep(0)
+        # Первый запрос пришел, пока openai импортируется в фоне
+        first = client.client
+        await warm_up
+        return first, client.client
+
+    first, second = asyncio.run(scenario())
+    assert first is second
+    print("✓ Прогрев и первый запрос используют один клиент")
+
 if __name__ == "__main__":
     print("🧪 Запуск тестирования модулей...\n")
     
@@ -98,6 +135,9 @@ if __name__ == "__main__":
     else:
         doc_ok = False
     
+    test_lazy_imports()
+    test_warm_up_single_client()
+    
     print(f"\n📊 Результаты тестирования:")
     print(f"Импорты: {'✅' if imports_ok else '❌'}")
     print(f"Генератор документов: {'✅' if doc_ok else '❌'}")
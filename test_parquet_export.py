@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Тест выгрузки собеседований в Parquet
+"""
+
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+
+def make_session(directory, archive, session_id, user_id, finished_at):
+    """Журнал сессии из трех реплик и отчет в индексе"""
+    from transcript_log import TranscriptWriter, message_record, session_record
+
+    writer = TranscriptWriter(os.path.join(directory, "transcripts"), fsync="none")
+    writer.append(session_id, session_record(session_id, user_id, "hope", "hard", "russian", "Анна"))
+    started = finished_at - timedelta(minutes=10)
+    for offset, is_bot, text in ((0, True, "{Агент-блока: Блок Опыт работы} Расскажите об опыте"),
+                                 (60, False, "Три года в банке"),
+                                 (64, True, "Какие модели вы обучали?")):
+        message = {"text": text, "is_bot": is_bot, "timestamp": started + timedelta(seconds=offset)}
+        if is_bot:
+            message["visible_text"] = text.split("} ")[-1]
+            message["agent_trace"] = ["Агент-блока: Блок Опыт работы"] if "{" in text else []
+        writer.append(session_id, message_record(message))
+    writer.flush_sync()
+    archive.add(user_id, f"{session_id}.docx", "hope", "hard", "принять", session_id=session_id,
+                created_at=finished_at, language="russian", scores={"overall": 8, "technical": 7})
+
+
+def test_incremental_export():
+    """Повторный запуск выгружает только новые сессии и строки журнала токенов"""
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        print("⚠️ pyarrow не установлен, тест выгрузки пропущен")
+        return
+    from parquet_export import export
+    from report_archive import ReportArchive
+
+    print("🧪 Тестирование выгрузки в Parquet...")
+
+    with tempfile.TemporaryDirectory() as directory:
+        index_path = os.path.join(directory, "reports.sqlite3")
+        ledger_path = os.path.join(directory, "ledger.jsonl")
+        out = os.path.join(directory, "export")
+        archive = ReportArchive(index_path, os.path.join(directory, "archive"))
+
+        def run():
+            return export(out, index_path, os.path.join(directory, "transcripts"), ledger_path, batch_size=2)
+
+        def ledger_line(session_id, day):
+            return json.dumps({
+                "ts": f"{day}T12:00:00", "day": day, "session_id": session_id, "user_id": 1,
+                "interview_mode": "hope", "interview_type": "hard", "call_type": "turn", "model": "gpt-4.1-mini",
+                "prompt_tokens": 1000, "completion_tokens": 100, "cost_usd": 0.001, "latency_ms": 850,
+            }) + "\n"
+
+        make_session(directory, archive, "s1", 1, datetime(2024, 5, 1, 12, 0))
+        make_session(directory, archive, "s2", 2, datetime(2024, 5, 2, 12, 0))
+        with open(ledger_path, "w", encoding="utf-8") as file:
+            file.write(ledger_line("s1", "2024-05-01") + ledger_line("s2", "2024-05-02") + '{"ts": "2024-05')
+
+        assert run() == {"sessions": 2, "turns": 6, "usage": 2}
+        assert run() == {"sessions": 0, "turns": 0, "usage": 0}
+
+        # Оборванная строка дописана, добавилась новая сессия
+        with open(ledger_path, "w", encoding="utf-8") as file:
+            file.write(ledger_line("s1", "2024-05-01") + ledger_line("s2", "2024-05-02") + ledger_line("s3", "2024-05-03"))
+        make_session(directory, archive, "s3", 3, datetime(2024, 5, 3, 12, 0))
+        assert run() == {"sessions": 1, "turns": 3, "usage": 1}
+        archive.close()
+
+        sessions = pq.read_table(os.path.join(out, "sessions")).to_pylist()
+        assert sorted(row["session_id"] for row in sessions) == ["s1", "s2", "s3"]
+        assert sorted(row["date"] for row in sessions) == ["2024-05-01", "2024-05-02", "2024-05-03"]
+        session = next(row for row in sessions if row["session_id"] == "s1")
+        assert session["candidate_turns"] == 1 and session["median_response_seconds"] == 4.0
+        assert session["score_overall"] == 8.0 and session["score_education"] is None
+
+        turns = pq.read_table(os.path.join(out, "turns")).to_pylist()
+        assert {turn["block"] for turn in turns} == {"опыт работы"}
+        assert pq.read_table(os.path.join(out, "usage")).column("latency_ms").to_pylist() == [850, 850, 850]
+        assert not any(name.endswith(".tmp") for _, _, names in os.walk(out) for name in names)
+    print("✅ Новые данные выгружены один раз, по разделам дней")
+
+
+def test_bounded_buffers():
+    """Строки, разбросанные по многим дням, не копятся в памяти сверх общего предела"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        print("⚠️ pyarrow не установлен, тест буферов пропущен")
+        return
+    from parquet_export import PartitionedWriter
+
+    print("🧪 Тестирование предела буферов выгрузки...")
+
+    with tempfile.TemporaryDirectory() as directory:
+        schema = pa.schema([("value", pa.int64())])
+        writer = PartitionedWriter(pa, pq, directory, "usage", schema, "run", batch_size=10000, max_buffered=50)
+        days = [(datetime(2024, 1, 1) + timedelta(days=offset)).strftime("%Y-%m-%d") for offset in range(300)]
+        for value in range(3000):
+            day = days[value * 7 % len(days)]
+            writer.write(day, {"value": value})
+        assert writer.peak_buffered <= 50, writer.peak_buffered
+        writer.commit()
+
+        values = pq.read_table(os.path.join(directory, "usage")).column("value").to_pylist()
+        assert sorted(values) == list(range(3000))
+    print(f"✅ В памяти не больше {writer.peak_buffered} строк на 300 дней, все строки выгружены")
+
+
+if __name__ == "__main__":
+    print("🚀 Запуск тестирования выгрузки в Parquet...\n")
+    test_incremental_export()
+    test_bounded_buffers()
+    print("\n🎯 Все тесты выгрузки пройдены!")
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Тест состояния агентов и нарезки промта по активному блоку
+"""
+
+RESPONSE = """{Агент-ветки: Ветка Собеседование (основная)}
+{Агент-блока: Блок Опыт работы}
+{Агент-профайла: Заполнение профайла блока Опыт работы}
+{Профайл блока Опыт работы:
+1. Название компании: Яндекс
+2. Период работы: Нет информации
+3. Должность и обязанности: Нет информации}
+{Финальный агент - агент-генератор вопросов}
+Расскажите, пожалуйста, сколько времени вы проработали в Яндексе?"""
+
+
+def test_agent_state_from_tags():
+    """Теги ответа разбираются в ветку, блок, финального агента и профайл"""
+    from agent_state import AgentState
+
+    print("🧪 Тестирование разбора технических тегов...")
+
+    state = AgentState()
+    state.update(RESPONSE)
+
+    assert state.branch == "Ветка Собеседование (основная)"
+    assert state.block == "опыт работы"
+    assert state.final_agent == "генератор вопросов"
+    assert state.profiles["опыт работы"]["Название компании"] == "Яндекс"
+    assert state.filled_fields() == {"Название компании": "Яндекс"}
+    assert not state.is_profile_complete()
+    print("✅ Состояние агентов восстановлено из тегов")
+
+
+def test_prompt_slicing():
+    """В промт попадают общее ядро, активный и следующий блоки"""
+    from prompt_slicer import SlicedPrompt
+
+    print("\n🧪 Тестирование нарезки промта...")
+
+    with open("prompt.txt", "r", encoding="utf-8") as file:
+        prompt = file.read()
+
+    sliced = SlicedPrompt(prompt)
+    assert sliced.blocks == ["образование", "опыт работы", "проект"]
+
+    rendered = sliced.render("Блок Опыт работы")
+    assert "Блок Опыт работы" in rendered
+    assert "Блок Проект" in rendered
+    assert "Ты четко понимаешь, что такое образование" not in rendered
+    assert "Команда агентов" in rendered
+    assert len(rendered) < len(prompt)
+    assert sliced.render("Неизвестный блок") == prompt
+    print(f"✅ Промт сокращен: {len(rendered)} из {len(prompt)} символов")
+
+
+def test_shipped_prompts_reduction():
+    """Каждый блок каждого промта собеседования сокращает промт; неизвестный блок учитывается"""
+    from metrics import metrics
+    from prompt_slicer import PromptSlicer, SlicedPrompt
+    from vacancies import PROMPT_FILES
+
+    print("\n🧪 Тестирование нарезки рабочих промтов...")
+
+    for prompt_file in PROMPT_FILES.values():
+        with open(prompt_file, "r", encoding="utf-8") as file:
+            prompt = file.read()
+
+        sliced = SlicedPrompt(prompt)
+        assert len(sliced.blocks) >= 2, (prompt_file, sliced.blocks)
+        for block in sliced.blocks:
+            # Внутри блока промт короче хотя бы на 1500 символов, при переходе к следующему блоку — все равно короче
+            assert len(prompt) - len(sliced.render(block, with_next=False)) >= 1500, (prompt_file, block)
+            assert len(sliced.render(block)) < len(prompt), (prompt_file, block)
+        print(f"✅ {prompt_file}: " + ", ".join(
+            f"{block[:20]} {len(sliced.render(block, with_next=False)) / len(prompt):.0%}" for block in sliced.blocks
+        ))
+
+    # Блок другого промта (пример из тегов) не найден: отправляется полный промт, случай учитывается
+    with open(PROMPT_FILES["hard"], "r", encoding="utf-8") as file:
+        prompt = file.read()
+    unmatched = metrics.get("prompt.unmatched")
+    assert PromptSlicer().slice(prompt, "Блок Образование") == prompt
+    assert metrics.get("prompt.unmatched") == unmatched + 1
+    print("✅ Неизвестный блок учтен, отправлен полный промт")
+
+
+if __name__ == "__main__":
+    print("🚀 Запуск тестирования нарезки промта...\n")
+    test_agent_state_from_tags()
+    test_prompt_slicing()
+    test_shipped_prompts_reduction()
+    print("\n🎯 Все тесты нарезки промта пройдены!")
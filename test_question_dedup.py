@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Тест индекса заданных вопросов: поиск повторов, перезапрос и сокращение истории
+"""
+
+import os
+import asyncio
+
+# Устанавливаем тестовые переменные окружения
+os.environ['TELEGRAM_BOT_TOKEN'] = 'test_token'
+os.environ['OPENAI_API_KEY'] = 'test_key'
+
+from fake_openai import FakeCompletions, install_fake_api
+
+
+class RepeatingCompletions(FakeCompletions):
+    """Имитирует API: сначала повторяет уже заданный вопрос, после указания задает новый (или падает)"""
+
+    def __init__(self, fail_retry=False):
+        super().__init__()
+        self.fail_retry = fail_retry
+
+    def reply(self, params):
+        if "уже задавался" in params["messages"][-1]["content"]:
+            if self.fail_retry:
+                raise RuntimeError("API недоступен")
+            return "{Агент-генератор вопросов}\nКакие метрики качества моделей вы используете?"
+        return "{Агент-генератор вопросов}\nСпасибо! А расскажите о своем опыте работы с машинным обучением?"
+
+
+def test_find_duplicate():
+    """Перефразированный вопрос находится, новый и слишком короткий — нет"""
+    from question_dedup import QuestionIndex
+
+    print("🧪 Тестирование поиска повторов...")
+
+    index = QuestionIndex()
+    index.add("Отлично, Анна! Расскажите, пожалуйста, о вашем опыте работы с машинным обучением?")
+    index.add("Какие библиотеки для анализа данных вы используете чаще всего?")
+    index.add("Tell me about your experience with deep learning frameworks?")
+
+    assert index.find_duplicate("Спасибо! А расскажите о своем опыте работы с машинным обучением?") is not None
+    assert index.find_duplicate("Какими библиотеками для анализа данных вы пользуетесь чаще всего?") is not None
+    assert index.find_duplicate("Could you tell me about your experience with deep learning frameworks?") is not None
+    assert index.find_duplicate("Как вы оцениваете качество моделей классификации?") is None
+    assert index.find_duplicate("What motivates you to work in data science?") is None
+    assert index.find_duplicate("Почему?") is None
+    print("✅ Повторы найдены, новые вопросы пропущены")
+
+
+def test_block_scope_and_confirmation():
+    """Вопросы сравниваются в пределах блока, подтверждения профайла повтором не считаются"""
+    from question_dedup import QuestionIndex
+
+    print("🧪 Тестирование блоков и подтверждений...")
+
+    index = QuestionIndex()
+    index.add("Заполнен профайл блока Образование. Всё ли верно в профайле?", "образование", "подтверждения")
+    index.add("Какие задачи вы решали на последнем месте работы?", "опыт работы", "генератор вопросов")
+
+    assert index.find_duplicate("Заполнен профайл блока Опыт работы. Всё ли верно в профайле?", "опыт работы") is None
+    assert index.find_duplicate("Какие задачи вы решали на последнем месте работы?", "опыт работы") is not None
+    assert index.find_duplicate("Какие задачи вы решали на последнем месте работы?", "проект") is None
+
+    # После подтверждения неполного профайла незаполненное поле переспрашивается
+    index.add("Заполнен профайл блока Опыт работы. Всё ли верно?", "опыт работы", "подтверждения")
+    assert index.find_duplicate("Какие задачи вы решали на последнем месте работы?", "опыт работы") is None
+    print("✅ Повторы ищутся внутри блока, подтверждения пропущены")
+
+
+def test_regenerate_duplicate():
+    """Повтор вопроса перезапрашивается с указанием не повторять его"""
+    from openai_client import OpenAIClient
+    from question_dedup import QuestionIndex
+
+    print("🧪 Тестирование перезапроса при повторе...")
+
+    client = OpenAIClient(cassette_mode="off")
+    completions = install_fake_api(client, RepeatingCompletions())
+
+    index = QuestionIndex()
+    index.add("Расскажите о вашем опыте работы с машинным обучением?")
+    history = [{"text": "Расскажите о вашем опыте работы с машинным обучением?", "is_bot": True}]
+
+    response = asyncio.run(client.get_response("Промт", "Работал два года", history, question_index=index))
+
+    assert "метрики качества" in response
+    assert len(completions.requests) == 2
+    assert "«Расскажите о вашем опыте работы с машинным обучением?»" in completions.requests[1][-1]["content"]
+    print("✅ Повтор перезапрошен, кандидат получил новый вопрос")
+
+
+def test_regenerate_failure():
+    """Ошибка перезапроса не заменяет полученный ответ текстом извинения"""
+    from metrics import metrics
+    from openai_client import OpenAIClient
+    from question_dedup import QuestionIndex
+
+    print("🧪 Тестирование ошибки перезапроса...")
+
+    client = OpenAIClient(cassette_mode="off")
+    completions = install_fake_api(client, RepeatingCompletions(fail_retry=True))
+
+    index = QuestionIndex()
+    index.add("Расскажите о вашем опыте работы с машинным обучением?")
+    unresolved = metrics.get("dedup.unresolved")
+
+    response = asyncio.run(client.get_response("Промт", "Работал два года", [], question_index=index))
+
+    assert "опыте работы с машинным обучением" in response and "Извините" not in response
+    assert len(completions.requests) == 2
+    assert metrics.get("dedup.unresolved") == unresolved + 1
+    print("✅ При ошибке перезапроса кандидат получил исходный ответ, повтор учтен как неустраненный")
+
+
+def test_confirmation_not_regenerated():
+    """Подтверждение профайла очередного блока отдается кандидату без перезапроса"""
+    from agent_state import AgentState
+    from openai_client import OpenAIClient
+    from question_dedup import QuestionIndex
+
+    print("🧪 Тестирование подтверждения профайла в каждом блоке...")
+
+    client = OpenAIClient(cassette_mode="off")
+    confirmation = ("{Агент-блока: Блок Опыт работы}\n{Финальный агент - агент-подтверждения}\n"
+                    "Заполнен профайл блока Опыт работы. Всё ли верно в профайле?")
+    completions = install_fake_api(client, confirmation)
+
+    history = [{"text": "{Агент-блока: Блок Образование}\n{Финальный агент - агент-подтверждения}\n"
+                        "Заполнен профайл блока Образование. Всё ли верно в профайле?", "is_bot": True,
+                "visible_text": "Заполнен профайл блока Образование. Всё ли верно в профайле?"}]
+    index = QuestionIndex.from_history(history)
+    agent_state = AgentState()
+    agent_state.update(history[0]["text"])
+
+    response = asyncio.run(client.get_response("Промт", "Работал аналитиком", history, agent_state=agent_state,
+                                               question_index=index))
+
+    assert response == confirmation
+    assert len(completions.requests) == 1
+    print("✅ Подтверждение отдано без перезапроса")
+
+
+def test_trim_old_bot_messages():
+    """Старые реплики бота в истории сокращаются до тегов и вопросов, последние передаются целиком"""
+    from openai_client import QUESTION_TRIM_KEEP_RECENT, OpenAIClient
+    from tech_parser import parse_response
+
+    print("🧪 Тестирование сокращения истории...")
+
+    client = OpenAIClient(cassette_mode="off")
+    history = []
+    for number in range(QUESTION_TRIM_KEEP_RECENT + 2):
+        text = f"{{Агент-блока: Блок Опыт}}\nСпасибо за подробный ответ, это очень интересно. Вопрос номер {number}?"
+        visible_text, agent_trace = parse_response(text)
+        history.append({"text": text, "is_bot": True, "visible_text": visible_text, "agent_trace": agent_trace})
+        history.append({"text": f"Ответ {number}", "is_bot": False})
+
+    texts = client._trim_old_bot_messages(history)
+
+    assert texts[0] == "{Агент-блока: Блок Опыт} Вопрос номер 0?"
+    assert texts[1] == "Ответ 0"
+    assert texts[-2] == history[-2]["text"]
+    assert sum(1 for text in texts if "Спасибо" in text) == QUESTION_TRIM_KEEP_RECENT
+    print("✅ Старые реплики сокращены, последние переданы целиком")
+
+
+if __name__ == "__main__":
+    print("🚀 Запуск тестирования повторов вопросов...\n")
+    test_find_duplicate()
+    test_block_scope_and_confirmation()
+    test_regenerate_duplicate()
+    test_regenerate_failure()
+    test_confirmation_not_regenerated()
+    test_trim_old_bot_messages()
+    print("\n🎯 Все тесты повторов вопросов пройдены!")
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Тест повторного анализа прошлых собеседований
+"""
+
+import asyncio
+import os
+import tempfile
+from datetime import datetime
+
+REPORT = "Кандидат силен в ML.\n\nФинальная рекомендация: принять\nОЦЕНКИ: общая=9; опыт=8; технические=9"
+
+
+class FakeLedger:
+    def flush(self):
+        pass
+
+
+class FakeOpenAIClient:
+    """Имитирует generate_analytics_report: часть сессий отвечает ошибкой заданное число раз"""
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.ledger = FakeLedger()
+        self.active = 0
+        self.max_active = 0
+        self.vacancies = []
+
+    async def generate_analytics_report(self, conversation_history, candidate_profile=None, agent_state=None):
+        from openai_client import ANALYTICS_FAILED_TEXT
+        from vacancies import current_vacancy
+
+        self.vacancies.append(current_vacancy.get().key)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+
+        answer = conversation_history[1]["text"]
+        if self.failures.get(answer, 0) > 0:
+            self.failures[answer] -= 1
+            return ANALYTICS_FAILED_TEXT
+        return REPORT
+
+
+def test_reanalysis_with_retries_and_resume():
+    """Ошибки повторяются, результат пишется в индекс, повторный запуск берет только необработанные"""
+    from reanalyze import Reanalyzer
+    from report_archive import ReportArchive
+    from transcript_log import TranscriptWriter, message_record
+
+    print("🧪 Тестирование повторного анализа...")
+
+    with tempfile.TemporaryDirectory() as directory:
+        transcripts = TranscriptWriter(os.path.join(directory, "transcripts"), fsync="none")
+        archive = ReportArchive(os.path.join(directory, "reports.sqlite3"), os.path.join(directory, "archive"))
+
+        for index, session_id in enumerate(["s1", "s2", "s3", "s4", "s5"]):
+            if session_id != "s3":
+                for is_bot, text in ((True, "Расскажите о себе"), (False, f"ответ {session_id}")):
+                    message = {"text": text, "is_bot": is_bot, "timestamp": datetime(2024, 5, 1, 12, index)}
+                    if is_bot:
+                        message.update(visible_text=text, agent_trace=[])
+                    transcripts.append(session_id, message_record(message))
+            archive.add(index, f"{session_id}.docx", "hope", "hard", "отклонить", session_id=session_id,
+                        created_at=datetime(2024, 5, 1, 12, index), analysis_version="old")
+        transcripts.flush_sync()
+
+        client = FakeOpenAIClient({"ответ s2": 1, "ответ s4": 10})
+        reanalyzer = Reanalyzer(client, archive, os.path.join(directory, "transcripts"),
+                                concurrency=2, max_retries=2, retry_delay=0)
+        result = asyncio.run(reanalyzer.run(reanalyzer.pending()))
+
+        assert (result["done"], result["failed"], result["skipped"]) == (3, 1, 1)
+        assert client.max_active == 2
+        report = archive.find(user_id=1)[0]
+        assert report["recommendation"] == "принять" and report["score_overall"] == 9.0
+        assert report["analysis_version"] == reanalyzer.versions["default"]
+
+        # Продолжение: переоцененные пропускаются, остаются неудачные и сессии без журнала
+        pending = reanalyzer.pending()
+        assert [report["session_id"] for report in pending] == ["s3", "s4"]
+        archive.close()
+    print("✅ Повторы, запись в индекс и продолжение работают")
+
+
+def test_reanalysis_per_vacancy():
+    """Каждое собеседование оценивается промтом аналитики своей вакансии и получает версию этого промта"""
+    from reanalyze import Reanalyzer
+    from report_archive import ReportArchive
+    from transcript_log import TranscriptWriter, message_record
+    from vacancies import Vacancy
+
+    print("🧪 Тестирование повторного анализа по вакансиям...")
+
+    with tempfile.TemporaryDirectory() as directory:
+        analyst_prompt = os.path.join(directory, "analyst_prompt.txt")
+        with open(analyst_prompt, "w", encoding="utf-8") as file:
+            file.write("Оцени аналитика данных")
+        transcripts = TranscriptWriter(os.path.join(directory, "transcripts"), fsync="none")
+        archive = ReportArchive(os.path.join(directory, "reports.sqlite3"), os.path.join(directory, "archive"))
+
+        for index, (session_id, vacancy) in enumerate((("d1", "default"), ("a1", "analyst"), ("x1", "removed"))):
+            for is_bot, text in ((True, "Расскажите о себе"), (False, f"ответ {session_id}")):
+                message = {"text": text, "is_bot": is_bot, "timestamp": datetime(2024, 5, 1, 12, index)}
+                if is_bot:
+                    message.update(visible_text=text, agent_trace=[])
+                transcripts.append(session_id, message_record(message))
+            archive.add(index, f"{session_id}.docx", "hope", "hard", session_id=session_id,
+                        created_at=datetime(2024, 5, 1, 12, index), vacancy=vacancy)
+        transcripts.flush_sync()
+
+        client = FakeOpenAIClient({})
+        reanalyzer = Reanalyzer(client, archive, os.path.join(directory, "transcripts"), retry_delay=0,
+                                vacancies=[Vacancy("default"), Vacancy("analyst", analytics_prompt=analyst_prompt)])
+        assert reanalyzer.versions["default"] != reanalyzer.versions["analyst"]
+
+        # Отчеты вакансии, которой больше нет в настройках, не берутся
+        reports = reanalyzer.pending()
+        assert [report["session_id"] for report in reports] == ["d1", "a1"]
+        asyncio.run(reanalyzer.run(reports))
+
+        assert sorted(client.vacancies) == ["analyst", "default"]
+        assert archive.find(vacancy="analyst")[0]["analysis_version"] == reanalyzer.versions["analyst"]
+        assert archive.find(vacancy="default")[0]["analysis_version"] == reanalyzer.versions["default"]
+        assert reanalyzer.pending() == []
+        archive.close()
+    print("✅ Промт и версия аналитики берутся из вакансии собеседования")
+
+
+def test_failed_analysis_pending():
+    """Собеседование, аналитика которого не получена или без оценок, остается в очереди на повторный анализ"""
+    from openai_client import ANALYTICS_FAILED_TEXT
+    from report_archive import ReportArchive, parse_scores
+
+    print("🧪 Тестирование отчетов без аналитики...")
+
+    with tempfile.TemporaryDirectory() as directory:
+        archive = ReportArchive(os.path.join(directory, "reports.sqlite3"), os.path.join(directory, "archive"))
+        for session_id, analytics_report in (("ok", REPORT), ("failed", ANALYTICS_FAILED_TEXT),
+                                             ("no_scores", "Финальная рекомендация: принять")):
+            archive.add(1, f"{session_id}.docx", "hope", "hard", session_id=session_id,
+                        scores=parse_scores(analytics_report), analysis_version="v1")
+
+        assert [report["session_id"] for report in archive.pending_analysis("v1")] == ["failed", "no_scores"]
+        archive.close()
+    print("✅ Отчеты без оценок не помечены текущей версией и будут оценены заново")
+
+
+if __name__ == "__main__":
+    print("🚀 Запуск тестирования повторного анализа...\n")
+    test_reanalysis_with_retries_and_resume()
+    test_reanalysis_per_vacancy()
+    test_failed_analysis_pending()
+    print("\n🎯 Все тесты повторного анализа пройдены!")
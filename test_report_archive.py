@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Тест индекса и архива отчетов
+"""
+
+import os
+import asyncio
+import tempfile
+import zipfile
+from datetime import datetime
+
+
+def test_parse_recommendation():
+    """Финальная рекомендация извлекается из текста аналитики"""
+    from report_archive import parse_recommendation
+
+    print("🧪 Тестирование разбора рекомендации...")
+
+    assert parse_recommendation("7. РЕКОМЕНДАЦИИ\n- Финальная рекомендация: **Рассмотреть** кандидата") == "рассмотреть"
+    assert parse_recommendation("**Финальная рекомендация:**\nПринять на позицию") == "принять"
+    assert parse_recommendation("Final recommendation: reject") == "отклонить"
+    # Повтор шаблона из промта — не вердикт
+    assert parse_recommendation("- Финальная рекомендация (принять/отклонить/рассмотреть)") is None
+    assert parse_recommendation("Отчет без рекомендации") is None
+    print("✅ Рекомендация найдена в разных форматах ответа")
+
+
+def test_index_and_compaction():
+    """Старые отчеты упаковываются в помесячные архивы и остаются доступны через индекс"""
+    from report_archive import ReportArchive
+
+    print("\n🧪 Тестирование индекса и упаковки отчетов...")
+
+    with tempfile.TemporaryDirectory() as directory:
+        archive = ReportArchive(os.path.join(directory, "reports.sqlite3"), os.path.join(directory, "archive"))
+
+        def save(user_id, created_at, content):
+            path = os.path.join(directory, f"interview_report_{user_id}_{created_at:%Y%m%d_%H%M%S}.docx")
+            with open(path, "wb") as file:
+                file.write(content)
+            return path
+
+        old_path = save(1, datetime(2024, 3, 5, 10, 0), b"march report")
+        archive.add(1, old_path, "hope", "soft", "принять", created_at=datetime(2024, 3, 5, 10, 0))
+        new_path = save(1, datetime(2024, 5, 20, 12, 0), b"may report")
+        new_id = archive.add(1, new_path, "teacher", "hard", "отклонить", created_at=datetime(2024, 5, 20, 12, 0))
+        archive.add(2, save(2, datetime(2024, 3, 7, 9, 0), b"other user"), created_at=datetime(2024, 3, 7, 9, 0))
+
+        assert [report["created_at"][:10] for report in archive.find(user_id=1)] == ["2024-05-20", "2024-03-05"]
+        assert [report["id"] for report in archive.find(recommendation="отклонить")] == [new_id]
+
+        assert archive.compact(retention_days=30, now=datetime(2024, 6, 1)) == 2
+        assert not os.path.exists(old_path) and os.path.exists(new_path)
+        with zipfile.ZipFile(os.path.join(directory, "archive", "2024-03.zip")) as month:
+            assert len(month.namelist()) == 2
+
+        old_report = archive.find(user_id=1)[1]
+        assert old_report["archive"].endswith("2024-03.zip")
+        assert archive.read(old_report["id"]) == b"march report"
+        assert archive.read(new_id) == b"may report"
+
+        # Повторная упаковка ничего не делает
+        assert archive.compact(retention_days=30, now=datetime(2024, 6, 1)) == 0
+        archive.close()
+    print("✅ Старые отчеты упакованы по месяцам и читаются через индекс")
+
+
+def test_backfill():
+    """Отчеты, сохраненные до появления индекса, добавляются по имени файла"""
+    from report_archive import ReportArchive
+
+    print("\n🧪 Тестирование индексации старых отчетов...")
+
+    with tempfile.TemporaryDirectory() as directory:
+        for filename in ("interview_report_7_20240102_030405.docx", "notes.txt"):
+            open(os.path.join(directory, filename), "wb").close()
+
+        archive = ReportArchive(os.path.join(directory, "reports.sqlite3"), os.path.join(directory, "archive"))
+        assert archive.backfill(directory) == 1
+        assert archive.backfill(directory) == 0
+        assert archive.find(user_id=7)[0]["created_at"] == "2024-01-02 03:04:05"
+        archive.close()
+    print("✅ Старые отчеты добавлены в индекс один раз")
+
+
+def test_background_thread():
+    """Отчет добавляется и ищется из фонового потока, как это делает бот"""
+    from report_archive import ReportArchive
+
+    print("\n🧪 Тестирование индекса из фонового потока...")
+
+    with tempfile.TemporaryDirectory() as directory:
+        archive = ReportArchive(os.path.join(directory, "reports.sqlite3"), os.path.join(directory, "archive"))
+
+        async def scenario():
+            report_id = await asyncio.to_thread(archive.add, 5, "report.docx", "hope", "soft", "принять")
+            reports = await asyncio.to_thread(archive.find, user_id=5)
+            return report_id, reports
+
+        report_id, reports = asyncio.run(scenario())
+        assert [report["id"] for report in reports] == [report_id]
+        archive.close()
+    print("✅ Запись и поиск не занимают цикл событий")
+
+
+if __name__ == "__main__":
+    print("🚀 Запуск тестирования архива отчетов...\n")
+    test_parse_recommendation()
+    test_index_and_compaction()
+    test_backfill()
+    test_background_thread()
+    print("\n🎯 Все тесты архива отчетов пройдены!")
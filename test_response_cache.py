@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Тест кэша ответов LLM
+"""
+
+import os
+import asyncio
+import tempfile
+import time
+
+# Устанавливаем тестовые переменные окружения
+os.environ['TELEGRAM_BOT_TOKEN'] = 'test_token'
+os.environ['OPENAI_API_KEY'] = 'test_key'
+
+
+def make_response(content):
+    from openai.types.chat import ChatCompletion
+    from fake_openai import make_completion
+
+    return ChatCompletion.model_validate(make_completion(content))
+
+
+def test_ttl_and_lru_eviction():
+    """Устаревшие записи не отдаются, лишние вытесняются по давности использования"""
+    from response_cache import ResponseCache
+
+    print("🧪 Тестирование TTL и вытеснения...")
+
+    with tempfile.TemporaryDirectory() as directory:
+        cache = ResponseCache(os.path.join(directory, "cache.sqlite3"), ttl_seconds=60, max_entries=2)
+        first = {"model": "gpt-4.1-mini", "messages": [{"role": "user", "content": "1"}]}
+        second = {"model": "gpt-4.1-mini", "messages": [{"role": "user", "content": "2"}]}
+        third = {"model": "gpt-4.1-mini", "messages": [{"role": "user", "content": "3"}]}
+
+        cache.put(first, make_response("один"), "analytics")
+        cache.put(second, make_response("два"), "analytics")
+        time.sleep(0.01)
+        assert cache.get(first, "analytics").choices[0].message.content == "один"
+        cache.put(third, make_response("три"), "analytics")
+        assert cache.get(second, "analytics") is None
+        assert cache.get(first, "analytics") is not None
+        print("✅ Вытеснена давно не использованная запись")
+
+        cache.ttl_seconds = 0
+        time.sleep(0.01)
+        assert cache.get(third, "analytics") is None
+        print("✅ Устаревшая запись не отдается")
+
+
+def test_cache_in_client():
+    """Повторный запрос включенного типа не доходит до API"""
+    from openai_client import OpenAIClient
+    from response_cache import ResponseCache
+    from fake_openai import install_fake_api
+    from usage_ledger import UsageLedger
+
+    print("\n🧪 Тестирование кэша в клиенте...")
+
+    with tempfile.TemporaryDirectory() as directory:
+        cache = ResponseCache(os.path.join(directory, "cache.sqlite3"))
+        client = OpenAIClient(
+            ledger=UsageLedger(path=None), response_cache=cache, cache_call_types=["analytics"]
+        )
+        completions = install_fake_api(client, "Отчет")
+        history = [{"text": "Расскажите о себе", "is_bot": True}, {"text": "Я аналитик", "is_bot": False}]
+
+        first = asyncio.run(client.generate_analytics_report(history))
+        second = asyncio.run(client.generate_analytics_report(history))
+        assert first == second
+        assert completions.calls == 1
+        print("✅ Аналитика взята из кэша")
+
+        asyncio.run(client.get_response("Промт", "Привет", [], "hope", "russian", "Анна", "soft"))
+        asyncio.run(client.get_response("Промт", "Привет", [], "hope", "russian", "Анна", "soft"))
+        assert completions.calls == 3
+        print("✅ Ходы собеседования не кэшируются")
+
+
+if __name__ == "__main__":
+    print("🚀 Запуск тестирования кэша ответов...\n")
+    test_ttl_and_lru_eviction()
+    test_cache_in_client()
+    print("\n🎯 Все тесты кэша ответов пройдены!")
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Тест корректной остановки: ожидание начатых обработчиков и снимок сессий
+"""
+
+import asyncio
+import os
+import tempfile
+
+
+def test_in_flight_drain():
+    """Начатые обработчики дожидаются, зависшие не задерживают остановку дольше срока"""
+    from session_snapshot import InFlightTracker
+
+    print("🧪 Тестирование ожидания начатых обработчиков...")
+
+    tracker = InFlightTracker()
+    finished = []
+
+    async def handler(event, data):
+        await asyncio.sleep(event)
+        finished.append(event)
+
+    async def scenario():
+        tasks = [asyncio.ensure_future(tracker(handler, delay, {})) for delay in (0.01, 0.05, 5)]
+        await asyncio.sleep(0)
+        unfinished = await tracker.drain(timeout=0.5)
+        for task in tasks:
+            task.cancel()
+        return unfinished
+
+    unfinished = asyncio.run(scenario())
+    assert finished == [0.01, 0.05]
+    assert unfinished == 1
+    print("✅ Быстрые обработчики завершены, зависший не превысил срок остановки")
+
+
+def test_snapshot_roundtrip():
+    """Состояние агентов и профиль кандидата переживают перезапуск"""
+    from agent_state import AgentState
+    from candidate_profile import CandidateProfile
+    from session_snapshot import load_snapshot, save_snapshot
+
+    print("\n🧪 Тестирование снимка сессий...")
+
+    agent_state = AgentState()
+    agent_state.update("{Агент-ветки: Ветка Собеседование (основная)} {Агент-блока: Блок Образование} Расскажите об образовании")
+    profile = CandidateProfile()
+    profile.merge({"tech_stack": ["Python"]})
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "sessions.json")
+        save_snapshot(path, [{"user_id": 1, "agent_state": agent_state.to_dict(), "candidate_profile": profile.to_dict()}])
+
+        states = load_snapshot(path)
+        assert not os.path.exists(path)
+        assert load_snapshot(path) == []
+
+    restored_state = AgentState.from_dict(states[0]["agent_state"])
+    restored_profile = CandidateProfile.from_dict(states[0]["candidate_profile"])
+    assert restored_state.to_dict() == agent_state.to_dict()
+    assert restored_profile.sections["tech_stack"] == ["Python"]
+    print("✅ Сессия восстановлена из снимка")
+
+
+if __name__ == "__main__":
+    print("🚀 Запуск тестирования корректной остановки...\n")
+    test_in_flight_drain()
+    test_snapshot_roundtrip()
+    print("\n🎯 Все тесты корректной остановки пройдены!")
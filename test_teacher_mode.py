@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Тест хода преподавателя двумя параллельными запросами
+"""
+
+import os
+import asyncio
+
+# Устанавливаем тестовые переменные окружения
+os.environ['TELEGRAM_BOT_TOKEN'] = 'test_token'
+os.environ['OPENAI_API_KEY'] = 'test_key'
+
+from fake_openai import FakeCompletions, install_fake_api
+
+
+class SlowQuestionCompletions(FakeCompletions):
+    """Имитирует API: исправление ошибок готово быстро, следующий вопрос — медленно"""
+
+    def __init__(self):
+        super().__init__()
+        self.active = 0
+        self.max_active = 0
+
+    async def reply(self, params):
+        is_correction = params["messages"][0]["content"].startswith("Ты - преподаватель")
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        await asyncio.sleep(0.01 if is_correction else 0.1)
+        self.active -= 1
+
+        return "Correction: I have worked" if is_correction else "{Финальный агент - агент-генератор вопросов}\nWhat was your role?"
+
+
+def test_teacher_turn_order():
+    """Разбор ошибок приходит первым, оба запроса выполняются параллельно"""
+    from openai_client import OpenAIClient
+
+    print("🧪 Тестирование хода преподавателя...")
+
+    client = OpenAIClient(cassette_mode="off")
+    completions = install_fake_api(client, SlowQuestionCompletions())
+
+    history = [{"text": "Tell me about your experience", "is_bot": True}]
+
+    async def collect():
+        return [
+            response async for response in client.get_teacher_turn(
+                "Промт", "I has worked", history, "Anna", "experience"
+            )
+        ]
+
+    responses = asyncio.run(collect())
+
+    assert responses[0].startswith("Correction")
+    assert "What was your role?" in responses[1]
+    assert completions.max_active == 2
+    print("✅ Разбор ошибок отправлен первым, запросы выполнялись параллельно")
+    print(client.format_teacher_report())
+
+
+if __name__ == "__main__":
+    print("🚀 Запуск тестирования режима преподавателя...\n")
+    test_teacher_turn_order()
+    print("\n🎯 Все тесты режима преподавателя пройдены!")
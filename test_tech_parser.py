@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Тест потокового парсера технических блоков
+"""
+
+import os
+from datetime import datetime
+
+RESPONSE = """{Агент-ветки: Ветка Собеседование (основная)}
+{Профайл блока Образование:
+1. Образование: Нет информации}
+
+  Здравствуйте, Анна!
+
+Расскажите о своем образовании."""
+
+
+def test_parse_full_response():
+    """Технические блоки вырезаются из текста и сохраняются как трасса"""
+    from tech_parser import parse_response
+
+    print("🧪 Тестирование разбора полного ответа...")
+
+    visible_text, blocks = parse_response(RESPONSE)
+    assert visible_text == "Здравствуйте, Анна!\nРасскажите о своем образовании."
+    assert blocks == [
+        "Агент-ветки: Ветка Собеседование (основная)",
+        "Профайл блока Образование:\n1. Образование: Нет информации"
+    ]
+    print("✅ Текст для кандидата и трасса агентов получены")
+
+
+def test_parse_streamed_chunks():
+    """Блоки, разорванные между частями потока, разбираются так же, как целый ответ"""
+    from tech_parser import TechnicalBlockParser, parse_response
+
+    print("\n🧪 Тестирование разбора ответа по частям...")
+
+    expected_text, expected_blocks = parse_response(RESPONSE)
+    for chunk_size in (1, 3, 7, 16):
+        parser = TechnicalBlockParser()
+        visible_text = ""
+        for start in range(0, len(RESPONSE), chunk_size):
+            visible_text += parser.feed(RESPONSE[start:start + chunk_size])
+        visible_text += parser.finish()
+
+        assert visible_text == expected_text
+        assert parser.blocks == expected_blocks
+    print("✅ Разбор не зависит от размера частей")
+
+
+def test_trace_in_report():
+    """Трасса агентов попадает в DOCX отчет"""
+    from document_generator import DocumentGenerator
+    from tech_parser import parse_response
+
+    print("\n🧪 Тестирование трассы агентов в отчете...")
+
+    visible_text, agent_trace = parse_response(RESPONSE)
+    conversation_history = [
+        {"text": RESPONSE, "is_bot": True, "timestamp": datetime.now(),
+         "visible_text": visible_text, "agent_trace": agent_trace},
+        {"text": "Я окончила МГУ", "is_bot": False, "timestamp": datetime.now()}
+    ]
+
+    doc_generator = DocumentGenerator()
+    doc_generator.generate_report(12345, conversation_history, "1. ОБЩАЯ ОЦЕНКА\nТест")
+    paragraphs = [paragraph.text for paragraph in doc_generator.document.paragraphs]
+    assert "Агент-ветки: Ветка Собеседование (основная)" in paragraphs
+
+    doc_path = doc_generator.save_document(12345)
+    os.remove(doc_path)
+    print("✅ Трасса агентов добавлена в отчет")
+
+
+if __name__ == "__main__":
+    print("🚀 Запуск тестирования парсера технических блоков...\n")
+    test_parse_full_response()
+    test_parse_streamed_chunks()
+    test_trace_in_report()
+    print("\n🎯 Все тесты парсера пройдены!")
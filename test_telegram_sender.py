@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Тест очереди исходящих сообщений Telegram
+"""
+
+import asyncio
+import time
+
+
+class SentMessage:
+    def __init__(self, message_id):
+        self.message_id = message_id
+
+
+class FakeBot:
+    """Имитирует методы aiogram.Bot, записывая вызовы"""
+
+    def __init__(self, retry_after_once=False, delay=0.0):
+        self.calls = []
+        self.retry_after_once = retry_after_once
+        self.delay = delay
+        self.next_id = 1
+
+    async def send_message(self, chat_id, text, reply_markup=None):
+        from aiogram.exceptions import TelegramRetryAfter
+        from aiogram.methods import SendMessage
+
+        if self.retry_after_once:
+            self.retry_after_once = False
+            raise TelegramRetryAfter(SendMessage(chat_id=chat_id, text=text), "Flood control", 0)
+
+        await asyncio.sleep(self.delay)
+        self.calls.append(("send", chat_id, text, time.monotonic()))
+        self.next_id += 1
+        return SentMessage(self.next_id)
+
+    async def delete_message(self, chat_id, message_id):
+        self.calls.append(("delete", chat_id, message_id, time.monotonic()))
+        return True
+
+    async def edit_message_text(self, text, chat_id, message_id, reply_markup=None):
+        self.calls.append(("edit", chat_id, text, time.monotonic()))
+        return True
+
+
+def test_split_message():
+    """Длинный текст делится по абзацам на части не длиннее лимита"""
+    from telegram_sender import split_message
+
+    print("🧪 Тестирование деления длинных сообщений...")
+
+    text = "\n\n".join(["а" * 3000, "б" * 3000, "в" * 100])
+    chunks = split_message(text)
+    assert [len(chunk) for chunk in chunks] == [3000, 3102]
+    assert split_message("коротко") == ["коротко"]
+    assert all(len(chunk) <= 4096 for chunk in split_message("x" * 10000))
+    print("✅ Сообщение разбито на части")
+
+
+def test_coalescing_and_order():
+    """Неотправленный плейсхолдер отменяется вместе с удалением, порядок в чате сохраняется"""
+    from telegram_sender import TelegramSender
+
+    print("\n🧪 Тестирование склейки операций...")
+
+    bot = FakeBot()
+
+    async def scenario():
+        sender = TelegramSender(bot, chat_rate=100, chat_burst=1)
+        sender.send(1, "первое")
+        thinking = sender.placeholder(1, "🤔 Бот думает...")
+        sender.delete(thinking)
+        sender.send(1, "второе")
+        sender.edit_text(1, 10, "черновик")
+        sender.edit_text(1, 10, "итог")
+        await sender.drain(timeout=2)
+
+    asyncio.run(scenario())
+
+    assert [call[2] for call in bot.calls] == ["первое", "второе", "итог"]
+    print("✅ Лишние операции склеены, порядок сохранен")
+
+
+def test_placeholder_edit():
+    """Текст временного сообщения меняется на месте: до отправки — без лишнего запроса"""
+    from telegram_sender import TelegramSender
+
+    print("\n🧪 Тестирование изменения временного сообщения...")
+
+    bot = FakeBot(delay=0.05)
+
+    async def scenario():
+        sender = TelegramSender(bot, chat_rate=100, chat_burst=5)
+        thinking = sender.placeholder(1, "🤔 Бот думает...")
+        sender.edit_placeholder(thinking, "⏳ В очереди: 2-й")
+        await asyncio.sleep(0.01)
+        sender.edit_placeholder(thinking, "⏳ В очереди: 1-й")
+        await sender.drain(timeout=2)
+        sender.delete(thinking)
+        await sender.drain(timeout=2)
+
+    asyncio.run(scenario())
+
+    assert [call[0] for call in bot.calls] == ["send", "edit", "delete"]
+    assert bot.calls[0][2] == "⏳ В очереди: 2-й"
+    assert bot.calls[1][2] == "⏳ В очереди: 1-й"
+    print("✅ Позиция в очереди показана на месте временного сообщения")
+
+
+def test_rate_limit_and_retry_after():
+    """Сообщения одного чата идут не чаще лимита, RetryAfter приводит к повтору"""
+    from telegram_sender import TelegramSender
+
+    print("\n🧪 Тестирование лимитов и RetryAfter...")
+
+    bot = FakeBot(retry_after_once=True)
+
+    async def scenario():
+        sender = TelegramSender(bot, chat_rate=20, chat_burst=1)
+        for index in range(4):
+            sender.send(1, f"сообщение {index}")
+        sender.send(2, "другой чат")
+        start_time = time.monotonic()
+        assert await sender.drain(timeout=3)
+        return start_time
+
+    start_time = asyncio.run(scenario())
+
+    chat_times = [call[3] for call in bot.calls if call[1] == 1]
+    assert [call[2] for call in bot.calls if call[1] == 1] == [f"сообщение {index}" for index in range(4)]
+    assert chat_times[-1] - start_time >= 3 / 20 * 0.9
+    print("✅ Лимит чата соблюден, сообщение после RetryAfter доставлено")
+
+
+def test_placeholder_of_other_vacancy():
+    """Позиция в очереди меняется в сообщении своего бота, даже если ее обновляет задача другой вакансии"""
+    import contextvars
+    from admission import AdmissionController
+    from telegram_sender import SenderPool, TelegramSender
+
+    print("\n🧪 Тестирование позиции в очереди при нескольких ботах...")
+
+    bots = {"a": FakeBot(), "b": FakeBot()}
+
+    async def scenario():
+        vacancy = contextvars.ContextVar("vacancy", default="b")
+        pool = SenderPool({key: TelegramSender(bot, chat_rate=100, chat_burst=5) for key, bot in bots.items()}, vacancy.get)
+        controller = AdmissionController(1, 10, tenant_of=vacancy.get)
+        release = asyncio.Event()
+
+        async def hold():
+            async with controller.slot("turn"):
+                await release.wait()
+
+        async def wait_turn():
+            async with controller.slot("turn"):
+                pass
+
+        async def candidate():
+            vacancy.set("a")
+            thinking = pool.placeholder(1, "🤔 Бот думает...")
+            async with controller.slot("turn", lambda position, eta: pool.edit_placeholder(thinking, f"⏳ {position}-й")):
+                pass
+            pool.delete(thinking)
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        other = asyncio.create_task(wait_turn())
+        await asyncio.sleep(0)
+        queued = asyncio.create_task(candidate())
+        await asyncio.sleep(0.05)
+        # Место освобождает задача вакансии b: позиция кандидата вакансии a обновляется в ее контексте
+        release.set()
+        await asyncio.gather(holder, other, queued)
+        assert await pool.drain(timeout=2)
+
+    asyncio.run(scenario())
+
+    assert [(call[0], call[2]) for call in bots["a"].calls][:2] == [("send", "⏳ 2-й"), ("edit", "⏳ 1-й")]
+    assert bots["b"].calls == []
+    print("✅ Позиция в очереди обновлена ботом, отправившим сообщение")
+
+
+if __name__ == "__main__":
+    print("🚀 Запуск тестирования очереди Telegram...\n")
+    test_split_message()
+    test_coalescing_and_order()
+    test_placeholder_edit()
+    test_placeholder_of_other_vacancy()
+    test_rate_limit_and_retry_after()
+    print("\n🎯 Все тесты очереди Telegram пройдены!")
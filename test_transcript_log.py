@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Тест журнала собеседований в JSONL
+"""
+
+import asyncio
+import os
+import tempfile
+from datetime import datetime
+
+
+def make_messages():
+    """Реплики в формате UserState.add_message"""
+    from tech_parser import parse_response
+
+    bot_text = "{Агент-ветки: Ветка Собеседование (основная)} {Агент-блока: Блок Образование} Расскажите об образовании"
+    visible_text, agent_trace = parse_response(bot_text)
+    return [
+        {"text": bot_text, "is_bot": True, "timestamp": datetime.now(), "visible_text": visible_text, "agent_trace": agent_trace},
+        {"text": "Я окончила МГУ", "is_bot": False, "timestamp": datetime.now()},
+    ]
+
+
+def test_batched_writes_and_reload():
+    """Записи копятся, дописываются пачкой и читаются обратно вместе с трассой агентов"""
+    from transcript_log import TranscriptWriter, load_transcript, message_record, rebuild_agent_state, session_record
+
+    print("🧪 Тестирование журнала сессии...")
+
+    with tempfile.TemporaryDirectory() as directory:
+        writer = TranscriptWriter(directory, fsync="batch", flush_interval=0.05)
+
+        async def scenario():
+            writer.append("s1", session_record("s1", 42, "hope", "soft", "russian", "Анна"))
+            for message in make_messages():
+                writer.append("s1", message_record(message))
+            assert not os.path.exists(writer.path_for("s1"))
+            await asyncio.sleep(0.2)
+
+        asyncio.run(scenario())
+
+        session, history = load_transcript(writer.path_for("s1"))
+        assert session["user_id"] == 42 and session["name"] == "Анна"
+        assert [message["is_bot"] for message in history] == [True, False]
+        assert history[0]["visible_text"] == "Расскажите об образовании"
+        assert rebuild_agent_state(history).block == "образование"
+        print("✅ Сессия восстановлена из журнала одной пачкой записи")
+
+
+def test_torn_tail_is_ignored():
+    """Оборванная последняя строка (аварийная остановка) не мешает чтению"""
+    from transcript_log import TranscriptWriter, load_transcript, message_record
+
+    print("\n🧪 Тестирование оборванной записи...")
+
+    with tempfile.TemporaryDirectory() as directory:
+        writer = TranscriptWriter(directory, fsync="none")
+        for message in make_messages():
+            writer.append("s2", message_record(message))
+        writer.flush_sync()
+        with open(writer.path_for("s2"), "a", encoding="utf-8") as file:
+            file.write('{"type": "message", "text": "обор')
+
+        _, history = load_transcript(writer.path_for("s2"))
+        assert len(history) == 2
+    print("✅ Оборванная строка пропущена")
+
+
+if __name__ == "__main__":
+    print("🚀 Запуск тестирования журнала собеседований...\n")
+    test_batched_writes_and_reload()
+    test_torn_tail_is_ignored()
+    print("\n🎯 Все тесты журнала собеседований пройдены!")
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Тест полнотекстового поиска по собеседованиям
+"""
+
+import os
+import asyncio
+import sqlite3
+import tempfile
+
+
+def test_stemming():
+    """Разные формы слова сводятся к одной основе"""
+    from transcript_search import build_match_query, stem
+
+    print("🧪 Тестирование стемминга...")
+
+    assert stem("тестирование") == stem("тестировать")
+    assert stem("командой") == stem("команды") == "команд"
+    assert stem("Testing") == stem("tests") == "test"
+    assert stem("Ёлка") == stem("елки")
+    # Синтаксис FTS5 из запроса не проходит
+    assert build_match_query('pytorch OR "A/B тесты"') == '"pytorch"* AND "or" AND "a b тест"'
+    print("✅ Основы слов совпадают")
+
+
+def test_search_ranked_snippets():
+    """Поиск находит собеседования по формам слов и возвращает фрагменты с выделением"""
+    from transcript_search import TranscriptSearch, format_search_results
+
+    print("\n🧪 Тестирование поиска...")
+
+    def answers(*texts):
+        history = []
+        for text in texts:
+            history.append({"text": "Расскажите подробнее", "is_bot": True})
+            history.append({"text": text, "is_bot": False})
+        return history
+
+    with tempfile.TemporaryDirectory() as directory:
+        index = TranscriptSearch(os.path.join(directory, "search.sqlite3"))
+        index.add_interview("s1", 1, answers("Обучала модели на PyTorch", "Руководила командой из пяти человек"),
+                            name="Анна", interview_type="hard")
+        index.add_interview("s2", 2, answers("Проводил A/B тесты рекомендаций", "Писал на TensorFlow"),
+                            "Кандидат уверенно владеет pytorch.\n\nФинальная рекомендация: рассмотреть", name="Борис")
+        index.add_interview("s3", 3, answers("Работал аналитиком в банке"), name="Вера")
+
+        assert {result["session_id"] for result in index.search("pytorch")} == {"s1", "s2"}
+        assert [result["session_id"] for result in index.search("pytorch", kind="candidate")] == ["s1"]
+        assert [result["session_id"] for result in index.search("команда")] == ["s1"]
+        assert [result["session_id"] for result in index.search('"A/B тестирование"')] == []
+        assert [result["session_id"] for result in index.search('"A/B тесты"')] == ["s2"]
+        # Все слова запроса должны быть в одном фрагменте
+        assert index.search("тесты pytorch") == []
+
+        result = index.search("руководить командами")[0]
+        assert result["name"] == "Анна"
+        assert "«Руководила» «командой»" in result["snippet"]
+        assert "Анна" in format_search_results([result])
+
+        # Повторная индексация заменяет фрагменты, а не дублирует их
+        index.add_interview("s3", 3, answers("Работал аналитиком, знаю PyTorch"), name="Вера")
+        assert len(index.search("pytorch")) == 3
+        assert len(index.search("банк")) == 0
+        index.close()
+    print("✅ Найдены нужные собеседования, фрагменты выделены")
+
+
+def test_background_indexing():
+    """Индексация и поиск идут из фонового потока, повторная индексация удаляет фрагменты по rowid"""
+    from transcript_search import TranscriptSearch
+
+    print("\n🧪 Тестирование индексации в фоновом потоке...")
+
+    history = [{"text": "Вопрос", "is_bot": True}, {"text": "Строил пайплайны на Airflow", "is_bot": False}]
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "search.sqlite3")
+
+        # Индекс, созданный до появления таблицы session_passages
+        connection = sqlite3.connect(path)
+        connection.execute("CREATE TABLE interviews (session_id TEXT PRIMARY KEY, user_id TEXT, name TEXT, "
+                           "finished_at TEXT, interview_mode TEXT, interview_type TEXT, language TEXT)")
+        connection.execute("CREATE VIRTUAL TABLE passages USING fts5(stems, text UNINDEXED, session_id UNINDEXED, "
+                           "kind UNINDEXED, tokenize = 'unicode61 remove_diacritics 2')")
+        connection.execute("INSERT INTO interviews (session_id, user_id) VALUES ('old', '1')")
+        connection.execute("INSERT INTO passages VALUES ('airflow', 'Airflow', 'old', 'candidate')")
+        connection.commit()
+        connection.close()
+
+        index = TranscriptSearch(path)
+
+        async def scenario():
+            await asyncio.to_thread(index.add_interview, "s1", 2, history, name="Анна")
+            await asyncio.to_thread(index.add_interview, "old", 1, history[:1])
+            return await asyncio.to_thread(index.search, "airflow")
+
+        results = asyncio.run(scenario())
+        assert [result["session_id"] for result in results] == ["s1"]
+        counts = index.connection.execute(
+            "SELECT (SELECT COUNT(*) FROM passages), (SELECT COUNT(*) FROM session_passages)"
+        ).fetchone()
+        assert tuple(counts) == (1, 1)
+        index.close()
+    print("✅ Фрагменты старого индекса найдены по rowid и заменены")
+
+
+if __name__ == "__main__":
+    print("🚀 Запуск тестирования поиска по собеседованиям...\n")
+    test_stemming()
+    test_search_ranked_snippets()
+    test_background_indexing()
+    print("\n🎯 Все тесты поиска пройдены!")
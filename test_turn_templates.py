@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Тест шаблонного приветствия: начало собеседования без запроса к LLM
+"""
+
+import os
+
+# Устанавливаем тестовые переменные окружения
+os.environ['TELEGRAM_BOT_TOKEN'] = 'test_token'
+os.environ['OPENAI_API_KEY'] = 'test_key'
+
+
+def test_greeting():
+    """Приветствие собирается без API, просит согласия на разговор и несет теги агентов"""
+    from agent_state import AgentState
+    from metrics import metrics
+    from tech_parser import parse_response
+    from turn_templates import TurnTemplates
+
+    print("🧪 Тестирование шаблонного приветствия...")
+
+    served = metrics.get("templates.served.greeting")
+    greeting = TurnTemplates().greeting("hope", "russian", "Анна")
+    visible_text, tags = parse_response(greeting)
+    agent_state = AgentState()
+    agent_state.update_from_tags(tags)
+    assert visible_text.startswith("Здравствуйте, Анна!") and visible_text.endswith("Удобно ли вам сейчас поговорить?")
+    assert "перевести" in visible_text
+    assert agent_state.branch and agent_state.block is None
+    assert metrics.get("templates.served.greeting") == served + 1
+
+    # Для сочетания режима и языка без шаблона приветствие запрашивается у LLM
+    fallback = metrics.get("templates.fallback")
+    assert TurnTemplates().greeting("unknown", "russian", "Анна") is None
+    assert metrics.get("templates.fallback") == fallback + 1
+
+    # Стандартный промт — шаблон; свой промт вакансии или варианта эксперимента — приветствие от LLM
+    assert TurnTemplates().greeting("hope", "russian", "Анна", "prompt.txt") is not None
+    assert TurnTemplates().greeting("hope", "russian", "Анна", "prompts/analyst_hard.txt") is None
+    assert metrics.get("templates.fallback") == fallback + 2
+    print("✅ Приветствие отдано шаблоном, без шаблона — через LLM")
+
+
+def test_teacher_greeting():
+    """Преподаватель всегда приветствует по-английски"""
+    from turn_templates import TurnTemplates
+
+    print("🧪 Тестирование приветствия преподавателя...")
+
+    reply = TurnTemplates().greeting("teacher", "russian", "Anna")
+    assert "Hello, Anna! I am your English teacher" in reply and reply.endswith("Is it convenient for you to talk now?")
+    assert TurnTemplates().greeting("teacher", "english", "Anna") == reply
+    print("✅ Приветствие преподавателя отдано шаблоном")
+
+
+if __name__ == "__main__":
+    print("🚀 Запуск тестирования шаблонного приветствия...\n")
+    test_greeting()
+    test_teacher_greeting()
+    print("\n🎯 Все тесты шаблонного приветствия пройдены!")
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Тест учета токенов и бюджета сессии
+"""
+
+import os
+import tempfile
+
+
+class Usage:
+    def __init__(self, prompt_tokens, completion_tokens):
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+
+
+def test_ledger_aggregates_and_persists():
+    """Расход учитывается по сессиям, пользователям и дням и переживает перезапуск"""
+    from usage_ledger import SessionInfo, UsageLedger
+
+    print("🧪 Тестирование журнала токенов...")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "ledger.jsonl")
+        ledger = UsageLedger(path)
+        session = SessionInfo("s1", 42, "hope", "soft")
+        ledger.record("turn", "gpt-4.1-mini", Usage(1000, 200), session)
+        ledger.record("analytics", "gpt-4.1-mini", Usage(500, 300), session)
+        ledger.flush()
+
+        assert ledger.session_tokens("s1") == 2000
+        assert ledger.users[42]["calls"] == 2
+
+        restored = UsageLedger(path)
+        assert restored.session_tokens("s1") == 2000
+        assert "hope/soft: 1 сессий" in restored.format_report()
+        print("✅ Журнал восстановлен после перезапуска")
+
+
+def test_budget_levels():
+    """Уровень экономии растет по мере приближения к бюджету"""
+    from usage_ledger import SessionInfo, UsageLedger
+
+    print("\n🧪 Тестирование бюджета сессии...")
+
+    ledger = UsageLedger(path=None, session_budget=10000)
+    session = SessionInfo("s2", 7)
+    assert ledger.budget_level(session) == 0
+
+    ledger.record("turn", "gpt-4.1-mini", Usage(6000, 0), session)
+    assert ledger.budget_level(session) == 1
+
+    ledger.record("turn", "gpt-4.1-mini", Usage(2000, 0), session)
+    assert ledger.budget_level(session) == 2
+
+    ledger.record("turn", "gpt-4.1-mini", Usage(1600, 0), session)
+    assert ledger.budget_level(session) == 3
+    print("✅ Уровни экономии переключаются по порогам")
+
+
+if __name__ == "__main__":
+    print("🚀 Запуск тестирования учета токенов...\n")
+    test_ledger_aggregates_and_persists()
+    test_budget_levels()
+    print("\n🎯 Все тесты учета токенов пройдены!")
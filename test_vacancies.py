@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Тест нескольких вакансий в одном процессе: настройки ботов, справедливая очередь к LLM и общие промты
+"""
+
+import os
+import json
+import asyncio
+import tempfile
+
+
+def test_load_vacancies():
+    """Вакансии читаются из файла, без файла — одна вакансия из TELEGRAM_BOT_TOKEN"""
+    from vacancies import PROMPT_FILES, load_vacancies
+
+    print("🧪 Тестирование загрузки вакансий...")
+
+    assert [vacancy.token for vacancy in load_vacancies("нет_такого_файла.json", "1:abc")] == ["1:abc"]
+    try:
+        load_vacancies("нет_такого_файла.json", None)
+        assert False, "без токена и файла вакансий бот не запускается"
+    except ValueError:
+        pass
+
+    os.environ["TEST_ANALYST_BOT_TOKEN"] = "2:def"
+    items = [
+        {"key": "ds", "token": "1:abc"},
+        {"key": "analyst", "token_env": "TEST_ANALYST_BOT_TOKEN", "position": "аналитика",
+         "prompt_files": {"hard": "prompt.txt"}},
+    ]
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "vacancies.json")
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(items, file)
+        ds, analyst = load_vacancies(path)
+
+        assert analyst.token == "2:def" and analyst.position == "аналитика"
+        assert analyst.prompt_files["hard"] == "prompt.txt"
+        assert analyst.prompt_files["soft"] == PROMPT_FILES["soft"]
+        assert ds.company == "Пегий дудочник"
+
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump([{"key": "ds", "token": "1:abc"}, {"key": "ds", "token": "2:def"}], file)
+        try:
+            load_vacancies(path)
+            assert False, "одинаковые key недопустимы"
+        except ValueError:
+            pass
+    print("✅ Вакансии загружаются, ошибки настроек обнаруживаются при запуске")
+
+
+def test_fair_admission():
+    """Всплеск одной вакансии не задерживает очередь другой"""
+    from admission import AdmissionController
+
+    print("🧪 Тестирование справедливой очереди между вакансиями...")
+
+    async def scenario():
+        tenant = {"value": "a"}
+        controller = AdmissionController(1, 10, tenant_of=lambda: tenant["value"])
+        order = []
+
+        async def call(name):
+            async with controller.slot("turn"):
+                order.append(name)
+                await asyncio.sleep(0.01)
+
+        first = asyncio.create_task(call("a0"))
+        await asyncio.sleep(0)
+        tasks = []
+        for index in range(1, 4):
+            tasks.append(asyncio.create_task(call(f"a{index}")))
+            await asyncio.sleep(0)
+        tenant["value"] = "b"
+        tasks.append(asyncio.create_task(call("b1")))
+        await asyncio.sleep(0)
+        await asyncio.gather(first, *tasks)
+        return order
+
+    order = asyncio.run(scenario())
+    # Вакансия b встала в очередь последней, но обслуживается во втором круге, а не после всех запросов a
+    assert order.index("b1") == 2, order
+    print(f"✅ Очередь делится между вакансиями: {order}")
+
+
+def test_prompt_registry_and_persona():
+    """Промты читаются один раз на всех ботов, легенда рекрутера берется из вакансии"""
+    from metrics import metrics
+    from turn_templates import TurnTemplates
+    from vacancies import PromptRegistry, Vacancy, current_vacancy
+
+    print("🧪 Тестирование общих промтов и легенды вакансии...")
+
+    registry = PromptRegistry()
+    loads = metrics.get("prompts.loads")
+    first = asyncio.run(registry.get("prompt.txt"))
+    second = asyncio.run(registry.get("prompt.txt"))
+    assert first == second and metrics.get("prompts.loads") == loads + 1
+
+    token = current_vacancy.set(Vacancy("analyst", company="Рога и копыта", position="аналитика"))
+    try:
+        greeting = TurnTemplates().greeting("hope", "russian", "Анна")
+    finally:
+        current_vacancy.reset(token)
+    assert "Рога и копыта" in greeting and "аналитика" in greeting
+    print("✅ Промты общие, легенда рекрутера у каждой вакансии своя")
+
+
+def test_vacancy_scoped_indexes():
+    """Отчеты, короткий список и поиск ограничиваются вакансией; старые записи относятся к вакансии по умолчанию"""
+    import sqlite3
+    from datetime import datetime
+    from candidate_ranking import load_interviews, rank_candidates
+    from report_archive import ReportArchive
+    from transcript_search import TranscriptSearch
+
+    print("🧪 Тестирование индексов по вакансиям...")
+
+    with tempfile.TemporaryDirectory() as directory:
+        index_path = os.path.join(directory, "reports.sqlite3")
+        # Индекс, созданный до появления вакансий
+        connection = sqlite3.connect(index_path)
+        connection.execute(
+            """CREATE TABLE reports (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT NOT NULL, session_id TEXT,
+               name TEXT, created_at TEXT NOT NULL, interview_mode TEXT, interview_type TEXT, recommendation TEXT,
+               path TEXT NOT NULL, archive TEXT)"""
+        )
+        connection.execute("INSERT INTO reports (user_id, created_at, path) VALUES ('1', '2024-05-01 12:00:00', 'old.docx')")
+        connection.commit()
+        connection.close()
+
+        archive = ReportArchive(index_path, os.path.join(directory, "archive"))
+        archive.add(2, "ds.docx", "hope", "hard", session_id="s2", created_at=datetime(2024, 5, 2), scores={"overall": 7})
+        archive.add(3, "analyst.docx", "hope", "hard", session_id="s3", created_at=datetime(2024, 5, 3),
+                    scores={"overall": 9}, vacancy="analyst")
+
+        assert [report["path"] for report in archive.find(vacancy="default")] == ["ds.docx", "old.docx"]
+        assert [report["path"] for report in archive.find(vacancy="analyst")] == ["analyst.docx"]
+        assert [c["user_id"] for c in rank_candidates(load_interviews(index_path, "default"))] == ["2"]
+        assert [c["user_id"] for c in rank_candidates(load_interviews(index_path))] == ["3", "2"]
+        archive.close()
+
+        search = TranscriptSearch(os.path.join(directory, "search.sqlite3"))
+        for session_id, vacancy in (("s2", "default"), ("s3", "analyst")):
+            search.add_interview(session_id, 1, [{"text": "Обучал модели на pytorch", "is_bot": False}], vacancy=vacancy)
+        assert [result["session_id"] for result in search.search("pytorch", vacancy="analyst")] == ["s3"]
+        assert len(search.search("pytorch")) == 2
+        search.close()
+    print("✅ Отчеты, короткий список и поиск разделены по вакансиям")
+
+
+if __name__ == "__main__":
+    print("🚀 Запуск тестирования вакансий...\n")
+    test_load_vacancies()
+    test_fair_admission()
+    test_prompt_registry_and_persona()
+    test_vacancy_scoped_indexes()
+    print("\n🎯 Все тесты вакансий пройдены!")
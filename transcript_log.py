@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Журнал собеседований: каждая реплика дописывается в JSONL-файл сессии по мере диалога
+
+Восстановление отчета из журнала: python transcript_log.py transcripts/<session_id>.jsonl [--analytics]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+from collections import defaultdict
+from datetime import datetime
+
+from metrics import metrics
+
+# Политики fsync: none — полагаемся на ОС, batch — fsync после каждой пачки, always — каждая запись сразу и с fsync
+FSYNC_POLICIES = ("none", "batch", "always")
+
+
+class TranscriptWriter:
+    """Асинхронный писатель журналов: записи копятся и дописываются пачками в фоновом потоке"""
+
+    def __init__(self, directory="transcripts", fsync="batch", flush_interval=1.0, max_batch=100):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Неизвестная политика fsync: {fsync}")
+        self.directory = directory
+        self.fsync = fsync
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._pending = []
+        self._flush_task = None
+        self._lock = None
+
+    def path_for(self, session_id):
+        return os.path.join(self.directory, f"{session_id}.jsonl")
+
+    def append(self, session_id, record):
+        """Ставит запись в очередь на запись; не блокирует обработчик"""
+        self._pending.append((session_id, json.dumps(record, ensure_ascii=False, default=str) + "\n"))
+        metrics.incr("transcript.records")
+
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # Вне цикла событий (скрипты, тесты) записи дописываются при явном flush
+            return
+
+        if self.fsync == "always" or len(self._pending) >= self.max_batch:
+            self._schedule(0)
+        else:
+            self._schedule(self.flush_interval)
+
+    def _schedule(self, delay):
+        if self._flush_task is not None and not self._flush_task.done():
+            if delay > 0:
+                return
+        self._flush_task = asyncio.ensure_future(self._delayed_flush(delay))
+
+    async def _delayed_flush(self, delay):
+        if delay:
+            await asyncio.sleep(delay)
+        await self.flush()
+
+    async def flush(self):
+        """Дописывает накопленные записи в файлы сессий"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, []
+            await asyncio.to_thread(self._write, batch)
+
+    def flush_sync(self):
+        """Синхронная запись накопленного (вне цикла событий)"""
+        batch, self._pending = self._pending, []
+        self._write(batch)
+
+    def _write(self, batch):
+        by_session = defaultdict(list)
+        for session_id, line in batch:
+            by_session[session_id].append(line)
+
+        os.makedirs(self.directory, exist_ok=True)
+        for session_id, lines in by_session.items():
+            with open(self.path_for(session_id), "a", encoding="utf-8") as file:
+                file.write("".join(lines))
+                if self.fsync != "none":
+                    file.flush()
+                    os.fsync(file.fileno())
+        metrics.incr("transcript.batches")
+        metrics.observe("transcript.batch_size", len(batch))
+
+    async def close(self):
+        """Дописывает все, что осталось (при остановке бота)"""
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+        await self.flush()
+
+
+def session_record(session_id, user_id, interview_mode, interview_type, language, name, vacancy=None):
+    """Первая запись журнала: параметры собеседования"""
+    return {
+        "type": "session",
+        "session_id": session_id,
+        "user_id": user_id,
+        "interview_mode": interview_mode,
+        "interview_type": interview_type,
+        "language": language,
+        "name": name,
+        "vacancy": vacancy,
+        "ts": datetime.now().isoformat(),
+    }
+
+
+def message_record(message):
+    """Запись журнала для реплики из UserState.add_message"""
+    record = {
+        "type": "message",
+        "is_bot": message["is_bot"],
+        "text": message["text"],
+        "ts": message["timestamp"].isoformat(),
+    }
+    if message["is_bot"]:
+        record["visible_text"] = message["visible_text"]
+        record["agent_trace"] = message["agent_trace"]
+    return record
+
+
+def load_transcript(path):
+    """Читает журнал: параметры сессии и история в формате UserState.conversation_history"""
+    session = {}
+    history = []
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Последняя строка могла оборваться при аварийной остановке
+                continue
+            if record["type"] == "session":
+                session = record
+            elif record["type"] == "message":
+                message = {
+                    "text": record["text"],
+                    "is_bot": record["is_bot"],
+                    "timestamp": datetime.fromisoformat(record["ts"]),
+                }
+                if record["is_bot"]:
+                    message["visible_text"] = record["visible_text"]
+                    message["agent_trace"] = record["agent_trace"]
+                history.append(message)
+    return session, history
+
+
+def rebuild_agent_state(history):
+    """Восстанавливает состояние агентов, повторно применяя теги ответов бота"""
+    from agent_state import AgentState
+
+    agent_state = AgentState()
+    for message in history:
+        if message["is_bot"]:
+            agent_state.update_from_tags(message["agent_trace"])
+    return agent_state
+
+
+async def rebuild_report(path, with_analytics=False):
+    """Строит DOCX отчет по журналу сессии; аналитика — заново через LLM или заглушка"""
+    from document_generator import DocumentGenerator
+
+    session, history = load_transcript(path)
+    if not history:
+        raise ValueError(f"В журнале {path} нет реплик")
+
+    analytics_report = "Отчет восстановлен из журнала собеседования без аналитики."
+    if with_analytics:
+        from openai_client import OpenAIClient
+
+        analytics_report = await OpenAIClient().generate_analytics_report(
+            history, agent_state=rebuild_agent_state(history)
+        )
+
+    user_id = session.get("user_id", "unknown")
+    generator = DocumentGenerator()
+    generator.generate_report(user_id, history, analytics_report)
+    return generator.save_document(user_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Восстановление отчета по журналу собеседования")
+    parser.add_argument("transcript", help="Путь к файлу журнала .jsonl")
+    parser.add_argument("--analytics", action="store_true", help="Заново построить аналитику через LLM")
+    args = parser.parse_args()
+
+    path = asyncio.run(rebuild_report(args.transcript, args.analytics))
+    print(f"✅ Отчет сохранен: {path}")
+
+
+if __name__ == "__main__":
+    main()
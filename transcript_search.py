@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Полнотекстовый поиск по ответам кандидатов и аналитическим отчетам (SQLite FTS5)
+
+Поиск:                python transcript_search.py "pytorch" ["A/B тесты" ...] [--kind candidate] [--vacancy default]
+Индексация журналов:  python transcript_search.py --index-transcripts transcripts
+"""
+
+import argparse
+import os
+import re
+import sqlite3
+import time
+from datetime import datetime
+
+from metrics import metrics
+from vacancies import DEFAULT_VACANCY_KEY
+
+TOKEN_PATTERN = re.compile(r"\w+")
+CYRILLIC_PATTERN = re.compile(r"[а-я]")
+
+# Окончания для облегченного стемминга: отбрасывается самое длинное, если от слова остается хотя бы 3 буквы
+RUSSIAN_ENDINGS = sorted((
+    "иями", "ями", "ами", "ией", "иям", "ием", "иях", "ого", "его", "ому", "ему", "ыми", "ими", "ых", "их",
+    "ой", "ей", "ий", "ый", "ая", "яя", "ое", "ее", "ые", "ие", "ую", "юю", "ом", "ем", "ам", "ям", "ах", "ях",
+    "ов", "ев", "ия", "ью", "ию",
+    "ание", "ания", "анию", "анием", "ании", "ение", "ения", "ению", "ением", "ении",
+    "ость", "ости", "остью", "остей", "остям", "остями",
+    "ться", "ется", "ются", "ился", "илась", "ались", "ешь", "ете", "ует", "уют",
+    "ать", "ять", "ить", "ала", "ила", "али", "или", "ало", "ило", "ал", "ил", "ет", "ут", "ют", "ит", "ат", "ят",
+    "а", "я", "о", "е", "ы", "и", "у", "ю", "ь", "й",
+), key=len, reverse=True)
+ENGLISH_ENDINGS = sorted((
+    "ations", "ation", "ments", "ment", "ings", "ing", "ness", "ies", "ers", "er", "ed", "es", "ly", "'s", "s",
+), key=len, reverse=True)
+MIN_STEM_LENGTH = 3
+
+# Какие тексты попадают в индекс: ответы кандидата и аналитика (вопросы бота одинаковы у всех и только шумят)
+KINDS = ("candidate", "analytics")
+
+
+def stem(word):
+    """Облегченный стемминг русского и английского слова: нижний регистр и отбрасывание окончания"""
+    word = word.lower().replace("ё", "е")
+    endings = RUSSIAN_ENDINGS if CYRILLIC_PATTERN.search(word) else ENGLISH_ENDINGS
+    for ending in endings:
+        if word.endswith(ending) and len(word) - len(ending) >= MIN_STEM_LENGTH:
+            return word[:-len(ending)]
+    return word
+
+
+def stem_text(text):
+    return " ".join(stem(token) for token in TOKEN_PATTERN.findall(text))
+
+
+def build_match_query(query):
+    """Запрос FTS5 из пользовательского: все слова обязательны, фразы в кавычках ищутся целиком.
+
+    Слова превращаются в основы и экранируются, поэтому синтаксис FTS5 из запроса не проходит.
+    Основы длиннее двух букв ищутся как префиксы ("тест" находит "тестирование").
+    """
+    terms = []
+    for phrase, word in re.findall(r'"([^"]*)"|(\S+)', query):
+        stems = [stem(token) for token in TOKEN_PATTERN.findall(phrase or word)]
+        if not stems:
+            continue
+        if phrase or len(stems) > 1:
+            terms.append('"' + " ".join(stems) + '"')
+        else:
+            terms.append(f'"{stems[0]}"' + ("*" if len(stems[0]) >= MIN_STEM_LENGTH else ""))
+    return " AND ".join(terms)
+
+
+def make_snippet(text, query, width=80):
+    """Фрагмент исходного текста вокруг первого совпадения; совпавшие слова выделены «»"""
+    stems = [stem(token) for token in TOKEN_PATTERN.findall(query)]
+    matches = [
+        match for match in TOKEN_PATTERN.finditer(text)
+        if any(stem(match.group()).startswith(query_stem) for query_stem in stems)
+    ]
+    if not matches:
+        return text[:width * 2] + ("..." if len(text) > width * 2 else "")
+
+    start = max(matches[0].start() - width, 0)
+    end = min(matches[0].end() + width, len(text))
+    parts = []
+    position = start
+    for match in matches:
+        if match.start() < start or match.end() > end:
+            continue
+        parts.append(text[position:match.start()])
+        parts.append(f"«{match.group()}»")
+        position = match.end()
+    parts.append(text[position:end])
+    snippet = " ".join("".join(parts).split())
+    return ("..." if start > 0 else "") + snippet + ("..." if end < len(text) else "")
+
+
+class TranscriptSearch:
+    """Инкрементальный индекс: собеседование добавляется при завершении, поиск ранжирует по BM25.
+
+    add_interview и search открывают свое соединение, поэтому бот вызывает их из фонового потока.
+    """
+
+    def __init__(self, path="dialogs/search.sqlite3"):
+        self.path = path
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = self._connect()
+        self.connection.execute(
+            """CREATE TABLE IF NOT EXISTS interviews (
+                session_id TEXT PRIMARY KEY,
+                user_id TEXT,
+                name TEXT,
+                finished_at TEXT,
+                interview_mode TEXT,
+                interview_type TEXT,
+                language TEXT
+            )"""
+        )
+        if "vacancy" not in {row["name"] for row in self.connection.execute("PRAGMA table_info(interviews)")}:
+            # Собеседования, проиндексированные до появления вакансий, — собеседования бота по умолчанию
+            self.connection.execute("ALTER TABLE interviews ADD COLUMN vacancy TEXT")
+            self.connection.execute("UPDATE interviews SET vacancy = ?", (DEFAULT_VACANCY_KEY,))
+        # Индексируются основы слов, исходный текст хранится рядом для фрагментов
+        self.connection.execute(
+            """CREATE VIRTUAL TABLE IF NOT EXISTS passages USING fts5(
+                stems, text UNINDEXED, session_id UNINDEXED, kind UNINDEXED,
+                tokenize = 'unicode61 remove_diacritics 2'
+            )"""
+        )
+        # Фрагменты собеседования по rowid: столбцы UNINDEXED в FTS5 не индексируются,
+        # и удаление по session_id в самой таблице passages было бы полным просмотром
+        has_side_table = self.connection.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'session_passages'"
+        ).fetchone() is not None
+        self.connection.execute(
+            """CREATE TABLE IF NOT EXISTS session_passages (
+                passage_id INTEGER PRIMARY KEY,
+                session_id TEXT NOT NULL
+            )"""
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS session_passages_session ON session_passages (session_id)")
+        if not has_side_table:
+            # Индекс, созданный до появления таблицы, заполняется один раз
+            self.connection.execute("INSERT INTO session_passages SELECT rowid, session_id FROM passages")
+        self.connection.commit()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path)
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    def contains(self, session_id):
+        return _contains(self.connection, session_id)
+
+    def add_interview(self, session_id, user_id, conversation_history, analytics_report=None, name=None,
+                      interview_mode=None, interview_type=None, language=None, finished_at=None,
+                      vacancy=DEFAULT_VACANCY_KEY):
+        """Добавляет собеседование в индекс: каждый ответ кандидата и каждый абзац аналитики — отдельный фрагмент"""
+        passages = [
+            ("candidate", message["text"])
+            for message in conversation_history if not message["is_bot"] and message["text"].strip()
+        ]
+        if analytics_report:
+            passages += [
+                ("analytics", paragraph.strip())
+                for paragraph in analytics_report.split("\n\n") if paragraph.strip()
+            ]
+
+        connection = self._connect()
+        try:
+            with connection:
+                if _contains(connection, session_id):
+                    # Повторная индексация (например, отчет перестроен) заменяет старые фрагменты
+                    connection.execute(
+                        "DELETE FROM passages WHERE rowid IN (SELECT passage_id FROM session_passages WHERE session_id = ?)",
+                        (session_id,)
+                    )
+                    connection.execute("DELETE FROM session_passages WHERE session_id = ?", (session_id,))
+                connection.execute(
+                    """INSERT OR REPLACE INTO interviews
+                       (session_id, user_id, name, finished_at, interview_mode, interview_type, language, vacancy)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                    (session_id, str(user_id), name, (finished_at or datetime.now()).isoformat(sep=" ", timespec="seconds"),
+                     interview_mode, interview_type, language, vacancy)
+                )
+                for kind, text in passages:
+                    cursor = connection.execute(
+                        "INSERT INTO passages (stems, text, session_id, kind) VALUES (?, ?, ?, ?)",
+                        (stem_text(text), text, session_id, kind)
+                    )
+                    connection.execute(
+                        "INSERT INTO session_passages (passage_id, session_id) VALUES (?, ?)", (cursor.lastrowid, session_id)
+                    )
+        finally:
+            connection.close()
+        metrics.incr("search.indexed")
+        metrics.incr("search.passages", len(passages))
+        return len(passages)
+
+    def search(self, query, limit=10, kind=None, vacancy=None):
+        """Собеседования, лучше всего подходящие под запрос: лучший фрагмент каждого, по убыванию релевантности.
+
+        vacancy — только собеседования одной вакансии.
+        """
+        match_query = build_match_query(query)
+        if not match_query:
+            return []
+
+        started = time.perf_counter()
+        conditions = ["passages MATCH ?"]
+        values = [match_query]
+        if kind:
+            conditions.append("kind = ?")
+            values.append(kind)
+        if vacancy is not None:
+            # Проверяется только у фрагментов, уже найденных по MATCH
+            conditions.append("session_id IN (SELECT session_id FROM interviews WHERE vacancy = ?)")
+            values.append(vacancy)
+        connection = self._connect()
+        try:
+            rows = connection.execute(
+                f"""SELECT session_id, kind, text, bm25(passages) AS score
+                    FROM passages WHERE {' AND '.join(conditions)} ORDER BY score LIMIT ?""",
+                (*values, limit * 20)
+            ).fetchall()
+
+            # По одному, лучшему, фрагменту на собеседование
+            results = {}
+            for row in rows:
+                if row["session_id"] not in results:
+                    if len(results) == limit:
+                        continue
+                    results[row["session_id"]] = {
+                        "session_id": row["session_id"],
+                        "kind": row["kind"],
+                        "score": row["score"],
+                        "snippet": make_snippet(row["text"], query),
+                        "matches": 0,
+                    }
+                results[row["session_id"]]["matches"] += 1
+
+            # Данные собеседований — отдельным запросом только для найденных (соединение внутри FTS5 запроса медленнее)
+            if results:
+                interviews = connection.execute(
+                    f"SELECT * FROM interviews WHERE session_id IN ({', '.join('?' * len(results))})", list(results)
+                ).fetchall()
+                for interview in interviews:
+                    results[interview["session_id"]].update(dict(interview))
+        finally:
+            connection.close()
+
+        metrics.observe("search.latency", time.perf_counter() - started)
+        return list(results.values())
+
+    def index_transcripts(self, directory="transcripts"):
+        """Добавляет в индекс журналы сессий, которых в нем еще нет (без аналитики)"""
+        from transcript_log import load_transcript
+
+        added = 0
+        for filename in sorted(os.listdir(directory)):
+            if not filename.endswith(".jsonl"):
+                continue
+            session, history = load_transcript(os.path.join(directory, filename))
+            session_id = session.get("session_id", filename[:-len(".jsonl")])
+            if not history or self.contains(session_id):
+                continue
+            self.add_interview(
+                session_id, session.get("user_id"), history, name=session.get("name"),
+                interview_mode=session.get("interview_mode"), interview_type=session.get("interview_type"),
+                language=session.get("language"), finished_at=history[-1]["timestamp"],
+                vacancy=session.get("vacancy") or DEFAULT_VACANCY_KEY
+            )
+            added += 1
+        return added
+
+    def close(self):
+        self.connection.close()
+
+
+def _contains(connection, session_id):
+    return connection.execute("SELECT 1 FROM interviews WHERE session_id = ?", (session_id,)).fetchone() is not None
+
+
+def format_search_results(results):
+    """Результаты поиска для CLI и /search"""
+    if not results:
+        return "Ничего не найдено."
+
+    lines = []
+    for rank, result in enumerate(results, 1):
+        source = "ответ кандидата" if result["kind"] == "candidate" else "аналитика"
+        lines.append(
+            f"{rank}. {result['name'] or 'без имени'} (пользователь {result['user_id']}), {result['finished_at']}, "
+            f"{result['interview_type'] or '—'}; совпадений: {result['matches']}\n"
+            f"   {source}: {result['snippet']}"
+        )
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Полнотекстовый поиск по собеседованиям")
+    parser.add_argument("query", nargs="*", help="Слова и фразы в кавычках; все должны встретиться")
+    parser.add_argument("--index", default=os.getenv("SEARCH_INDEX_PATH", "dialogs/search.sqlite3"))
+    parser.add_argument("--kind", choices=KINDS)
+    parser.add_argument("--vacancy", help="Только собеседования этой вакансии (key из vacancies.json)")
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--index-transcripts", metavar="DIR", help="Добавить в индекс журналы сессий из папки")
+    args = parser.parse_args()
+
+    index = TranscriptSearch(args.index)
+    if args.index_transcripts:
+        print(f"✅ Добавлено собеседований: {index.index_transcripts(args.index_transcripts)}")
+
+    if args.query:
+        query = " ".join(f'"{word}"' if " " in word else word for word in args.query)
+        started = time.perf_counter()
+        results = index.search(query, args.limit, args.kind, args.vacancy)
+        print(format_search_results(results))
+        print(f"\n⏱ {(time.perf_counter() - started) * 1000:.1f} мс")
+    index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import time
+
+from metrics import metrics
+from vacancies import PROMPT_FILES, current_vacancy
+
+# Приветствие по режиму и языку; компания и должность — из вакансии бота.
+# Текст повторяет раздел "Начало работы" стандартных промтов: цель разговора, помощь с английскими словами
+# и вопрос о согласии на разговор ("сначала получить согласие на разговор, затем переходить к следующему блоку").
+# При изменении этого раздела в промтах приветствие нужно поправить здесь же. Для своих промтов вакансии
+# (prompt_files в vacancies.json) или варианта эксперимента шаблона нет: приветствие пишет LLM по этому промту.
+GREETINGS = {
+    ("hope", "russian"): "Здравствуйте, {name}! Меня зовут миссис Хоуп, я менеджер по персоналу компании "
+                         "\"{vacancy.company}\". Мы хотим задать вам несколько вопросов, чтобы уточнить ключевую "
+                         "информацию и предложить подходящую вакансию {vacancy.position}. Если вам будет непонятно "
+                         "какое-нибудь слово или выражение, в любой момент задайте вопрос по английскому языку или "
+                         "попросите перевести английское слово. Удобно ли вам сейчас поговорить?",
+    ("hope", "english"): "Hello, {name}! My name is Mrs. Hope, I am an HR manager at \"{vacancy.company_english}\". "
+                         "We would like to ask you a few questions to clarify the key information and offer you a "
+                         "suitable {vacancy.position_english} position. If any word or expression is unclear, feel "
+                         "free to ask any question about English or ask me to translate it at any time. "
+                         "Is it convenient for you to talk now?",
+    ("teacher", "english"): "Hello, {name}! I am your English teacher at \"{vacancy.company_english}\". Today we will "
+                            "have a short job interview in English for the {vacancy.position_english} position: "
+                            "I will ask you a few questions to clarify the key information and offer you a suitable "
+                            "vacancy. If any word or expression is unclear, you can ask any question about English or "
+                            "ask me to translate it at any time. Is it convenient for you to talk now?",
+}
+
+# Теги приветствия: основная ветка без блока — блок выбирается после согласия кандидата
+GREETING_TAGS = ["Агент-ветки: Собеседование", "Финальный агент - агент-генератор вопросов"]
+
+
+def bot_reply(tags, text):
+    """Ответ в формате модели: технические теги агентов, затем текст для кандидата"""
+    return "\n".join(f"{{{tag}}}" for tag in tags) + "\n" + text
+
+
+class TurnTemplates:
+    """Отвечает без LLM на приветствие в начале собеседования.
+
+    Остальные ходы (переходы между блоками, подтверждения, завершение) ведет LLM по промту:
+    правила промтов (пропуск уже заполненных полей, повторное подтверждение) шаблонам не воспроизвести.
+    """
+
+    def greeting(self, interview_mode, language, name, prompt_file=None):
+        """Приветствие в формате ответа модели или None, если его нужно отдать LLM.
+
+        prompt_file — промт собеседования: шаблон есть только для стандартных промтов (PROMPT_FILES).
+        """
+        started = time.perf_counter()
+        if interview_mode == "teacher":
+            language = "english"
+        template = GREETINGS.get((interview_mode, language))
+        if template is None or (prompt_file is not None and prompt_file not in PROMPT_FILES.values()):
+            metrics.incr("templates.fallback")
+            return None
+
+        reply = bot_reply(GREETING_TAGS, template.format(name=name, vacancy=current_vacancy.get()))
+        metrics.incr("templates.served.greeting")
+        metrics.observe("templates.latency", time.perf_counter() - started)
+        return reply
+
+
+def format_template_report():
+    """Форматирует отчет о приветствиях, отданных шаблонам"""
+    served = {name.rsplit(".", 1)[1]: metrics.get(name) for name in metrics.names_with_prefix("templates.served.")}
+    total_served = sum(served.values())
+    total = total_served + metrics.get("templates.fallback")
+    if not total:
+        return "Собеседований еще не было."
+
+    latency = metrics.summary("templates.latency")
+    lines = [f"Без LLM: {total_served:.0f} из {total:.0f} ({total_served / total:.1%})"]
+    lines += [f"  {kind}: {count:.0f}" for kind, count in sorted(served.items())]
+    if latency["count"]:
+        lines.append(f"Время шаблона p95: {latency['p95'] * 1000:.2f} мс")
+    return "\n".join(lines)
@@ -0,0 +1,163 @@
+import json
+import os
+from collections import defaultdict
+from contextvars import ContextVar
+from datetime import datetime
+
+from model_router import estimate_cost
+
+# Сессия, от имени которой выполняются запросы к LLM в текущей задаче asyncio
+current_session = ContextVar("current_session", default=None)
+
+# Уровни экономии при приближении к бюджету сессии: (доля бюджета, уровень)
+BUDGET_LEVELS = ((0.95, 3), (0.8, 2), (0.6, 1))
+BUDGET_LEVEL_NAMES = {
+    0: "нормальный режим",
+    1: "короткие ответы",
+    2: "сжатая история",
+    3: "дешевая модель",
+}
+
+
+class SessionInfo:
+    """Описание сессии для учета токенов"""
+
+    def __init__(self, session_id, user_id, interview_mode=None, interview_type=None, variant=None):
+        self.session_id = session_id
+        self.user_id = user_id
+        self.interview_mode = interview_mode
+        self.interview_type = interview_type
+        # Вариант промта A/B-эксперимента ("эксперимент/вариант") или None
+        self.variant = variant
+
+
+def bind_session(session_id, user_id, interview_mode=None, interview_type=None, variant=None):
+    """Привязывает запросы текущей задачи (и созданных из нее задач) к сессии"""
+    current_session.set(SessionInfo(session_id, user_id, interview_mode, interview_type, variant))
+
+
+def _empty_totals():
+    return {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0}
+
+
+def _add(totals, record):
+    totals["calls"] += 1
+    totals["prompt_tokens"] += record["prompt_tokens"]
+    totals["completion_tokens"] += record["completion_tokens"]
+    totals["cost_usd"] += record["cost_usd"]
+
+
+class UsageLedger:
+    """Журнал расхода токенов: по сессиям, пользователям и дням, с бюджетом на сессию"""
+
+    def __init__(self, path="usage/ledger.jsonl", session_budget=0, flush_every=20):
+        self.path = path
+        self.session_budget = session_budget
+        self.flush_every = flush_every
+        self.sessions = defaultdict(_empty_totals)
+        self.session_meta = {}
+        self.users = defaultdict(_empty_totals)
+        self.days = defaultdict(_empty_totals)
+        self._pending = []
+
+        if path and os.path.exists(path):
+            self.load()
+
+    def load(self):
+        """Восстанавливает агрегаты из журнала на диске"""
+        with open(self.path, "r", encoding="utf-8") as file:
+            for line in file:
+                if line.strip():
+                    self._aggregate(json.loads(line))
+
+    def record(self, call_type, model, usage, session=None, latency=None):
+        """Учитывает usage одного запроса к LLM (latency — длительность запроса в секундах, если известна)"""
+        session = session or current_session.get()
+        prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+        completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+        now = datetime.now()
+
+        record = {
+            "ts": now.isoformat(timespec="seconds"),
+            "day": now.strftime("%Y-%m-%d"),
+            "session_id": session.session_id if session else None,
+            "user_id": session.user_id if session else None,
+            "interview_mode": session.interview_mode if session else None,
+            "interview_type": session.interview_type if session else None,
+            "variant": session.variant if session else None,
+            "call_type": call_type,
+            "model": model,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "cost_usd": estimate_cost(model, prompt_tokens, completion_tokens),
+            "latency_ms": None if latency is None else round(latency * 1000),
+        }
+        self._aggregate(record)
+
+        self._pending.append(record)
+        if len(self._pending) >= self.flush_every:
+            self.flush()
+        return record
+
+    def _aggregate(self, record):
+        if record["session_id"]:
+            _add(self.sessions[record["session_id"]], record)
+            self.session_meta[record["session_id"]] = (record["interview_mode"], record["interview_type"])
+        if record["user_id"] is not None:
+            _add(self.users[record["user_id"]], record)
+        _add(self.days[record["day"]], record)
+
+    def flush(self):
+        """Дописывает накопленные записи в журнал"""
+        if not self._pending or not self.path:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.write("".join(json.dumps(record, ensure_ascii=False) + "\n" for record in self._pending))
+        self._pending = []
+
+    def session_tokens(self, session_id):
+        """Возвращает число токенов, израсходованных сессией"""
+        totals = self.sessions.get(session_id)
+        return totals["prompt_tokens"] + totals["completion_tokens"] if totals else 0
+
+    def budget_level(self, session=None):
+        """Возвращает уровень экономии сессии (0 — бюджет не ограничивает)"""
+        session = session or current_session.get()
+        if not self.session_budget or session is None:
+            return 0
+
+        share = self.session_tokens(session.session_id) / self.session_budget
+        for threshold, level in BUDGET_LEVELS:
+            if share >= threshold:
+                return level
+        return 0
+
+    def format_report(self, top=5):
+        """Форматирует отчет: топ пользователей, средние по режимам и типам, расход за сегодня"""
+        if not self.days:
+            return "Расход токенов еще не учитывался."
+
+        lines = ["Топ пользователей по стоимости:"]
+        top_users = sorted(self.users.items(), key=lambda item: item[1]["cost_usd"], reverse=True)[:top]
+        for user_id, totals in top_users:
+            lines.append(
+                f"{user_id}: ${totals['cost_usd']:.4f}, "
+                f"токены {totals['prompt_tokens']}/{totals['completion_tokens']}, вызовов {totals['calls']}"
+            )
+
+        groups = defaultdict(list)
+        for session_id, totals in self.sessions.items():
+            groups[self.session_meta.get(session_id, (None, None))].append(totals)
+
+        lines.append("\nСреднее на собеседование (режим/тип):")
+        for (interview_mode, interview_type), sessions in sorted(groups.items(), key=lambda item: str(item[0])):
+            tokens = sum(totals["prompt_tokens"] + totals["completion_tokens"] for totals in sessions) / len(sessions)
+            cost = sum(totals["cost_usd"] for totals in sessions) / len(sessions)
+            lines.append(f"{interview_mode}/{interview_type}: {len(sessions)} сессий, {tokens:.0f} токенов, ${cost:.4f}")
+
+        today = self.days.get(datetime.now().strftime("%Y-%m-%d"), _empty_totals())
+        lines.append(f"\nСегодня: ${today['cost_usd']:.4f}, вызовов {today['calls']}")
+        return "\n".join(lines)
@@ -0,0 +1,120 @@
+import json
+import os
+from contextvars import ContextVar
+
+import aiofiles
+
+from metrics import metrics
+
+# Промты по типу собеседования
+PROMPT_FILES = {
+    "soft": "Промт Soft Skills нейро-рекрутера для собеседований.txt",
+    "hard": "Промт Hard Skills нейро-рекрутера для собеседований.txt",
+    "experience": "prompt.txt",
+}
+ANALYTICS_PROMPT_FILE = "analytics_prompt.txt"
+
+DEFAULT_VACANCY_KEY = "default"
+
+
+class Vacancy:
+    """Вакансия и ее бот: токен Telegram, промты и легенда рекрутера (компания, должность в родительном падеже)"""
+
+    def __init__(self, key, token=None, company="Пегий дудочник", company_english="Pied Piper",
+                 position="дата-сайентиста", position_english="data scientist", prompt_files=None,
+                 analytics_prompt=ANALYTICS_PROMPT_FILE):
+        self.key = key
+        self.token = token
+        self.company = company
+        self.company_english = company_english
+        self.position = position
+        self.position_english = position_english
+        # Неуказанные типы собеседований берут общие промты
+        self.prompt_files = {**PROMPT_FILES, **(prompt_files or {})}
+        self.analytics_prompt = analytics_prompt
+
+
+DEFAULT_VACANCY = Vacancy(DEFAULT_VACANCY_KEY)
+
+# Вакансия, от имени которой обрабатывается текущее обновление (как current_session для учета токенов)
+current_vacancy = ContextVar("current_vacancy", default=DEFAULT_VACANCY)
+
+
+def load_vacancies(path, default_token=None, require_token=True):
+    """Вакансии из JSON-файла (список объектов с полями Vacancy; токен — "token" или имя переменной "token_env").
+
+    Без файла — одна вакансия по умолчанию с токеном из TELEGRAM_BOT_TOKEN.
+    require_token=False — для утилит без ботов (например, повторного анализа), которым нужны только промты.
+    """
+    if not path or not os.path.exists(path):
+        if require_token and not default_token:
+            raise ValueError("TELEGRAM_BOT_TOKEN не найден в переменных окружения")
+        return [Vacancy(DEFAULT_VACANCY_KEY, default_token)]
+
+    with open(path, "r", encoding="utf-8") as file:
+        items = json.load(file)
+
+    vacancies = []
+    for item in items:
+        item = dict(item)
+        token_env = item.pop("token_env", None)
+        token = item.pop("token", None) or (os.getenv(token_env) if token_env else None)
+        if require_token and not token:
+            raise ValueError(f"Не найден токен бота вакансии {item.get('key')} ({token_env or 'token'})")
+        vacancies.append(Vacancy(token=token, **item))
+
+    keys = [vacancy.key for vacancy in vacancies]
+    if not vacancies or len(set(keys)) != len(keys):
+        raise ValueError(f"В {path} должны быть вакансии с разными key: {keys}")
+    return vacancies
+
+
+class VacancyMiddleware:
+    """Привязывает обработку обновления к вакансии бота, который его получил"""
+
+    def __init__(self, vacancies_by_bot_id):
+        self.vacancies_by_bot_id = vacancies_by_bot_id
+
+    async def __call__(self, handler, event, data):
+        vacancy = self.vacancies_by_bot_id.get(data["bot"].id, DEFAULT_VACANCY)
+        current_vacancy.set(vacancy)
+        metrics.incr(f"vacancy.{vacancy.key}.updates")
+        return await handler(event, data)
+
+
+class PromptRegistry:
+    """Общий для всех ботов кэш файлов промтов: файл читается заново только после изменения"""
+
+    def __init__(self):
+        self._prompts = {}
+
+    async def get(self, path):
+        mtime = os.path.getmtime(path)
+        cached = self._prompts.get(path)
+        if cached is not None and cached[0] == mtime:
+            metrics.incr("prompts.hits")
+            return cached[1]
+
+        async with aiofiles.open(path, 'r', encoding='utf-8') as file:
+            text = await file.read()
+        self._prompts[path] = (mtime, text)
+        metrics.incr("prompts.loads")
+        return text
+
+
+def format_vacancy_report(vacancies):
+    """Форматирует отчет по вакансиям: обновления, ходы, запросы к LLM, стоимость и ожидание допуска"""
+    lines = []
+    for vacancy in vacancies:
+        prefix = f"vacancy.{vacancy.key}"
+        wait = metrics.summary(f"admission.wait.{vacancy.key}")
+        line = (
+            f"{vacancy.key} ({vacancy.company}, {vacancy.position}): обновлений {metrics.get(prefix + '.updates'):.0f}, "
+            f"собеседований {metrics.get(prefix + '.openings'):.0f}, ходов {metrics.get(prefix + '.turns'):.0f}, "
+            f"запросов к LLM {metrics.get(prefix + '.llm_calls'):.0f}, "
+            f"токенов {metrics.get(prefix + '.tokens'):.0f}"
+        )
+        if wait["count"]:
+            line += f", ожидание допуска p95={wait['p95']:.1f}с"
+        lines.append(line)
+    return "\n".join(lines)